@@ -33,6 +33,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # En tête : mesure la requête complète (durée, SQL, taille) par vue
+    'ficheMilitant.middleware.MetriquesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -112,6 +114,10 @@ MEDIA_ROOT = BASE_DIR / 'media'
 if not os.path.exists(MEDIA_ROOT):
     os.makedirs(MEDIA_ROOT)
 
+# Exports de fiches (données personnelles) : hors de MEDIA_ROOT, jamais servis comme médias,
+# téléchargés uniquement par l'admin
+EXPORTS_ROOT = BASE_DIR / 'exports'
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -130,6 +136,16 @@ if not os.path.exists(DATA_DIR):
 
 # Chemin vers le fichier CSV des électeurs
 CSV_ELECTEURS_PATH = os.path.join(DATA_DIR, 'sous_prefectures_selection.csv')
+# Snapshot binaire compilé depuis ce CSV (manage.py compiler_liste_electorale), lu par les workers
+SNAPSHOT_ELECTEURS_PATH = os.path.splitext(CSV_ELECTEURS_PATH)[0] + '.snap'
+
+# Cache partagé entre les workers (comptage de la liste électorale, statistiques)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    }
+}
 
 # ← AJOUTS POUR LA GESTION DES ERREURS
 # Configuration des logs pour capturer les erreurs
@@ -142,6 +158,10 @@ LOGGING = {
             'class': 'logging.FileHandler',
             'filename': BASE_DIR / 'django_errors.log',
         },
+        # Lignes JSON écrites sur stderr par un thread dédié (file d'attente)
+        'application': {
+            '()': 'ficheMilitant.log_utils.GestionnaireFileAttente',
+        },
     },
     'loggers': {
         'django': {
@@ -149,6 +169,12 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': True,
         },
+        # Niveau DEBUG pour le détail des recherches ; ficheMilitant.perf (INFO) porte les durées
+        'ficheMilitant': {
+            'handlers': ['application'],
+            'level': os.environ.get('ENQUETE_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
     },
 }
 
@@ -159,4 +185,20 @@ DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 
 # Types de fichiers autorisés pour les photos
 ALLOWED_IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp']
-MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB en bytes
\ No newline at end of file
+MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB en bytes
+
+# Dimensions maximales et qualité JPEG des photos stockées (aussi appliquées par le navigateur avant l'envoi)
+PHOTO_MAX_SIZE = (800, 800)
+PHOTO_QUALITE = 85
+
+# Optimisation des photos : True = par le worker (manage.py traiter_photos) hors de la requête,
+# False = dans la requête, à partir du même décodage que la validation du formulaire
+PHOTO_TRAITEMENT_ASYNCHRONE = True
+
+# Métriques par vue (endpoint /metrics) : un fichier par worker dans METRIQUES_DIR
+METRIQUES_DIR = BASE_DIR / 'metriques'
+METRIQUES_SEUIL_LENT = 1.0  # secondes : au-delà, la requête est journalisée avec ses SQL les plus lentes
+# Accès du collecteur : jeton (en-tête Authorization: Bearer <jeton>) ou adresses explicites.
+# Derrière un proxy local, toutes les requêtes arrivent de 127.0.0.1 : ne pas l'autoriser par défaut
+METRIQUES_JETON = os.environ.get('ENQUETE_METRIQUES_JETON', '')
+METRIQUES_IPS_AUTORISEES = []
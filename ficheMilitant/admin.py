@@ -1,11 +1,16 @@
 # ficheMilitant/admin.py
 
 from django.contrib import admin
+from django.db.models import Count, Q
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
-from .models import Enqueteur, FicheMilitant, EnquetePolitique
+from django.http import StreamingHttpResponse, FileResponse, Http404
+from django.urls import path, reverse
+from .models import Enqueteur, FicheMilitant, EnquetePolitique, Electeur, ExportJob
+from .export_utils import flux_csv, lignes_export, parametres_selection
+from .image_utils import WEBP_DISPONIBLE
 
 class EnqueteurInline(admin.StackedInline):
     model = Enqueteur
@@ -50,27 +55,41 @@ class EnqueteurAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        # Les trois compteurs en une seule requête agrégée (au lieu de plusieurs COUNT par ligne)
+        return super().get_queryset(request).select_related('user').annotate(
+            total_fiches=Count('fiches_militant'),
+            total_fiches_csv=Count('fiches_militant', filter=Q(fiches_militant__est_dans_csv=True)),
+            total_fiches_photo=Count(
+                'fiches_militant',
+                filter=Q(fiches_militant__photo__isnull=False) & ~Q(fiches_militant__photo='')
+            ),
+        )
+
     def nombre_fiches(self, obj):
-        return obj.fiches_militant.count()
+        return obj.total_fiches
     nombre_fiches.short_description = "Total fiches"
+    nombre_fiches.admin_order_field = 'total_fiches'
 
     def fiches_csv(self, obj):
-        total = obj.fiches_militant.count()
-        dans_csv = obj.fiches_militant.filter(est_dans_csv=True).count()
+        total = obj.total_fiches
+        dans_csv = obj.total_fiches_csv
         if total > 0:
             pourcentage = (dans_csv / total) * 100
             return f"{dans_csv}/{total} ({pourcentage:.0f}%)"
         return "0/0"
     fiches_csv.short_description = "Fiches dans CSV"
+    fiches_csv.admin_order_field = 'total_fiches_csv'
 
     def fiches_photo(self, obj):
-        total = obj.fiches_militant.count()
-        avec_photo = obj.fiches_militant.exclude(photo='').count()
+        total = obj.total_fiches
+        avec_photo = obj.total_fiches_photo
         if total > 0:
             pourcentage = (avec_photo / total) * 100
             return f"{avec_photo}/{total} ({pourcentage:.0f}%)"
         return "0/0"
     fiches_photo.short_description = "Fiches avec photo"
+    fiches_photo.admin_order_field = 'total_fiches_photo'
 
     def save_model(self, request, obj, form, change):
         super().save_model(request, obj, form, change)
@@ -83,19 +102,19 @@ class EnqueteurAdmin(admin.ModelAdmin):
 @admin.register(FicheMilitant)
 class FicheMilitantAdmin(admin.ModelAdmin):
     list_display = ('prenoms', 'nom', 'sexe', 'region', 'section', 'enqueteur',
-                    'statut_csv', 'photo_thumb', 'numero_electeur_csv', 'date_soumission')
+                    'statut_csv', 'photo_thumb', 'photo_statut', 'numero_electeur_csv', 'date_soumission')
     list_filter = ('sexe', 'region', 'departement', 'inscription_electorale',
-                   'enqueteur', 'est_dans_csv', 'date_soumission')
+                   'enqueteur', 'est_dans_csv', 'photo_statut', 'date_soumission')
     search_fields = ('prenoms', 'nom', 'contacts', 'section', 'comite_base',
                      'enqueteur__prenom', 'enqueteur__nom', 'numero_carte_electeur', 'numero_electeur_csv')
-    readonly_fields = ('date_soumission', 'est_dans_csv', 'numero_electeur_csv', 'photo_preview')
+    readonly_fields = ('date_soumission', 'est_dans_csv', 'numero_electeur_csv', 'photo_preview', 'photo_statut')
 
     fieldsets = (
         ('Enquêteur', {
             'fields': ('enqueteur',)
         }),
         ('Photo', {
-            'fields': ('photo', 'photo_preview'),
+            'fields': ('photo', 'photo_preview', 'photo_statut'),
             'description': 'Photo d\'identité du militant'
         }),
         ('Statut électoral', {
@@ -132,12 +151,30 @@ class FicheMilitantAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('enqueteur', 'enqueteur__user')
 
+    def save_model(self, request, obj, form, change):
+        # Une photo changée depuis l'admin passe aussi par le worker d'optimisation
+        if 'photo' in form.changed_data:
+            obj.photo_statut = 'en_attente' if obj.photo else 'aucune'
+            obj.miniatures_generees = False
+        super().save_model(request, obj, form, change)
+
+    def image_miniature(self, obj, taille, style):
+        """<picture> WebP + JPEG sur les dérivés de la photo (photo d'origine à défaut)"""
+        url_jpeg = obj.get_miniature_url(taille)
+        if url_jpeg is None:
+            return format_html('<img src="{}" style="{}" />', obj.photo.url, style)
+        if not WEBP_DISPONIBLE:
+            return format_html('<img src="{}" style="{}" loading="lazy" />', url_jpeg, style)
+        return format_html(
+            '<picture><source srcset="{}" type="image/webp"><img src="{}" style="{}" loading="lazy" /></picture>',
+            obj.get_miniature_url(taille, 'webp'), url_jpeg, style
+        )
+
     def photo_thumb(self, obj):
         """Miniature de la photo pour la liste"""
         if obj.photo:
-            return format_html(
-                '<img src="{}" style="width: 40px; height: 50px; object-fit: cover; border-radius: 4px;" />',
-                obj.photo.url
+            return self.image_miniature(
+                obj, 64, 'width: 40px; height: 50px; object-fit: cover; border-radius: 4px;'
             )
         return "❌"
     photo_thumb.short_description = "Photo"
@@ -145,9 +182,9 @@ class FicheMilitantAdmin(admin.ModelAdmin):
     def photo_preview(self, obj):
         """Aperçu de la photo dans le détail"""
         if obj.photo:
-            return format_html(
-                '<img src="{}" style="width: 200px; height: auto; max-height: 250px; object-fit: cover; border: 1px solid #ccc; border-radius: 8px;" />',
-                obj.photo.url
+            return self.image_miniature(
+                obj, 256,
+                'width: 200px; height: auto; max-height: 250px; object-fit: cover; border: 1px solid #ccc; border-radius: 8px;'
             )
         return "Aucune photo"
     photo_preview.short_description = "Aperçu de la photo"
@@ -159,45 +196,101 @@ class FicheMilitantAdmin(admin.ModelAdmin):
     statut_csv.short_description = "Statut CSV"
     statut_csv.admin_order_field = 'est_dans_csv'
 
-    actions = ['export_fiches_csv']
+    actions = ['export_fiches_csv', 'export_arriere_plan_csv', 'export_arriere_plan_xlsx',
+               'export_arriere_plan_parquet']
 
     def export_fiches_csv(self, request, queryset):
-        """Action pour exporter les fiches sélectionnées en CSV"""
-        import csv
-        from django.http import HttpResponse
-
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        """Action pour exporter les fiches sélectionnées en CSV (réponse en streaming)"""
+        response = StreamingHttpResponse(
+            flux_csv(lignes_export(queryset)),
+            content_type='text/csv; charset=utf-8'
+        )
         response['Content-Disposition'] = 'attachment; filename="fiches_militants_export.csv"'
-        response.write('\ufeff')  # BOM pour Excel
-
-        writer = csv.writer(response)
-        writer.writerow([
-            'Nom', 'Prénoms', 'Date Naissance', 'Lieu Naissance',
-            'Sexe', 'Contacts', 'Section', 'Comité de Base',
-            'Dans CSV', 'N° Électeur CSV', 'A Photo', 'Enquêteur', 'Date Soumission'
-        ])
-
-        for fiche in queryset:
-            writer.writerow([
-                fiche.nom,
-                fiche.prenoms,
-                fiche.date_naissance.strftime('%d/%m/%Y') if fiche.date_naissance else '',
-                fiche.lieu_naissance or '',
-                fiche.get_sexe_display(),
-                fiche.contacts,
-                fiche.section,
-                fiche.comite_base,
-                'Oui' if fiche.est_dans_csv else 'Non',
-                fiche.numero_electeur_csv or '',
-                'Oui' if fiche.photo else 'Non',
-                f"{fiche.enqueteur.prenom} {fiche.enqueteur.nom}",
-                fiche.date_soumission.strftime('%d/%m/%Y %H:%M')
-            ])
-
         return response
 
     export_fiches_csv.short_description = "Exporter les fiches sélectionnées en CSV"
 
+    def creer_export(self, request, queryset, format):
+        """Met l'export en file d'attente pour le worker (manage.py traiter_exports)"""
+        toute_la_liste = request.POST.get('select_across') == '1'
+        job = ExportJob.objects.create(
+            demande_par=request.user, format=format, total=queryset.count(),
+            parametres=parametres_selection(request, queryset, toute_la_liste),
+        )
+        url = reverse('admin:ficheMilitant_exportjob_change', args=[job.pk])
+        self.message_user(request, format_html(
+            'Export #{} de {} fiches mis en file d\'attente. <a href="{}">Suivre la progression</a>',
+            job.pk, job.total, url
+        ))
+
+    def export_arriere_plan_csv(self, request, queryset):
+        self.creer_export(request, queryset, 'csv')
+    export_arriere_plan_csv.short_description = "Exporter en arrière-plan (CSV)"
+
+    def export_arriere_plan_xlsx(self, request, queryset):
+        self.creer_export(request, queryset, 'xlsx')
+    export_arriere_plan_xlsx.short_description = "Exporter en arrière-plan (Excel)"
+
+    def export_arriere_plan_parquet(self, request, queryset):
+        self.creer_export(request, queryset, 'parquet')
+    export_arriere_plan_parquet.short_description = "Exporter en arrière-plan (Parquet)"
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    """Suivi des exports en arrière-plan et téléchargement des fichiers"""
+    list_display = ('__str__', 'format', 'statut', 'avancement', 'lien_telechargement',
+                    'demande_par', 'date_creation', 'date_fin')
+    list_filter = ('statut', 'format')
+    fields = ('format', 'statut', 'avancement', 'lien_telechargement', 'message',
+              'demande_par', 'date_creation', 'date_debut', 'date_fin')
+    readonly_fields = fields
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('parametres').select_related('demande_par')
+
+    def has_add_permission(self, request):
+        return False
+
+    def avancement(self, obj):
+        if obj.total:
+            return f"{obj.progression}/{obj.total} ({obj.progression / obj.total * 100:.0f}%)"
+        return "0/0"
+    avancement.short_description = "Progression"
+
+    def lien_telechargement(self, obj):
+        if obj.statut == 'termine' and obj.fichier:
+            url = reverse('admin:ficheMilitant_exportjob_telecharger', args=[obj.pk])
+            return format_html('<a href="{}">⬇️ Télécharger</a>', url)
+        return "—"
+    lien_telechargement.short_description = "Fichier"
+
+    def get_urls(self):
+        urls = [
+            path('<int:pk>/telecharger/', self.admin_site.admin_view(self.telecharger),
+                 name='ficheMilitant_exportjob_telecharger'),
+        ]
+        return urls + super().get_urls()
+
+    def telecharger(self, request, pk):
+        """Seul accès aux exports : ils sont stockés hors de MEDIA_ROOT (EXPORTS_ROOT)"""
+        job = ExportJob.objects.filter(pk=pk, statut='termine').only('fichier', 'format').first()
+        if job is None or not self.has_view_permission(request, job) or not job.fichier:
+            raise Http404("Export introuvable")
+        try:
+            return FileResponse(job.fichier.open('rb'), as_attachment=True,
+                                filename=f"fiches_militants_export_{job.pk}.{job.format}")
+        except FileNotFoundError:
+            raise Http404("Fichier d'export introuvable")
+
+@admin.register(Electeur)
+class ElecteurAdmin(admin.ModelAdmin):
+    """Consultation de la liste électorale importée (manage.py importer_liste_electorale)"""
+    list_display = ('numero_electeur', 'nom', 'prenoms', 'sexe', 'date_naissance',
+                    'lieu_naissance', 'commune', 'lieu_vote', 'bureau_vote')
+    search_fields = ('numero_electeur', 'nom_normalise', 'prenoms_normalises')
+    exclude = ('nom_normalise', 'prenoms_normalises', 'lieu_naissance_normalise')
+    show_full_result_count = False  # Évite un COUNT(*) complet sur la liste à chaque recherche
+
 # Garder l'ancien modèle pour compatibilité
 @admin.register(EnquetePolitique)
 class EnquetePolitiqueAdmin(admin.ModelAdmin):
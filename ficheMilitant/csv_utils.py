@@ -1,23 +1,66 @@
 # ficheMilitant/csv_utils.py
 
+import codecs
 import csv
+import hashlib
+import logging
 import os
+import sys
+import threading
+from collections import namedtuple
+from functools import lru_cache
 from django.conf import settings
+from django.core.cache import cache
 from datetime import datetime
 import unicodedata
 
+logger = logging.getLogger(__name__)
+
 # Chemin vers le fichier CSV
-CSV_FILE_PATH = os.path.join(settings.BASE_DIR, 'data', 'sous_prefectures_selection.csv')
+CSV_FILE_PATH = getattr(
+    settings, 'CSV_ELECTEURS_PATH',
+    os.path.join(settings.BASE_DIR, 'data', 'sous_prefectures_selection.csv')
+)
+
+# Latin de base, Latin-1, Latin étendu A/B, API, lettres modificatives et diacritiques combinants
+LIMITE_TABLE_LATINE = 0x370
+TAILLE_MEMO_NORMALISATION = 65536
+
+
+def _sans_accents(text):
+    """Décomposition NFD sans les marques combinantes (catégorie Mn)"""
+    text = unicodedata.normalize('NFD', text)
+    return ''.join(char for char in text if unicodedata.category(char) != 'Mn')
+
+
+# Chaque caractère accentué sous LIMITE_TABLE_LATINE -> sa lettre de base, chaque marque combinante -> rien.
+# La décomposition NFD d'un caractère de cette plage ne contient que des caractères de la plage :
+# str.translate donne donc le même résultat que _sans_accents, sans NFD ni unicodedata.category
+TABLE_LATINE = {
+    code: _sans_accents(chr(code)) or None
+    for code in range(LIMITE_TABLE_LATINE)
+    if _sans_accents(chr(code)) != chr(code)
+}
+
+
+@lru_cache(maxsize=TAILLE_MEMO_NORMALISATION)
+def _normaliser(text):
+    """Normalisation d'un texte non ASCII, mémorisée : les lieux et noms accentués se répètent beaucoup"""
+    if ord(max(text)) < LIMITE_TABLE_LATINE:
+        return text.translate(TABLE_LATINE).upper().strip()
+    # Caractères hors de la table (grec, cyrillique, vietnamien...) : décomposition complète
+    return _sans_accents(text).upper().strip()
+
 
 def normalize_text(text):
     """Normalise le texte pour la comparaison (enlève accents, met en majuscules)"""
     if not text:
         return ""
-    # Enlever les accents
-    text = unicodedata.normalize('NFD', str(text))
-    text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
-    # Mettre en majuscules et enlever les espaces superflus
-    return text.upper().strip()
+    text = str(text)
+    # Sans accent possible : moins cher qu'une consultation du mémo
+    if text.isascii():
+        return text.upper().strip()
+    return _normaliser(text)
 
 def convert_date_format(date_str):
     """Convertit différents formats de date vers DD/MM/YYYY"""
@@ -45,156 +88,346 @@ def convert_date_format(date_str):
 
     return date_str
 
-def verifier_personne_dans_csv(nom, prenoms, date_naissance=None, lieu_naissance=None):
+# Colonnes du CSV reprises dans le résultat d'une recherche
+COLONNES_RESULTAT = [
+    ('nom', 'Nom/Nom de Jeune Fille'),
+    ('prenoms', 'Prenoms'),
+    ('numero_electeur', 'Numero Electeur'),
+    ('sexe', 'Sexe'),
+    ('date_naissance', 'Date de Naissance'),
+    ('lieu_naissance', 'Lieu de Naissance'),
+    ('commune', 'Libelle Commune'),
+    ('lieu_vote', 'Libelle Lieu de Vote'),
+    ('bureau_vote', 'Bureau de vote'),
+    ('profession', 'Profession'),
+    ('adresse', 'Adresse Physique'),
+]
+
+# Colonnes très répétitives : on les interne pour partager les chaînes en mémoire
+COLONNES_INTERNEES = {'sexe', 'lieu_naissance', 'commune', 'lieu_vote', 'bureau_vote', 'profession'}
+
+
+def signature_fichier(path=None):
+    """Retourne (mtime, taille) du fichier, ou None s'il n'existe pas"""
+    try:
+        stat = os.stat(path or CSV_FILE_PATH)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+# latin-1 décode n'importe quel octet : les encodages essayés après lui ne l'étaient jamais
+ENCODAGE_REPLI = 'latin-1'
+TAILLE_BLOC_DETECTION = 1024 * 1024
+
+DescripteurCSV = namedtuple('DescripteurCSV', ['chemin', 'signature', 'encodage', 'delimiteur', 'colonnes'])
+DescripteurCSV.__doc__ = """
+Format d'un fichier de liste électorale, détecté une fois par version du fichier
+(colonnes : noms d'en-tête nettoyés, dans l'ordre du fichier)
+"""
+
+# Dernier descripteur par chemin (processus) ; le cache Django le partage entre workers
+_descripteurs = {}
+_descripteurs_lock = threading.Lock()
+
+
+def _detecter_encodage(chemin):
+    """UTF-8 (avec ou sans BOM) si tout le fichier se décode, sinon latin-1 ; lecture en binaire par blocs"""
+    with open(chemin, 'rb') as fichier:
+        if fichier.read(len(codecs.BOM_UTF8)) == codecs.BOM_UTF8:
+            encodage = 'utf-8-sig'
+        else:
+            encodage = 'utf-8'
+            fichier.seek(0)
+        decodeur = codecs.getincrementaldecoder('utf-8')()
+        try:
+            for bloc in iter(lambda: fichier.read(TAILLE_BLOC_DETECTION), b''):
+                decodeur.decode(bloc)
+            decodeur.decode(b'', final=True)
+        except UnicodeDecodeError:
+            return ENCODAGE_REPLI
+    return encodage
+
+
+def _detecter_format(chemin, signature):
+    encodage = _detecter_encodage(chemin)
+    with open(chemin, 'r', encoding=encodage, newline='') as file:
+        # Lire les premières lignes pour détecter le délimiteur (probablement ;)
+        sample = file.read(1024)
+        file.seek(0)
+        delimiter = ';'
+        if '\t' in sample and ';' not in sample:
+            delimiter = '\t'
+        elif ',' in sample and ';' not in sample:
+            delimiter = ','
+        entete = next(csv.reader(file, delimiter=delimiter), [])
+
+    colonnes = tuple(colonne.strip() for colonne in entete)
+    logger.info("Format du CSV %s : encodage %s, délimiteur %r, %d colonnes",
+                chemin, encodage, delimiter, len(colonnes))
+    return DescripteurCSV(chemin, signature, encodage, delimiter, colonnes)
+
+
+def descripteur_csv(chemin=None):
     """
-    Vérifie si une personne existe dans le fichier CSV
-    Retourne un dictionnaire avec les informations trouvées ou None
+    Encodage, délimiteur et colonnes du CSV, détectés une seule fois par version (mtime/taille)
+    du fichier et partagés par tous les lecteurs. Retourne None si le fichier n'existe pas
+    """
+    chemin = str(chemin or CSV_FILE_PATH)
+    signature = signature_fichier(chemin)
+    if signature is None:
+        return None
+
+    descripteur = _descripteurs.get(chemin)
+    if descripteur is not None and descripteur.signature == signature:
+        return descripteur
+
+    with _descripteurs_lock:
+        descripteur = _descripteurs.get(chemin)
+        if descripteur is None or descripteur.signature != signature:
+            cle = 'electeurs_csv:format:%s:%d:%d' % (hashlib.sha1(chemin.encode()).hexdigest(), *signature)
+            descripteur = cache.get(cle)
+            if descripteur is None:
+                descripteur = _detecter_format(chemin, signature)
+                cache.set(cle, descripteur, None)
+            _descripteurs[chemin] = descripteur
+        return descripteur
+
+
+def lire_lignes(descripteur):
+    """Itère sur les lignes (dictionnaires) du CSV décrit, en une seule lecture du fichier"""
+    with open(descripteur.chemin, 'r', encoding=descripteur.encodage, newline='') as file:
+        reader = csv.reader(file, delimiter=descripteur.delimiteur)
+        next(reader, None)  # en-tête, déjà dans descripteur.colonnes
+        yield from csv.DictReader(file, fieldnames=descripteur.colonnes, delimiter=descripteur.delimiteur)
+
+
+class IndexElectoral:
+    """
+    Index en mémoire de la liste électorale.
+    Les lignes sont regroupées par clé (NOM, PRENOMS) normalisée, la date et le
+    lieu de naissance servant de filtres secondaires sur le (petit) groupe trouvé.
     """
 
-    print(f"[DEBUG] Recherche dans CSV : {nom} {prenoms}, né le {date_naissance} à {lieu_naissance}")
-    print(f"[DEBUG] Fichier CSV : {CSV_FILE_PATH}")
-
-    # Vérifier si le fichier existe
-    if not os.path.exists(CSV_FILE_PATH):
-        print(f"[ERREUR] Fichier CSV non trouvé : {CSV_FILE_PATH}")
-        return {'trouve': False, 'message': 'Fichier CSV non trouvé'}
-
-    # Normaliser les données de recherche
+    def __init__(self, signature=None):
+        self.signature = signature
+        self.entrees = {}
+        self.blocs = {}
+        self.total = 0
+
+    def ajouter(self, row):
+        """Ajoute une ligne du CSV (dictionnaire DictReader) à l'index"""
+        nom_csv = normalize_text(row.get('Nom/Nom de Jeune Fille', ''))
+        prenoms_csv = normalize_text(row.get('Prenoms', ''))
+        if nom_csv and prenoms_csv:
+            self.total += 1
+
+        valeurs = []
+        for cle, colonne in COLONNES_RESULTAT:
+            valeur = row.get(colonne) or ''
+            if cle in COLONNES_INTERNEES:
+                valeur = sys.intern(valeur)
+            valeurs.append(valeur)
+
+        date_csv = (row.get('Date de Naissance') or '').strip()
+        lieu_csv = sys.intern(normalize_text(row.get('Lieu de Naissance', '')))
+        self.entrees.setdefault((nom_csv, prenoms_csv), []).append((date_csv, lieu_csv, tuple(valeurs)))
+
+    def cles(self):
+        """Itère sur les clés (NOM, PRENOMS) normalisées distinctes"""
+        return iter(self.entrees)
+
+    def candidats(self, nom_normalise, prenoms_normalises):
+        """Retourne les entrées (date, lieu normalisé, valeurs) ayant cette clé"""
+        return self.entrees.get((nom_normalise, prenoms_normalises), ())
+
+    def indexer_blocs(self):
+        """Construit les blocs du rapprochement approximatif (fuzzy_utils) sur les clés de l'index"""
+        from .fuzzy_utils import construire_blocs
+        self.blocs = construire_blocs(self.cles())
+
+    def candidats_par_blocs(self, cles_blocs):
+        """Clés (NOM, PRENOMS) rangées dans ces blocs"""
+        for cle in cles_blocs:
+            yield from self.blocs.get(cle, ())
+
+    def rechercher(self, nom, prenoms, date_naissance=None, lieu_naissance=None):
+        """
+        Recherche une personne dans l'index
+        Retourne le même dictionnaire que verifier_personne_dans_csv
+        """
+        return rechercher_dans_candidats(self.candidats, nom, prenoms, date_naissance, lieu_naissance)
+
+    def rechercher_personnes(self, personnes):
+        """Version par lot de rechercher (nom, prenoms, date_naissance, lieu_naissance)"""
+        return [self.rechercher(*personne) for personne in personnes]
+
+
+def rechercher_dans_candidats(candidats, nom, prenoms, date_naissance=None, lieu_naissance=None):
+    """
+    Applique les critères de recherche aux entrées renvoyées par candidats(nom, prenoms)
+    (commun à l'index en mémoire et au snapshot binaire)
+    """
     nom_recherche = normalize_text(nom)
     prenoms_recherche = normalize_text(prenoms)
     date_recherche = convert_date_format(date_naissance) if date_naissance else ""
     lieu_recherche = normalize_text(lieu_naissance) if lieu_naissance else ""
 
-    print(f"[DEBUG] Données normalisées : NOM={nom_recherche}, PRENOMS={prenoms_recherche}, DATE={date_recherche}, LIEU={lieu_recherche}")
-
-    lignes_parcourues = 0
-    personne_trouvee = False
-
-    try:
-        # Essayer différents encodages
-        encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-
-        for encoding in encodings:
-            try:
-                with open(CSV_FILE_PATH, 'r', encoding=encoding) as file:
-                    # Lire les premières lignes pour détecter le délimiteur
-                    sample = file.read(1024)
-                    file.seek(0)
-
-                    # Détecter le délimiteur (probablement ;)
-                    delimiter = ';'  # Par défaut pour votre CSV
-                    if '\t' in sample and ';' not in sample:
-                        delimiter = '\t'
-                    elif ',' in sample and ';' not in sample:
-                        delimiter = ','
-
-                    print(f"[DEBUG] Encodage: {encoding}, Délimiteur détecté: '{delimiter}'")
-
-                    reader = csv.DictReader(file, delimiter=delimiter)
-
-                    # Afficher les colonnes trouvées (une seule fois)
-                    if lignes_parcourues == 0:
-                        print(f"[DEBUG] Colonnes du CSV : {reader.fieldnames}")
-
-                    for row in reader:
-                        lignes_parcourues += 1
-
-                        # Normaliser les données du CSV
-                        nom_csv = normalize_text(row.get('Nom/Nom de Jeune Fille', ''))
-                        prenoms_csv = normalize_text(row.get('Prenoms', ''))
-                        date_csv = row.get('Date de Naissance', '').strip()
-                        lieu_csv = normalize_text(row.get('Lieu de Naissance', ''))
-
-                        # Afficher les premières lignes pour debug
-                        if lignes_parcourues <= 3:
-                            print(f"[DEBUG] Ligne {lignes_parcourues}: {nom_csv} {prenoms_csv}, {date_csv}, {lieu_csv}")
-
-                        # Comparaison exacte (pas de "in", mais égalité)
-                        match_nom = nom_recherche == nom_csv
-                        match_prenoms = prenoms_recherche == prenoms_csv
-
-                        # Si nom et prénoms correspondent exactement
-                        if match_nom and match_prenoms:
-                            print(f"[DEBUG] ✅ Correspondance NOM et PRENOMS trouvée !")
-
-                            # Vérifier les critères supplémentaires si fournis
-                            if date_recherche and date_csv and date_csv != 'inconnu':
-                                if date_recherche != date_csv:
-                                    print(f"[DEBUG] ❌ Date ne correspond pas : {date_recherche} != {date_csv}")
-                                    continue
-                                else:
-                                    print(f"[DEBUG] ✅ Date correspond aussi")
-
-                            if lieu_recherche and lieu_csv and lieu_csv != 'INCONNU':
-                                # Pour le lieu, on peut être plus flexible
-                                if lieu_recherche not in lieu_csv and lieu_csv not in lieu_recherche:
-                                    print(f"[DEBUG] ❌ Lieu ne correspond pas : {lieu_recherche} != {lieu_csv}")
-                                    continue
-                                else:
-                                    print(f"[DEBUG] ✅ Lieu correspond aussi")
-
-                            # Personne trouvée !
-                            personne_trouvee = True
-                            numero_electeur = row.get('Numero Electeur', '').strip()
-
-                            print(f"[DEBUG] 🎉 PERSONNE TROUVÉE ! Numéro électeur : {numero_electeur}")
-
-                            return {
-                                'trouve': True,
-                                'nom': row.get('Nom/Nom de Jeune Fille', ''),
-                                'prenoms': row.get('Prenoms', ''),
-                                'numero_electeur': numero_electeur,
-                                'sexe': row.get('Sexe', ''),
-                                'date_naissance': row.get('Date de Naissance', ''),
-                                'lieu_naissance': row.get('Lieu de Naissance', ''),
-                                'commune': row.get('Libelle Commune', ''),
-                                'lieu_vote': row.get('Libelle Lieu de Vote', ''),
-                                'bureau_vote': row.get('Bureau de vote', ''),
-                                'profession': row.get('Profession', ''),
-                                'adresse': row.get('Adresse Physique', '')
-                            }
-
-                    # Si on arrive ici, la personne n'a pas été trouvée
-                    print(f"[DEBUG] ❌ Personne non trouvée après {lignes_parcourues} lignes")
-                    return {'trouve': False}
-
-            except UnicodeDecodeError:
-                print(f"[DEBUG] Erreur d'encodage avec {encoding}, essai suivant...")
+    for date_csv, lieu_csv, valeurs in candidats(nom_recherche, prenoms_recherche):
+        # Vérifier les critères supplémentaires si fournis
+        if date_recherche and date_csv and date_csv != 'inconnu':
+            if date_recherche != date_csv:
                 continue
-            except Exception as e:
-                print(f"[ERREUR] Erreur avec l'encodage {encoding}: {e}")
+
+        if lieu_recherche and lieu_csv and lieu_csv != 'INCONNU':
+            # Pour le lieu, on peut être plus flexible
+            if lieu_recherche not in lieu_csv and lieu_csv not in lieu_recherche:
                 continue
 
+        resultat = {'trouve': True}
+        resultat.update(zip((cle for cle, _ in COLONNES_RESULTAT), valeurs))
+        resultat['numero_electeur'] = resultat['numero_electeur'].strip()
+        return resultat
+
+    return {'trouve': False}
+
+
+# Index partagé par toutes les requêtes du processus
+_index_electoral = None
+_index_lock = threading.Lock()
+
+
+def construire_index(signature=None, avec_blocs=True):
+    """
+    Lit le CSV une seule fois et construit l'index en mémoire, avec les blocs du
+    rapprochement approximatif (inutiles pour compiler le snapshot, qui les calcule)
+    """
+    descripteur = descripteur_csv()
+    if descripteur is None:
+        raise ValueError(f"Fichier CSV non trouvé : {CSV_FILE_PATH}")
+
+    index = IndexElectoral(signature)
+    for row in lire_lignes(descripteur):
+        index.ajouter(row)
+    if avec_blocs:
+        index.indexer_blocs()
+
+    logger.info("Index électoral construit : %d électeurs (encodage %s)", index.total, descripteur.encodage)
+    return index
+
+
+def obtenir_index_electoral():
+    """
+    Retourne l'index de la liste électorale (snapshot mmap ou index en mémoire),
+    chargé une fois par processus et rechargé si le fichier CSV change (mtime/taille)
+    Retourne None si le fichier n'existe pas
+    """
+    global _index_electoral
+
+    signature = signature_fichier()
+    if signature is None:
+        return None
+
+    index = _index_electoral
+    if index is not None and index.signature == signature:
+        return index
+
+    with _index_lock:
+        # Un autre thread a peut-être déjà reconstruit l'index
+        if _index_electoral is None or _index_electoral.signature != signature:
+            _index_electoral = _charger_index(signature)
+        return _index_electoral
+
+
+def _charger_index(signature):
+    """
+    Utilise le snapshot binaire compilé (manage.py compiler_liste_electorale)
+    s'il correspond au CSV actuel, sinon construit l'index en mémoire
+    """
+    from .snapshot_utils import ouvrir_snapshot
+
+    snapshot = ouvrir_snapshot(signature)
+    if snapshot is not None:
+        logger.info("Snapshot électoral chargé : %d électeurs", snapshot.total)
+        return snapshot
+    return construire_index(signature)
+
+
+def verifier_personne_dans_csv(nom, prenoms, date_naissance=None, lieu_naissance=None):
+    """
+    Vérifie si une personne existe dans le fichier CSV
+    Retourne un dictionnaire avec les informations trouvées ou None
+    """
+    try:
+        index = obtenir_index_electoral()
     except Exception as e:
-        print(f"[ERREUR] Erreur générale lors de la lecture du CSV : {e}")
+        logger.exception("Erreur générale lors de la lecture du CSV : %s", e)
         return {'trouve': False, 'message': str(e)}
 
-    print(f"[DEBUG] Fin de recherche - Personne non trouvée")
-    return {'trouve': False}
+    if index is None:
+        logger.error("Fichier CSV non trouvé : %s", CSV_FILE_PATH)
+        return {'trouve': False, 'message': 'Fichier CSV non trouvé'}
+
+    return index.rechercher(nom, prenoms, date_naissance, lieu_naissance)
+
+def cle_cache_comptage(signature):
+    """Clé du cache de comptage, liée à la version (mtime/taille) du CSV"""
+    return 'electeurs_csv:total:%d:%d' % tuple(signature)
+
 
 def compter_electeurs_csv():
-    """Compte le nombre total d'électeurs dans le CSV"""
-    if not os.path.exists(CSV_FILE_PATH):
-        print(f"[DEBUG] Fichier CSV non trouvé pour comptage")
+    """
+    Compte le nombre total d'électeurs dans le CSV
+    Le résultat est mis en cache (cache Django partagé entre les workers)
+    pour la version courante du fichier
+    """
+    signature = signature_fichier()
+    if signature is None:
+        logger.debug("Fichier CSV non trouvé pour comptage")
         return 0
 
+    cle = cle_cache_comptage(signature)
+    count = cache.get(cle)
+    if count is None:
+        index = _index_electoral
+        if index is not None and index.signature == signature:
+            # L'index de ce processus est déjà à jour : pas besoin de relire le fichier
+            count = index.total
+        else:
+            count = _compter_lignes_csv()
+        cache.set(cle, count, None)
+    return count
+
+
+def invalider_cache_electeurs():
+    """
+    Invalide le comptage en cache et l'index du processus courant
+    À appeler après avoir remplacé ou réimporté la liste électorale
+    """
+    global _index_electoral
+
+    signature = signature_fichier()
+    if signature is not None:
+        cache.delete(cle_cache_comptage(signature))
+    with _index_lock:
+        _index_electoral = None
+    with _descripteurs_lock:
+        _descripteurs.clear()
+
+
+def _compter_lignes_csv():
+    """Parcourt le CSV pour compter les électeurs"""
     count = 0
     try:
-        encodings = ['utf-8', 'latin-1', 'cp1252']
-        for encoding in encodings:
-            try:
-                with open(CSV_FILE_PATH, 'r', encoding=encoding) as file:
-                    # Utiliser ; comme délimiteur par défaut
-                    reader = csv.DictReader(file, delimiter=';')
-                    for row in reader:
-                        if row.get('Nom/Nom de Jeune Fille') and row.get('Prenoms'):
-                            count += 1
-                print(f"[DEBUG] Total électeurs dans CSV : {count}")
-                return count
-            except:
-                continue
+        descripteur = descripteur_csv()
+        if descripteur is None:
+            return 0
+        for row in lire_lignes(descripteur):
+            if row.get('Nom/Nom de Jeune Fille') and row.get('Prenoms'):
+                count += 1
+        logger.debug("Total électeurs dans CSV : %d", count)
     except Exception as e:
-        print(f"[ERREUR] Erreur lors du comptage : {e}")
+        logger.exception("Erreur lors du comptage : %s", e)
 
     return count
 
@@ -205,9 +438,11 @@ def tester_lecture_csv():
     print(f"Chemin du fichier : {CSV_FILE_PATH}")
     print(f"Le fichier existe : {os.path.exists(CSV_FILE_PATH)}")
 
-    if os.path.exists(CSV_FILE_PATH):
+    descripteur = descripteur_csv()
+    if descripteur is not None:
+        print(f"Encodage : {descripteur.encodage}, délimiteur : {descripteur.delimiteur!r}")
         try:
-            with open(CSV_FILE_PATH, 'r', encoding='utf-8') as file:
+            with open(CSV_FILE_PATH, 'r', encoding=descripteur.encodage) as file:
                 # Lire les 5 premières lignes
                 for i, line in enumerate(file):
                     if i >= 5:
@@ -0,0 +1,165 @@
+# ficheMilitant/electeurs_utils.py
+
+import operator
+from datetime import datetime
+from functools import reduce
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .csv_utils import (
+    normalize_text, convert_date_format, verifier_personne_dans_csv, compter_electeurs_csv,
+)
+from .models import Electeur
+
+# Nombre d'électeurs en base, mis en cache jusqu'au prochain import
+CLE_CACHE_TOTAL_BASE = 'electeurs_base:total'
+
+
+def parse_date_csv(date_str):
+    """Convertit une date DD/MM/YYYY du CSV en date (None si inconnue ou invalide)"""
+    date_str = (date_str or '').strip()
+    try:
+        return datetime.strptime(date_str, '%d/%m/%Y').date()
+    except ValueError:
+        return None
+
+
+def electeur_depuis_ligne(row):
+    """Construit un Electeur (non sauvegardé) à partir d'une ligne du CSV"""
+    nom = (row.get('Nom/Nom de Jeune Fille') or '').strip()
+    prenoms = (row.get('Prenoms') or '').strip()
+    lieu_naissance = (row.get('Lieu de Naissance') or '').strip()
+
+    return Electeur(
+        numero_electeur=(row.get('Numero Electeur') or '').strip(),
+        nom=nom,
+        prenoms=prenoms,
+        sexe=(row.get('Sexe') or '').strip(),
+        date_naissance=parse_date_csv(row.get('Date de Naissance')),
+        lieu_naissance=lieu_naissance,
+        profession=(row.get('Profession') or '').strip(),
+        adresse=(row.get('Adresse Physique') or '').strip(),
+        commune=(row.get('Libelle Commune') or '').strip(),
+        lieu_vote=(row.get('Libelle Lieu de Vote') or '').strip(),
+        bureau_vote=(row.get('Bureau de vote') or '').strip(),
+        nom_normalise=normalize_text(nom),
+        prenoms_normalises=normalize_text(prenoms),
+        lieu_naissance_normalise=normalize_text(lieu_naissance),
+    )
+
+
+def resultat_depuis_electeur(electeur):
+    """Même dictionnaire que verifier_personne_dans_csv"""
+    return {
+        'trouve': True,
+        'nom': electeur.nom,
+        'prenoms': electeur.prenoms,
+        'numero_electeur': electeur.numero_electeur,
+        'sexe': electeur.sexe,
+        'date_naissance': electeur.date_naissance.strftime('%d/%m/%Y') if electeur.date_naissance else '',
+        'lieu_naissance': electeur.lieu_naissance,
+        'commune': electeur.commune,
+        'lieu_vote': electeur.lieu_vote,
+        'bureau_vote': electeur.bureau_vote,
+        'profession': electeur.profession,
+        'adresse': electeur.adresse,
+    }
+
+
+def _date_recherchee(date_naissance):
+    """Date de naissance saisie sous forme de date (None si absente ou invalide)"""
+    if date_naissance and not hasattr(date_naissance, 'strftime'):
+        return parse_date_csv(convert_date_format(date_naissance))
+    return date_naissance or None
+
+
+def _premier_correspondant(electeurs, date_recherche, lieu_recherche):
+    """Premier électeur compatible avec la date et le lieu (mêmes critères que le CSV)"""
+    for electeur in electeurs:
+        # Une date inconnue dans la liste ne disqualifie pas la personne
+        if date_recherche and electeur.date_naissance and electeur.date_naissance != date_recherche:
+            continue
+        lieu_csv = electeur.lieu_naissance_normalise
+        if lieu_recherche and lieu_csv and lieu_csv != 'INCONNU':
+            if lieu_recherche not in lieu_csv and lieu_csv not in lieu_recherche:
+                continue
+        return resultat_depuis_electeur(electeur)
+    return {'trouve': False}
+
+
+def verifier_personne_en_base(nom, prenoms, date_naissance=None, lieu_naissance=None):
+    """
+    Recherche une personne dans la table Electeur (une seule requête indexée)
+    Mêmes critères que la recherche dans le CSV
+    """
+    electeurs = Electeur.objects.filter(
+        nom_normalise=normalize_text(nom),
+        prenoms_normalises=normalize_text(prenoms),
+    )
+
+    date_recherche = _date_recherchee(date_naissance)
+    if date_recherche:
+        electeurs = electeurs.filter(Q(date_naissance=date_recherche) | Q(date_naissance__isnull=True))
+
+    lieu_recherche = normalize_text(lieu_naissance) if lieu_naissance else ""
+    return _premier_correspondant(electeurs.order_by('id'), date_recherche, lieu_recherche)
+
+
+def verifier_personnes_en_base(personnes):
+    """
+    Recherche un lot de personnes (nom, prenoms, date_naissance, lieu_naissance)
+    avec une seule requête sur la table Electeur
+    Retourne les résultats dans l'ordre du lot
+    """
+    cles = [(normalize_text(nom), normalize_text(prenoms)) for nom, prenoms, _, _ in personnes]
+
+    groupes = {}
+    if cles:
+        # Un couple (NOM, PRENOMS) par condition : nom__in et prenoms__in croiseraient tous les noms et prénoms du lot
+        condition = reduce(operator.or_, (Q(nom_normalise=nom, prenoms_normalises=prenoms)
+                                          for nom, prenoms in dict.fromkeys(cles)))
+        for electeur in Electeur.objects.filter(condition).order_by('id').iterator():
+            groupes.setdefault((electeur.nom_normalise, electeur.prenoms_normalises), []).append(electeur)
+
+    resultats = []
+    for cle, (_, _, date_naissance, lieu_naissance) in zip(cles, personnes):
+        lieu_recherche = normalize_text(lieu_naissance) if lieu_naissance else ""
+        resultats.append(_premier_correspondant(groupes.get(cle, ()), _date_recherchee(date_naissance), lieu_recherche))
+    return resultats
+
+
+def compter_electeurs_base():
+    """Nombre d'électeurs importés en base (mis en cache)"""
+    total = cache.get(CLE_CACHE_TOTAL_BASE)
+    if total is None:
+        total = Electeur.objects.count()
+        cache.set(CLE_CACHE_TOTAL_BASE, total, None)
+    return total
+
+
+def invalider_cache_base():
+    """À appeler après un import de la liste électorale en base"""
+    cache.delete(CLE_CACHE_TOTAL_BASE)
+
+
+def verifier_personne(nom, prenoms, date_naissance=None, lieu_naissance=None):
+    """
+    Vérifie si une personne figure sur la liste électorale
+    Utilise la table Electeur si elle a été importée, sinon le fichier CSV
+    """
+    if compter_electeurs_base():
+        return verifier_personne_en_base(nom, prenoms, date_naissance, lieu_naissance)
+    return verifier_personne_dans_csv(nom, prenoms, date_naissance, lieu_naissance)
+
+
+def verifier_personnes(personnes):
+    """Version par lot de verifier_personne (même résultat, dans l'ordre du lot)"""
+    if compter_electeurs_base():
+        return verifier_personnes_en_base(personnes)
+    return [verifier_personne_dans_csv(*personne) for personne in personnes]
+
+
+def compter_electeurs():
+    """Nombre d'électeurs de la liste (base si importée, sinon CSV)"""
+    return compter_electeurs_base() or compter_electeurs_csv()
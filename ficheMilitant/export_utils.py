@@ -0,0 +1,203 @@
+# ficheMilitant/export_utils.py
+
+import csv
+import io
+import os
+import secrets
+
+from django.contrib.admin.utils import prepare_lookup_value
+from django.contrib.admin.views.main import ERROR_FLAG, IGNORED_PARAMS, PAGE_VAR, SEARCH_VAR
+
+from .models import FicheMilitant
+from .stockage_utils import stockage_exports
+
+EN_TETES_EXPORT = [
+    'Nom', 'Prénoms', 'Date Naissance', 'Lieu Naissance',
+    'Sexe', 'Contacts', 'Section', 'Comité de Base',
+    'Dans CSV', 'N° Électeur CSV', 'A Photo', 'Enquêteur', 'Date Soumission'
+]
+
+# Seules les colonnes exportées sont lues (pas d'instances de modèle)
+CHAMPS_EXPORT = (
+    'nom', 'prenoms', 'date_naissance', 'lieu_naissance', 'sexe', 'contacts',
+    'section', 'comite_base', 'est_dans_csv', 'numero_electeur_csv', 'photo',
+    'enqueteur__prenom', 'enqueteur__nom', 'date_soumission',
+)
+
+
+def lignes_export(queryset, chunk_size=2000):
+    """Itère sur les lignes à exporter, en lisant la base par paquets de chunk_size"""
+    sexes = dict(FicheMilitant.SEXE_CHOICES)
+    valeurs = queryset.select_related('enqueteur').values_list(*CHAMPS_EXPORT)
+
+    for (nom, prenoms, date_naissance, lieu_naissance, sexe, contacts, section, comite_base,
+         est_dans_csv, numero_electeur_csv, photo, enqueteur_prenom, enqueteur_nom,
+         date_soumission) in valeurs.iterator(chunk_size=chunk_size):
+        yield [
+            nom,
+            prenoms,
+            date_naissance.strftime('%d/%m/%Y') if date_naissance else '',
+            lieu_naissance or '',
+            sexes.get(sexe, sexe),
+            contacts,
+            section,
+            comite_base,
+            'Oui' if est_dans_csv else 'Non',
+            numero_electeur_csv or '',
+            'Oui' if photo else 'Non',
+            f"{enqueteur_prenom} {enqueteur_nom}",
+            date_soumission.strftime('%d/%m/%Y %H:%M'),
+        ]
+
+
+def flux_csv(lignes, en_tetes=EN_TETES_EXPORT, lignes_par_paquet=500):
+    """
+    Génère le CSV par morceaux de texte (BOM pour Excel, puis en-tête et lignes)
+    Les lignes sont regroupées par paquets pour éviter un morceau par ligne
+    """
+    tampon = io.StringIO()
+    writer = csv.writer(tampon)
+
+    tampon.write('\ufeff')  # BOM pour Excel
+    writer.writerow(en_tetes)
+
+    for numero, ligne in enumerate(lignes, 1):
+        writer.writerow(ligne)
+        if numero % lignes_par_paquet == 0:
+            yield tampon.getvalue()
+            tampon.seek(0)
+            tampon.truncate()
+
+    yield tampon.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# Exports en arrière-plan (ExportJob, manage.py traiter_exports)
+# ---------------------------------------------------------------------------
+
+FICHES_PAR_LOT = 2000
+
+
+def parametres_selection(requete, queryset, toute_la_liste):
+    """
+    Paramètres d'un export demandé depuis la liste de l'admin
+    Sélection de la page : ses identifiants (une page au plus) ; toute la liste :
+    les filtres et la recherche de la liste, rejoués par le worker
+    """
+    if not toute_la_liste:
+        return {'ids': list(queryset.order_by('id').values_list('id', flat=True))}
+    ignores = (*IGNORED_PARAMS, PAGE_VAR, ERROR_FLAG)
+    return {
+        'filtres': {cle: valeur for cle, valeur in requete.GET.items() if cle not in ignores},
+        'recherche': requete.GET.get(SEARCH_VAR, ''),
+    }
+
+
+def fiches_du_job(job):
+    """Fiches d'un export (les filtres sont appliqués au moment de l'export)"""
+    parametres = job.parametres
+    if 'ids' in parametres:
+        return FicheMilitant.objects.filter(id__in=parametres['ids'])
+
+    from .admin import FicheMilitantAdmin
+    from django.contrib import admin
+
+    queryset = FicheMilitant.objects.filter(**{
+        cle: prepare_lookup_value(cle, valeur) for cle, valeur in parametres.get('filtres', {}).items()
+    })
+    if parametres.get('recherche'):
+        queryset, doublons = FicheMilitantAdmin(FicheMilitant, admin.site).get_search_results(
+            None, queryset, parametres['recherche']
+        )
+        if doublons:
+            queryset = queryset.distinct()
+    return queryset
+
+
+def lignes_job(job, chunk_size=FICHES_PAR_LOT):
+    """
+    Lignes d'un export, lues par lots dans l'ordre des identifiants (pagination par clé)
+    La progression est enregistrée après chaque lot
+    """
+    fiches = fiches_du_job(job).order_by('id')
+    exportees = 0
+    dernier_id = 0
+    while True:
+        lot = list(fiches.filter(id__gt=dernier_id).values_list('id', flat=True)[:chunk_size])
+        if not lot:
+            break
+        dernier_id = lot[-1]
+        for ligne in lignes_export(FicheMilitant.objects.filter(id__in=lot).order_by('id'), chunk_size=chunk_size):
+            exportees += 1
+            yield ligne
+        type(job).objects.filter(pk=job.pk).update(progression=exportees)
+    job.progression = exportees
+
+
+def ecrire_csv(lignes, chemin):
+    with open(chemin, 'w', encoding='utf-8', newline='') as fichier:
+        for morceau in flux_csv(lignes):
+            fichier.write(morceau)
+
+
+def ecrire_xlsx(lignes, chemin):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise RuntimeError("L'export XLSX nécessite le paquet openpyxl (pip install openpyxl)")
+
+    # Mode write_only : les lignes sont écrites au fil de l'eau, sans garder la feuille en mémoire
+    classeur = Workbook(write_only=True)
+    feuille = classeur.create_sheet('Fiches')
+    feuille.append(EN_TETES_EXPORT)
+    for ligne in lignes:
+        feuille.append(ligne)
+    classeur.save(chemin)
+
+
+def ecrire_parquet(lignes, chemin, lignes_par_groupe=FICHES_PAR_LOT):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("L'export Parquet nécessite le paquet pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([(en_tete, pa.string()) for en_tete in EN_TETES_EXPORT])
+    with pq.ParquetWriter(chemin, schema) as writer:
+        groupe = []
+        for ligne in lignes:
+            groupe.append(ligne)
+            if len(groupe) >= lignes_par_groupe:
+                writer.write_table(pa.Table.from_pylist([dict(zip(EN_TETES_EXPORT, l)) for l in groupe], schema))
+                groupe = []
+        if groupe:
+            writer.write_table(pa.Table.from_pylist([dict(zip(EN_TETES_EXPORT, l)) for l in groupe], schema))
+
+
+ECRIVAINS = {
+    'csv': ecrire_csv,
+    'xlsx': ecrire_xlsx,
+    'parquet': ecrire_parquet,
+}
+
+
+def generer_export(job):
+    """
+    Construit le fichier d'un ExportJob dans EXPORTS_ROOT, sous un nom aléatoire
+    (les exports contiennent des données personnelles) ; retourne ce nom
+    Le fichier est écrit sous un nom temporaire puis renommé une fois complet
+    """
+    os.makedirs(stockage_exports.location, exist_ok=True)
+
+    nom = f"{secrets.token_urlsafe(16)}.{job.format}"
+    chemin = stockage_exports.path(nom)
+    chemin_tmp = f"{chemin}.tmp"
+
+    try:
+        ECRIVAINS[job.format](lignes_job(job), chemin_tmp)
+        os.replace(chemin_tmp, chemin)
+    finally:
+        if os.path.exists(chemin_tmp):
+            os.remove(chemin_tmp)
+
+    return nom
@@ -1,15 +1,25 @@
 # ficheMilitant/forms.py
 
 from django import forms
-from .models import FicheMilitant, EnquetePolitique
+from .models import FicheMilitant, EnquetePolitique, TeleversementPhoto
+from .image_utils import PHOTO_MAX_SIZE, PHOTO_QUALITE, preparer_photo
+from .televersement_utils import ouvrir_televersement, supprimer_televersement
 from django.core.exceptions import ValidationError
 import os
 from django.conf import settings
 
 class FicheMilitantForm(forms.ModelForm):
+    # Photo déjà envoyée par morceaux (api/photos/...) : la fiche n'en porte que le token
+    photo_token = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
     class Meta:
         model = FicheMilitant
-        exclude = ['enqueteur']  # Exclure le champ enqueteur du formulaire
+        exclude = ['enqueteur', 'photo_statut', 'miniatures_generees']  # Champs renseignés par la vue, pas par l'enquêteur
+        # forms.ImageField ouvrirait et vérifierait déjà l'image avec Pillow :
+        # la seule ouverture est faite dans clean_photo, après les contrôles de taille
+        field_classes = {
+            'photo': forms.FileField,
+        }
         widgets = {
             'date_naissance': forms.DateInput(attrs={'type': 'date'}),
             'sexe': forms.Select(),
@@ -23,6 +33,10 @@ class FicheMilitantForm(forms.ModelForm):
             'a_recepisse': forms.CheckboxInput(),
             'aucune_piece': forms.CheckboxInput(),
 
+            # Clé d'idempotence tirée par le navigateur à chaque nouvelle fiche : la page
+            # peut venir du cache hors ligne, une clé rendue par le serveur y serait réutilisée
+            'cle_idempotence': forms.HiddenInput(),
+
             # Widget pour la photo
             'photo': forms.FileInput(attrs={
                 'accept': 'image/*',
@@ -31,8 +45,11 @@ class FicheMilitantForm(forms.ModelForm):
             }),
         }
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, enqueteur=None, **kwargs):
         super().__init__(*args, **kwargs)
+        self.enqueteur = enqueteur
+        self.photo_preparee = None
+        self.televersement = None
 
         # Champs obligatoires selon le PDF (marqués avec *)
         required_fields = [
@@ -59,12 +76,49 @@ class FicheMilitantForm(forms.ModelForm):
         self.fields['photo'].widget.attrs.update({
             'accept': 'image/jpeg,image/jpg,image/png,image/gif,image/bmp',
             'data-max-size': '5242880',  # 5MB
+            # Réduction dans le navigateur avant l'envoi, aux mêmes réglages que le serveur
+            'data-largeur-max': PHOTO_MAX_SIZE[0],
+            'data-hauteur-max': PHOTO_MAX_SIZE[1],
+            'data-qualite': PHOTO_QUALITE,
         })
 
     def clean_photo(self):
         """Validation personnalisée pour le champ photo"""
-        photo = self.cleaned_data.get('photo')
-
+        return self.valider_photo(self.cleaned_data.get('photo'))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        token = cleaned_data.get('photo_token')
+        if token and not cleaned_data.get('photo') and 'photo' not in self.errors:
+            televersement = TeleversementPhoto.objects.filter(token=token, enqueteur=self.enqueteur).first()
+            if televersement is None or not televersement.termine:
+                self.add_error('photo', "L'envoi de la photo n'est pas terminé, veuillez la renvoyer.")
+            else:
+                fichier = ouvrir_televersement(televersement)
+                try:
+                    cleaned_data['photo'] = self.valider_photo(fichier)
+                    self.televersement = televersement
+                except ValidationError as e:
+                    fichier.close()
+                    self.add_error('photo', e)
+        return cleaned_data
+
+    def full_clean(self):
+        super().full_clean()
+        if self.televersement is not None and self._errors:
+            # Formulaire refusé : la photo assemblée ne sera pas utilisée, le téléversement reste repris
+            self.cleaned_data['photo'].close()
+            self.televersement = None
+
+    def liberer_televersement(self):
+        """Après enregistrement de la fiche : supprime le téléversement dont la photo a été copiée"""
+        if self.televersement is not None:
+            self.cleaned_data['photo'].close()
+            supprimer_televersement(self.televersement)
+            self.televersement = None
+
+    def valider_photo(self, photo):
+        """Contrôles de la photo, qu'elle soit dans le formulaire ou envoyée par morceaux"""
         if photo:
             # Vérifier la taille du fichier
             if photo.size > getattr(settings, 'MAX_IMAGE_SIZE', 5242880):  # 5MB par défaut
@@ -77,13 +131,12 @@ class FicheMilitantForm(forms.ModelForm):
             if ext not in allowed_extensions:
                 raise ValidationError(f"Format de fichier non autorisé. Formats acceptés : {', '.join(allowed_extensions)}")
 
-            # Vérifier que c'est bien une image
+            # Vérifier que c'est bien une image : la photo n'est ouverte qu'une fois,
+            # le résultat (dimensions, version optimisée) est transmis à la vue
             try:
-                from PIL import Image
-                image = Image.open(photo)
-                image.verify()
-                # Remettre le pointeur au début du fichier
-                photo.seek(0)
+                self.photo_preparee = preparer_photo(
+                    photo, optimiser=not getattr(settings, 'PHOTO_TRAITEMENT_ASYNCHRONE', True)
+                )
             except Exception:
                 raise ValidationError("Le fichier sélectionné n'est pas une image valide.")
 
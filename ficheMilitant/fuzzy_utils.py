@@ -0,0 +1,234 @@
+# ficheMilitant/fuzzy_utils.py
+
+"""
+Rapprochement approximatif (orthographe, phonétique) avec la liste électorale.
+
+Chaque (NOM, PRENOMS) de la liste est rangé dans de petits "blocs" :
+    - par codes phonétiques triés de tous les mots (KOUASSI/KOASSI, prénoms
+      inversés ou nom et prénoms permutés tombent dans le même bloc)
+    - pour chaque mot, par les autres mots et la longueur du mot omis : une
+      faute de frappe (lettre supprimée, ajoutée ou remplacée) ne touche
+      qu'un mot, la clé qui l'omet reste la même à une lettre près
+Une recherche ne note (distance d'édition) que les clés des blocs de la
+personne cherchée, jamais toute la liste.
+
+Les clés sont précalculées dans la source active de la liste : table
+BlocElectoral (importer_liste_electorale), section du snapshot
+(compiler_liste_electorale), ou index en mémoire construit avec lui.
+Rien n'est construit pendant une requête en plus de l'index exact.
+"""
+
+import logging
+import re
+from functools import lru_cache
+
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .csv_utils import normalize_text, obtenir_index_electoral
+from .electeurs_utils import compter_electeurs_base, verifier_personne_en_base, verifier_personnes_en_base
+from .models import BlocElectoral
+
+logger = logging.getLogger(__name__)
+
+# Au-delà, un bloc est trop générique pour être discriminant : on le tronque
+TAILLE_MAX_BLOC = 2000
+LONGUEUR_MAX_CLE = 255  # BlocElectoral.cle
+SCORE_MINIMUM = 0.75
+
+_REMPLACEMENTS = [
+    (re.compile(r'PH'), 'F'),
+    (re.compile(r'QU|Q|CK'), 'K'),
+    (re.compile(r'C(?=[EIY])'), 'S'),
+    (re.compile(r'C'), 'K'),
+    (re.compile(r'GU(?=[EI])'), 'G'),
+    (re.compile(r'Z'), 'S'),
+    (re.compile(r'W'), 'V'),
+    (re.compile(r'Y'), 'I'),
+    (re.compile(r'H'), ''),
+    (re.compile(r'[^A-Z]'), ''),
+]
+_VOYELLES = re.compile(r'[AEIOU]')
+_DOUBLES = re.compile(r'(.)\1+')
+
+
+@lru_cache(maxsize=65536)
+def code_phonetique(mot):
+    """Code phonétique simplifié (français) d'un mot déjà normalisé"""
+    for motif, remplacement in _REMPLACEMENTS:
+        mot = motif.sub(remplacement, mot)
+    if not mot:
+        return ''
+    # On garde la première lettre, on retire les voyelles suivantes et les doublons
+    return _DOUBLES.sub(r'\1', mot[0] + _VOYELLES.sub('', mot[1:]))
+
+
+def cles_de_blocage(nom, prenoms):
+    """Clés de blocs d'une personne de la liste (nom et prénoms normalisés)"""
+    mots = (nom + ' ' + prenoms).split()
+    cles = ['P:' + ' '.join(sorted(code_phonetique(mot) for mot in mots))]
+    # Avec un seul mot, la clé "autres mots" serait vide : tout le monde de même longueur
+    if len(mots) > 1:
+        for position, mot in enumerate(mots):
+            autres = ' '.join(sorted(mots[:position] + mots[position + 1:]))
+            cles.append(f"O:{len(mot)}:{autres}")
+    return [cle[:LONGUEUR_MAX_CLE] for cle in cles]
+
+
+def cles_de_recherche(nom, prenoms):
+    """Clés à consulter pour une personne cherchée : celles de cles_de_blocage, le mot omis à une lettre près"""
+    mots = (nom + ' ' + prenoms).split()
+    cles = {'P:' + ' '.join(sorted(code_phonetique(mot) for mot in mots))}
+    if len(mots) > 1:
+        for position, mot in enumerate(mots):
+            autres = ' '.join(sorted(mots[:position] + mots[position + 1:]))
+            for longueur in (len(mot) - 1, len(mot), len(mot) + 1):
+                cles.add(f"O:{longueur}:{autres}")
+    return sorted({cle[:LONGUEUR_MAX_CLE] for cle in cles})
+
+
+def construire_blocs(cles):
+    """Blocs en mémoire {clé de bloc: [(nom, prenoms), ...]} des clés (NOM, PRENOMS) de la liste"""
+    blocs = {}
+    for nom, prenoms in cles:
+        for cle in cles_de_blocage(nom, prenoms):
+            bloc = blocs.setdefault(cle, [])
+            if len(bloc) < TAILLE_MAX_BLOC:
+                bloc.append((nom, prenoms))
+    return blocs
+
+
+def blocs_en_base(nom, prenoms):
+    """Lignes BlocElectoral (non sauvegardées) d'un (NOM, PRENOMS) normalisé de la table Electeur"""
+    # KOUASSI KOUASSI produit deux fois la même clé "autres mots"
+    return [BlocElectoral(cle=cle, nom_normalise=nom, prenoms_normalises=prenoms)
+            for cle in dict.fromkeys(cles_de_blocage(nom, prenoms))]
+
+
+def distance_edition(a, b):
+    """Distance de Levenshtein (programmation dynamique sur deux lignes)"""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    precedente = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        courante = [i]
+        for j, cb in enumerate(b, 1):
+            courante.append(min(precedente[j] + 1, courante[j - 1] + 1,
+                                precedente[j - 1] + (ca != cb)))
+        precedente = courante
+    return precedente[-1]
+
+
+def similarite(a, b):
+    """Similarité entre 0 et 1 dérivée de la distance d'édition"""
+    if not a and not b:
+        return 1.0
+    return 1.0 - distance_edition(a, b) / max(len(a), len(b))
+
+
+def borne_similarite(a, b):
+    """Majorant de similarite(a, b) calculé sur les seules longueurs"""
+    longueur = max(len(a), len(b))
+    return 1.0 - abs(len(a) - len(b)) / longueur if longueur else 1.0
+
+
+def score_rapprochement(nom, prenoms, nom_candidat, prenoms_candidat, score_minimum=0.0):
+    """
+    Score entre deux personnes : le meilleur entre l'ordre donné et
+    les mots triés (prénoms inversés, nom et prénoms permutés)
+    Retourne 0 sans calculer de distance si le score minimum est hors d'atteinte
+    """
+    mots = ' '.join(sorted((nom + ' ' + prenoms).split()))
+    mots_candidat = ' '.join(sorted((nom_candidat + ' ' + prenoms_candidat).split()))
+    if borne_similarite(mots, mots_candidat) < score_minimum:
+        return 0.0
+
+    score = similarite(mots, mots_candidat)
+    if (borne_similarite(nom, nom_candidat) + borne_similarite(prenoms, prenoms_candidat)) / 2 > score:
+        score = max(score, (similarite(nom, nom_candidat) + similarite(prenoms, prenoms_candidat)) / 2)
+    return score
+
+
+class BlocsEnBase:
+    """Source de la liste importée en base : blocs de BlocElectoral, recherche dans Electeur"""
+
+    def candidats_par_blocs(self, cles):
+        # Comme construire_blocs : chaque bloc tronqué à ses TAILLE_MAX_BLOC premières lignes importées
+        rang = Window(RowNumber(), partition_by=F('cle'), order_by=F('id').asc())
+        return (BlocElectoral.objects.filter(cle__in=cles).annotate(rang=rang)
+                .filter(rang__lte=TAILLE_MAX_BLOC).values_list('nom_normalise', 'prenoms_normalises'))
+
+    def rechercher(self, nom, prenoms, date_naissance=None, lieu_naissance=None):
+        return verifier_personne_en_base(nom, prenoms, date_naissance, lieu_naissance)
+
+    def rechercher_personnes(self, personnes):
+        return verifier_personnes_en_base(personnes)
+
+
+class MoteurRapprochement:
+    """
+    Rapprochement sur une source de la liste : IndexElectoral, SnapshotElectoral ou BlocsEnBase
+    (candidats_par_blocs(cles), rechercher(nom, prenoms, date, lieu) et sa version par lot rechercher_personnes)
+    """
+
+    def __init__(self, source):
+        self.source = source
+
+    def candidats(self, nom, prenoms):
+        """Clés de la liste partageant au moins un bloc avec la personne"""
+        return set(self.source.candidats_par_blocs(cles_de_recherche(nom, prenoms)))
+
+    def rechercher(self, nom, prenoms, date_naissance=None, lieu_naissance=None,
+                   limite=5, score_minimum=SCORE_MINIMUM):
+        """
+        Retourne les personnes les plus proches, triées par score décroissant
+        Chaque résultat a la forme de verifier_personne_dans_csv plus une clé 'score'
+        """
+        nom = normalize_text(nom)
+        prenoms = normalize_text(prenoms)
+
+        notes = []
+        for nom_candidat, prenoms_candidat in self.candidats(nom, prenoms):
+            score = score_rapprochement(nom, prenoms, nom_candidat, prenoms_candidat, score_minimum)
+            if score >= score_minimum:
+                notes.append((score, nom_candidat, prenoms_candidat))
+        notes.sort(reverse=True)
+
+        # La date et le lieu restent des filtres, comme pour la recherche exacte ; en base, une seule requête
+        trouves = self.source.rechercher_personnes([(nom_candidat, prenoms_candidat, date_naissance, lieu_naissance)
+                                                    for _, nom_candidat, prenoms_candidat in notes])
+        resultats = []
+        for (score, _, _), resultat in zip(notes, trouves):
+            if resultat.get('trouve'):
+                resultat['score'] = round(score, 3)
+                resultats.append(resultat)
+                if len(resultats) >= limite:
+                    break
+        return resultats
+
+
+def obtenir_moteur():
+    """
+    Moteur de rapprochement sur la source active de la liste (comme verifier_personne) :
+    table Electeur si elle a été importée, sinon snapshot ou index du CSV. Retourne None sans liste
+    """
+    if compter_electeurs_base():
+        return MoteurRapprochement(BlocsEnBase())
+    index = obtenir_index_electoral()
+    if index is None:
+        return None
+    return MoteurRapprochement(index)
+
+
+def rechercher_candidats_proches(nom, prenoms, date_naissance=None, lieu_naissance=None, limite=5):
+    """Personnes de la liste proches de celle recherchée, avec leur score"""
+    try:
+        moteur = obtenir_moteur()
+    except Exception as e:
+        logger.exception("Rapprochement approximatif impossible : %s", e)
+        return []
+    if moteur is None:
+        return []
+    return moteur.rechercher(nom, prenoms, date_naissance, lieu_naissance, limite=limite)
@@ -0,0 +1,216 @@
+# ficheMilitant/image_utils.py
+
+import logging
+import math
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import ExifTags, Image, ImageOps, features
+
+from .log_utils import mesure
+from .stockage_utils import PREFIXE_MINIATURES
+
+logger = logging.getLogger(__name__)
+
+# Taille et qualité des photos stockées ; le formulaire les transmet au navigateur,
+# qui réduit la photo avant l'envoi
+PHOTO_MAX_SIZE = tuple(getattr(settings, 'PHOTO_MAX_SIZE', (800, 800)))
+PHOTO_QUALITE = getattr(settings, 'PHOTO_QUALITE', 85)
+
+# Dérivés de taille fixe générés pour l'admin (liste et aperçu)
+TAILLES_MINIATURES = (64, 256)
+WEBP_DISPONIBLE = features.check('webp')
+
+
+def taille_cible(taille, max_size):
+    """Taille finale en conservant les proportions dans max_size (jamais agrandie)"""
+    largeur, hauteur = taille
+    ratio = min(max_size[0] / largeur, max_size[1] / hauteur)
+    if ratio >= 1:
+        return taille
+    return (max(1, math.ceil(largeur * ratio - 0.5)), max(1, math.ceil(hauteur * ratio - 0.5)))
+
+
+def optimiser_image_ouverte(img, max_size=PHOTO_MAX_SIZE, quality=PHOTO_QUALITE):
+    """
+    Produit le JPEG optimisé d'une image déjà ouverte (en-tête lu, pixels non décodés)
+    Les JPEG sont décodés directement à échelle réduite (draft), puis réduits
+    d'un facteur entier (reduce) avant le rééchantillonnage final LANCZOS ;
+    l'orientation EXIF des photos de téléphone est appliquée
+    """
+    orientation = img.getexif().get(ExifTags.Base.Orientation, 1)
+
+    if img.format == 'JPEG':
+        # Orientations 5 à 8 : l'image stockée est tournée d'un quart de tour
+        boite = max_size if orientation < 5 else (max_size[1], max_size[0])
+        img.draft('RGB', taille_cible(img.size, boite))
+
+    img = ImageOps.exif_transpose(img)
+
+    # Convertir en RGB si nécessaire
+    if img.mode in ('RGBA', 'LA', 'P'):
+        img = img.convert('RGB')
+
+    # Redimensionner si l'image est trop grande
+    cible = taille_cible(img.size, max_size)
+    if cible != img.size:
+        facteur = min(img.width // (cible[0] * 2), img.height // (cible[1] * 2))
+        if facteur > 1:
+            img = img.reduce(facteur)
+        img = img.resize(cible, Image.Resampling.LANCZOS)
+
+    # Sauvegarder dans un buffer
+    buffer = BytesIO()
+    img.save(buffer, format='JPEG', quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def optimize_image(image_file, max_size=PHOTO_MAX_SIZE, quality=PHOTO_QUALITE):
+    """
+    Optimise une image en la redimensionnant et en réduisant la qualité
+    """
+    try:
+        with Image.open(image_file) as img:
+            return ContentFile(optimiser_image_ouverte(img, max_size, quality))
+    except Exception as e:
+        logger.warning("Erreur lors de l'optimisation de l'image : %s", e)
+        return image_file
+
+
+def est_deja_optimisee(img, max_size=PHOTO_MAX_SIZE):
+    """
+    JPEG déjà dans max_size, sans rotation EXIF à appliquer (photo réduite par
+    le navigateur) : le réencoder ne ferait que perdre en qualité et en temps
+    """
+    return (
+        img.format == 'JPEG'
+        and img.mode in ('RGB', 'L')
+        and img.width <= max_size[0] and img.height <= max_size[1]
+        and img.getexif().get(ExifTags.Base.Orientation, 1) == 1
+    )
+
+
+class PhotoPreparee:
+    """Résultat de l'unique ouverture d'une photo envoyée (formulaire -> vue)"""
+
+    def __init__(self, format, largeur, hauteur, contenu=None):
+        self.format = format
+        self.largeur = largeur
+        self.hauteur = hauteur
+        # JPEG optimisé (ou la photo elle-même si elle l'était déjà),
+        # None si l'optimisation est laissée au worker
+        self.contenu = contenu
+
+    @property
+    def optimisee(self):
+        return self.contenu is not None
+
+
+def preparer_photo(fichier, optimiser=False, max_size=PHOTO_MAX_SIZE, quality=PHOTO_QUALITE):
+    """
+    Ouvre la photo une seule fois : valide l'image, lit format et dimensions et,
+    si optimiser est vrai, produit la version optimisée à partir du même décodage
+    Une photo déjà optimisée (réduite par le navigateur) est gardée telle quelle,
+    sans réencodage ni passage par le worker
+    Lève une exception si le fichier n'est pas une image lisible
+    """
+    with Image.open(fichier) as img:
+        preparee = PhotoPreparee(img.format, img.width, img.height)
+        if est_deja_optimisee(img, max_size):
+            img.load()  # validation des données, peu coûteuse à cette taille
+            preparee.contenu = fichier
+        elif optimiser:
+            # Le décodage complet sert aussi de validation des données de l'image
+            with mesure('optimisation_photo', largeur=img.width, hauteur=img.height):
+                preparee.contenu = ContentFile(optimiser_image_ouverte(img, max_size, quality))
+        else:
+            # Optimisation confiée au worker : décodage réduit (DCT au 1/8 pour le JPEG), qui
+            # lit tout de même l'image entière et écarte une photo tronquée ou corrompue
+            img.draft(img.mode, (max(1, img.width // 8), max(1, img.height // 8)))
+            img.load()
+    fichier.seek(0)
+    return preparee
+
+
+def nom_miniature(nom_photo, taille, extension='jpg'):
+    """photos/militants/1/2025/01/X.jpg -> photos/miniatures/militants/1/2025/01/X_64.jpg"""
+    base = os.path.splitext(nom_photo)[0]
+    if base.startswith('photos/'):
+        base = base[len('photos/'):]
+    return f"{PREFIXE_MINIATURES}/{base}_{taille}.{extension}"
+
+
+def formats_miniatures():
+    """(extension, format Pillow) des dérivés ; WebP seulement si Pillow le supporte"""
+    formats = [('jpg', 'JPEG')]
+    if WEBP_DISPONIBLE:
+        formats.append(('webp', 'WEBP'))
+    return formats
+
+
+def generer_miniatures(fichier_photo, remplacer=False):
+    """
+    Génère les dérivés (TAILLES_MINIATURES, JPEG et WebP) d'une photo déjà optimisée
+    Les dérivés déjà présents (photo partagée par plusieurs fiches) ne sont
+    recalculés qu'avec remplacer=True ; retourne les noms écrits
+    """
+    storage = fichier_photo.storage  # celui du champ photo, pas forcément le stockage par défaut
+    a_generer = [
+        (taille, extension, format)
+        for taille in TAILLES_MINIATURES
+        for extension, format in formats_miniatures()
+        if remplacer or not storage.exists(nom_miniature(fichier_photo.name, taille, extension))
+    ]
+    if not a_generer:
+        return []
+
+    noms = []
+    with fichier_photo.open('rb') as photo, Image.open(photo) as img:
+        img = img.convert('RGB') if img.mode != 'RGB' else img
+        img.load()
+        for taille in TAILLES_MINIATURES:
+            formats = [(extension, format) for t, extension, format in a_generer if t == taille]
+            if not formats:
+                continue
+            miniature = img.copy()
+            miniature.thumbnail((taille, taille), Image.Resampling.LANCZOS)
+            for extension, format in formats:
+                buffer = BytesIO()
+                miniature.save(buffer, format=format, quality=80)
+                nom = nom_miniature(fichier_photo.name, taille, extension)
+                # Nom déterministe : on remplace au lieu de laisser le storage suffixer
+                if storage.exists(nom):
+                    storage.delete(nom)
+                noms.append(storage.save(nom, ContentFile(buffer.getvalue())))
+    return noms
+
+
+def traiter_photo_fiche(fiche):
+    """
+    Remplace la photo brute d'une fiche par sa version optimisée (JPEG)
+    Appelé par le worker (manage.py traiter_photos), hors du cycle de la requête
+    """
+    from .models import FicheMilitant
+
+    ancien_nom = fiche.photo.name
+    with fiche.photo.open('rb') as photo_brute, Image.open(photo_brute) as img, \
+            mesure('optimisation_photo', fiche=fiche.pk, largeur=img.width, hauteur=img.height) as span:
+        span['reencodee'] = not est_deja_optimisee(img)
+        contenu = ContentFile(optimiser_image_ouverte(img)) if span['reencodee'] else None
+
+    if contenu is not None:
+        nom_base = os.path.splitext(os.path.basename(ancien_nom))[0]
+        fiche.photo.save(f"{nom_base}.jpg", contenu, save=False)
+
+    generer_miniatures(fiche.photo)
+
+    # update() : ne pas écraser une modification faite entre-temps sur les autres champs
+    FicheMilitant.objects.filter(pk=fiche.pk).update(
+        photo=fiche.photo.name, photo_statut='traitee', miniatures_generees=True
+    )
+    if fiche.photo.name != ancien_nom:
+        fiche.photo.storage.delete(ancien_nom)
+    fiche.photo_statut = 'traitee'
+    fiche.miniatures_generees = True
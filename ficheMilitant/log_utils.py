@@ -0,0 +1,109 @@
+# ficheMilitant/log_utils.py
+
+"""
+Journalisation de l'application.
+
+Les modules utilisent logging.getLogger(__name__) avec un formatage paresseux
+(logger.debug("... %s", valeur)) : un message sous le niveau configuré ne coûte
+qu'une comparaison. Le gestionnaire GestionnaireFileAttente formate le message
+dans le thread appelant (QueueHandler.prepare) puis le met dans une file ;
+l'écriture (stderr ou fichier) se fait dans un thread dédié, hors du chemin des
+requêtes. Chaque enregistrement est écrit sur une ligne JSON avec ses champs
+structurés (extra=...).
+
+mesure() produit les « spans » de durée (recherche dans la liste électorale,
+traitement de la photo, enregistrement en base) sur le logger ficheMilitant.perf.
+
+Ce module est importé par la configuration LOGGING : il ne dépend pas des apps Django.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+logger_perf = logging.getLogger('ficheMilitant.perf')
+
+# Attributs standard d'un LogRecord : tout le reste vient de extra=...
+_ATTRIBUTS_STANDARD = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class FormateurStructure(logging.Formatter):
+    """Une ligne JSON par enregistrement : horodatage, niveau, logger, message et champs extra"""
+
+    def format(self, record):
+        donnees = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'niveau': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for cle, valeur in vars(record).items():
+            if cle not in _ATTRIBUTS_STANDARD and not cle.startswith('_'):
+                donnees[cle] = valeur
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            donnees['exception'] = record.exc_text
+        return json.dumps(donnees, ensure_ascii=False, default=str)
+
+
+class GestionnaireFileAttente(QueueHandler):
+    """
+    QueueHandler dont le QueueListener (thread) écrit sur stderr ou dans `fichier`
+    Utilisable depuis LOGGING : {'()': 'ficheMilitant.log_utils.GestionnaireFileAttente'}
+    Le thread est démarré au premier enregistrement de chaque processus : la
+    configuration a lieu avant le fork des workers (gunicorn --preload), et un
+    fils n'hérite pas des threads de son parent
+    """
+
+    def __init__(self, fichier=None):
+        super().__init__(queue.SimpleQueue())
+        self.fichier = fichier
+        self.ecouteur = None
+        self.pid = None
+        # Vider la file à l'arrêt du processus
+        atexit.register(self.arreter)
+
+    def demarrer(self):
+        # Nouvelle file : celle héritée du parent peut contenir des enregistrements qu'il écrira lui-même
+        self.queue = queue.SimpleQueue()
+        cible = logging.FileHandler(self.fichier, encoding='utf-8') if self.fichier else logging.StreamHandler()
+        cible.setFormatter(FormateurStructure())
+        self.ecouteur = QueueListener(self.queue, cible)
+        self.ecouteur.start()
+        self.pid = os.getpid()
+
+    def arreter(self):
+        if self.pid == os.getpid():
+            self.ecouteur.stop()
+            self.pid = None
+
+    def emit(self, record):
+        # Appelé sous self.lock (Handler.handle), que logging réinitialise après un fork
+        if self.pid != os.getpid():
+            self.demarrer()
+        super().emit(record)
+
+
+@contextmanager
+def mesure(etape, **champs):
+    """
+    Span de durée : journalise `etape` et sa durée en ms (niveau INFO) à la sortie du bloc
+    Le bloc peut compléter les champs : with mesure('x') as span: span['trouve'] = True
+    """
+    if not logger_perf.isEnabledFor(logging.INFO):
+        yield champs
+        return
+    debut = time.perf_counter()
+    try:
+        yield champs
+    finally:
+        duree = (time.perf_counter() - debut) * 1000
+        logger_perf.info("%s : %.1f ms", etape, duree,
+                         extra={'etape': etape, 'duree_ms': round(duree, 2), **champs})
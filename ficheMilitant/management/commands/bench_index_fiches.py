@@ -0,0 +1,156 @@
+# ficheMilitant/management/commands/bench_index_fiches.py
+
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from ficheMilitant.models import Enqueteur, FicheMilitant
+
+PREFIXE_BENCH = 'bench_index_'
+REGIONS = ['Tonkpi', 'Cavally', 'Guémon', 'Haut-Sassandra', 'Bafing']
+DEPARTEMENTS = ['Danané', 'Man', 'Biankouma', 'Zouan-Hounien', 'Sipilou']
+
+
+def requetes_mesurees(enqueteur_id):
+    """Requêtes représentatives du changelist admin et des vues par enquêteur"""
+    depuis = timezone.now() - timedelta(days=30)
+    return {
+        "changelist (tri par date, 100 lignes)": lambda: list(
+            FicheMilitant.objects.select_related('enqueteur', 'enqueteur__user')
+            .order_by('-date_soumission', '-pk')[:100]
+        ),
+        "filtre est_dans_csv + date": lambda: list(
+            FicheMilitant.objects.filter(est_dans_csv=True, date_soumission__gte=depuis)
+            .order_by('-date_soumission')[:100]
+        ),
+        "filtre région / section / comité": lambda: FicheMilitant.objects.filter(
+            region='Tonkpi', section='Section 7', comite_base='CB 3'
+        ).count(),
+        "filtre département + inscription": lambda: FicheMilitant.objects.filter(
+            departement='Danané', inscription_electorale='non_inscrit'
+        ).count(),
+        "fiches récentes d'un enquêteur": lambda: list(
+            FicheMilitant.objects.filter(enqueteur_id=enqueteur_id).order_by('-date_soumission')[:20]
+        ),
+        "statistiques d'un enquêteur": lambda: FicheMilitant.objects.filter(enqueteur_id=enqueteur_id).aggregate(
+            total=Count('id'),
+            dans_csv=Count('id', filter=Q(est_dans_csv=True)),
+            avec_photo=Count('id', filter=Q(photo__isnull=False) & ~Q(photo='')),
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = ("Mesure les requêtes du changelist et des statistiques avec et sans les index "
+            "de FicheMilitant, sur une table remplie de fiches de test")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lignes', type=int, default=500000, help="Nombre de fiches de test à insérer")
+        parser.add_argument('--repetitions', type=int, default=5, help="Exécutions par requête (médiane)")
+        parser.add_argument('--conserver', action='store_true',
+                            help="Ne pas supprimer les fiches de test à la fin")
+        parser.add_argument('--oui', action='store_true',
+                            help="Confirmer l'insertion des fiches de test dans la base configurée")
+
+    def handle(self, *args, **options):
+        if not options['oui']:
+            raise CommandError(
+                f"Ce benchmark insère {options['lignes']} fiches dans la base '{connection.settings_dict['NAME']}' "
+                "et supprime temporairement des index. Relancez avec --oui sur une base de test."
+            )
+
+        try:
+            enqueteurs = self.creer_donnees(options['lignes'])
+            requetes = requetes_mesurees(enqueteurs[0].id)
+            avec_index = self.mesurer(requetes, options['repetitions'])
+
+            index = FicheMilitant._meta.indexes
+            with connection.schema_editor() as editor:
+                for idx in index:
+                    editor.remove_index(FicheMilitant, idx)
+            try:
+                sans_index = self.mesurer(requetes, options['repetitions'])
+            finally:
+                with connection.schema_editor() as editor:
+                    for idx in index:
+                        editor.add_index(FicheMilitant, idx)
+
+            self.afficher(sans_index, avec_index)
+        finally:
+            if not options['conserver']:
+                self.stdout.write("Suppression des fiches de test...")
+                User.objects.filter(username__startswith=PREFIXE_BENCH).delete()
+
+    def creer_donnees(self, lignes, par_lot=5000):
+        self.stdout.write(f"Insertion de {lignes} fiches de test...")
+        random.seed(42)
+        enqueteurs = []
+        for numero in range(50):
+            user = User.objects.create(username=f"{PREFIXE_BENCH}{numero}_{int(time.time())}")
+            enqueteurs.append(Enqueteur.objects.create(user=user, prenom='Bench', nom=str(numero), telephone='0'))
+
+        lot = []
+        for numero in range(lignes):
+            lot.append(FicheMilitant(
+                enqueteur=random.choice(enqueteurs),
+                region=random.choice(REGIONS),
+                departement_administratif='Danané',
+                departement=random.choice(DEPARTEMENTS),
+                zone=f"Zone {random.randint(1, 10)}",
+                section=f"Section {random.randint(1, 40)}",
+                comite_base=f"CB {random.randint(1, 20)}",
+                lieu_vote='EPP',
+                prenoms=f"Prenom {numero}",
+                nom='BENCH',
+                date_naissance=date(1960, 1, 1) + timedelta(days=random.randint(0, 15000)),
+                lieu_naissance='Danané',
+                contacts='0',
+                sexe=random.choice('MF'),
+                profession='Test',
+                inscription_electorale=random.choice(['inscrit', 'non_inscrit']),
+                est_dans_csv=random.random() < 0.6,
+                photo='photos/bench.jpg' if random.random() < 0.4 else '',
+            ))
+            if len(lot) >= par_lot:
+                FicheMilitant.objects.bulk_create(lot)
+                lot = []
+        if lot:
+            FicheMilitant.objects.bulk_create(lot)
+
+        # date_soumission est en auto_now_add : étaler ensuite les fiches sur un an, par tranches d'id
+        fiches = FicheMilitant.objects.filter(enqueteur__in=enqueteurs)
+        premier = fiches.order_by('id').values_list('id', flat=True).first()
+        tranche = lignes // 52 + 1
+        maintenant = timezone.now()
+        for semaine in range(52):
+            fiches.filter(id__gte=premier + semaine * tranche, id__lt=premier + (semaine + 1) * tranche).update(
+                date_soumission=maintenant - timedelta(weeks=semaine)
+            )
+        return enqueteurs
+
+    def mesurer(self, requetes, repetitions):
+        durees = {}
+        for nom, requete in requetes.items():
+            requete()  # préchauffage
+            mesures = []
+            for _ in range(repetitions):
+                debut = time.perf_counter()
+                requete()
+                mesures.append((time.perf_counter() - debut) * 1000)
+            durees[nom] = statistics.median(mesures)
+        return durees
+
+    def afficher(self, sans_index, avec_index):
+        largeur = max(len(nom) for nom in sans_index)
+        self.stdout.write(f"\n{'Requête'.ljust(largeur)}  {'sans index':>12}  {'avec index':>12}  {'gain':>7}")
+        for nom in sans_index:
+            avant, apres = sans_index[nom], avec_index[nom]
+            gain = avant / apres if apres else float('inf')
+            self.stdout.write(f"{nom.ljust(largeur)}  {avant:>9.1f} ms  {apres:>9.1f} ms  {gain:>6.1f}x")
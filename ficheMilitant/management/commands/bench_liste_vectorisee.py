@@ -0,0 +1,122 @@
+# ficheMilitant/management/commands/bench_liste_vectorisee.py
+
+import csv
+import os
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ficheMilitant.csv_utils import IndexElectoral, descripteur_csv, lire_lignes, normalize_text
+from ficheMilitant.vectorise_utils import PANDAS_DISPONIBLE, charger_liste, normaliser_serie, rapprocher
+
+ENTETE = ['Numero Electeur', 'Nom/Nom de Jeune Fille', 'Prenoms', 'Sexe', 'Date de Naissance',
+          'Lieu de Naissance', 'Profession', 'Adresse Physique', 'Libelle Commune',
+          'Libelle Lieu de Vote', 'Bureau de vote']
+NOMS = ['KOUASSI', 'KONÉ', 'TRAORÉ', 'DIABATÉ', 'GUÉI', 'YAO', 'BAMBA', 'N\'GUESSAN', 'OUATTARA', 'DOUMBIA',
+        'ZÉHIRO', 'GBAGBO', 'TIÉMOKO', 'KOFFI', 'AMANI', 'SÉRY', 'DJÉDJÉ', 'GNAHORÉ', 'BLÉ', 'TAPÉ']
+PRENOMS = ['JEAN BAPTISTE', 'AMÉLIE', 'HÉLÈNE', 'FRANÇOIS', 'MARIE-NOËL', 'ADJOUA', 'KOUAMÉ', 'AÏCHA',
+           'JÉRÔME', 'CÉLESTIN', 'ÉMILIENNE', 'ROSINE', 'ANGÈLE', 'DÉSIRÉ', 'SYLVAIN', 'BÉATRICE']
+SYLLABES = ['KO', 'UA', 'MÉ', 'DJÉ', 'NA', 'HI', 'YÉ', 'SÈ', 'BO', 'LI', 'GNÉ', 'ZA', 'TÉ', 'OU', 'RA', 'BÉ']
+LIEUX = ['DANANÉ', 'MAN', 'BIANKOUMA', 'ZOUAN-HOUNIEN', 'SIPILOU', 'TOULEPLEU', 'GUIGLO', 'DUÉKOUÉ', 'INCONNU']
+
+
+def generer_liste(chemin, lignes, graine):
+    """
+    Liste électorale synthétique : noms de famille très répétés, prénoms en grande partie
+    distincts (second prénom formé de syllabes), lieux de naissance peu nombreux
+    """
+    aleatoire = random.Random(graine)
+    with open(chemin, 'w', encoding='utf-8', newline='') as fichier:
+        writer = csv.writer(fichier, delimiter=';')
+        writer.writerow(ENTETE)
+        for numero in range(lignes):
+            nom = f"{aleatoire.choice(NOMS)} {aleatoire.choice(NOMS)}"
+            second = ''.join(aleatoire.choice(SYLLABES) for _ in range(aleatoire.randint(2, 4)))
+            prenoms = f"{aleatoire.choice(PRENOMS)} {second}"
+            date = f"{aleatoire.randint(1, 28):02d}/{aleatoire.randint(1, 12):02d}/{aleatoire.randint(1950, 2005)}"
+            lieu = aleatoire.choice(LIEUX)
+            writer.writerow([f"V{numero:08d}", nom, prenoms, aleatoire.choice('MF'), date, lieu,
+                             'CULTIVATEUR', '', lieu, f"EPP {numero % 50}", f"BV{numero % 9:02d}"])
+
+
+def personnes_recherchees(chemin, nombre, graine):
+    """Moitié de personnes tirées de la liste (en minuscules), moitié inventées"""
+    aleatoire = random.Random(graine)
+    lignes = list(lire_lignes(descripteur_csv(chemin)))
+    personnes = []
+    for _ in range(nombre // 2):
+        row = aleatoire.choice(lignes)
+        personnes.append((row['Nom/Nom de Jeune Fille'].lower(), row['Prenoms'], row['Date de Naissance'],
+                          row['Lieu de Naissance'].lower()))
+    for _ in range(nombre - len(personnes)):
+        personnes.append((aleatoire.choice(NOMS), aleatoire.choice(PRENOMS), '01/01/1990', ''))
+    aleatoire.shuffle(personnes)
+    return personnes
+
+
+class Command(BaseCommand):
+    help = ("Compare la normalisation et le rapprochement ligne par ligne (normalize_text, IndexElectoral) "
+            "à leur version en colonnes (pandas) sur une liste électorale synthétique")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lignes', type=int, default=1000000, help="Nombre d'électeurs de la liste synthétique")
+        parser.add_argument('--fiches', type=int, default=100000, help="Nombre de personnes à rapprocher")
+        parser.add_argument('--graine', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if not PANDAS_DISPONIBLE:
+            raise CommandError("Ce benchmark nécessite pandas (pip install pandas)")
+
+        with tempfile.TemporaryDirectory() as dossier:
+            chemin = os.path.join(dossier, 'liste.csv')
+            self.stdout.write(f"Génération de {options['lignes']} électeurs...")
+            generer_liste(chemin, options['lignes'], options['graine'])
+            descripteur = descripteur_csv(chemin)
+            personnes = personnes_recherchees(chemin, options['fiches'], options['graine'])
+
+            # Chargement : index ligne par ligne (lecture + normalize_text) contre colonnes
+            debut = time.perf_counter()
+            index = IndexElectoral()
+            for row in lire_lignes(descripteur):
+                index.ajouter(row)
+            duree_index = time.perf_counter() - debut
+
+            debut = time.perf_counter()
+            liste = charger_liste(descripteur)
+            duree_colonnes = time.perf_counter() - debut
+            self.afficher("Chargement de la liste", duree_index, duree_colonnes)
+
+        # Normalisation seule des trois colonnes normalisées
+        colonnes = ['Nom/Nom de Jeune Fille', 'Prenoms', 'Lieu de Naissance']
+        valeurs = [liste[colonne].tolist() for colonne in colonnes]
+        debut = time.perf_counter()
+        par_ligne = [[normalize_text(valeur) for valeur in colonne] for colonne in valeurs]
+        duree_ligne = time.perf_counter() - debut
+
+        debut = time.perf_counter()
+        vectorise = [normaliser_serie(liste[colonne]).tolist() for colonne in colonnes]
+        duree_vectorise = time.perf_counter() - debut
+        if par_ligne != vectorise:
+            raise CommandError("La normalisation en colonnes diffère de normalize_text")
+        self.afficher("Normalisation (3 colonnes)", duree_ligne, duree_vectorise)
+
+        # Rapprochement des personnes
+        debut = time.perf_counter()
+        attendus = [index.rechercher(*personne) for personne in personnes]
+        duree_ligne = time.perf_counter() - debut
+
+        debut = time.perf_counter()
+        obtenus = rapprocher(personnes, liste)
+        duree_vectorise = time.perf_counter() - debut
+        if attendus != obtenus:
+            raise CommandError("Le rapprochement par jointure diffère de la recherche ligne par ligne")
+        trouves = sum(resultat['trouve'] for resultat in obtenus)
+        self.afficher(f"Rapprochement ({len(personnes)} personnes, {trouves} trouvées)", duree_ligne, duree_vectorise)
+
+        self.stdout.write(self.style.SUCCESS("Résultats identiques ligne par ligne et en colonnes"))
+
+    def afficher(self, etape, duree_ligne, duree_vectorise):
+        self.stdout.write(f"{etape} : ligne par ligne {duree_ligne:.2f} s, en colonnes {duree_vectorise:.2f} s "
+                          f"(x{duree_ligne / duree_vectorise if duree_vectorise else 0:.1f})")
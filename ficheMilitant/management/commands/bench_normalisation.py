@@ -0,0 +1,86 @@
+# ficheMilitant/management/commands/bench_normalisation.py
+
+import time
+import unicodedata
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ficheMilitant.csv_utils import CSV_FILE_PATH, _normaliser, descripteur_csv, lire_lignes, normalize_text
+
+COLONNES = ['Nom/Nom de Jeune Fille', 'Prenoms', 'Lieu de Naissance', 'Libelle Commune']
+
+
+def normalize_text_reference(text):
+    """Version précédente de normalize_text (NFD et unicodedata.category à chaque appel), pour comparaison"""
+    if not text:
+        return ""
+    text = unicodedata.normalize('NFD', str(text))
+    text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
+    return text.upper().strip()
+
+
+def normalize_text_sans_memo(text):
+    """normalize_text avec la table de traduction mais sans le cache LRU"""
+    if not text:
+        return ""
+    text = str(text)
+    if text.isascii():
+        return text.upper().strip()
+    return _normaliser.__wrapped__(text)
+
+
+FONCTIONS = {
+    'référence': normalize_text_reference,
+    'table, sans mémo': normalize_text_sans_memo,
+    'normalize_text': normalize_text,
+}
+
+
+class Command(BaseCommand):
+    help = ("Compare normalize_text (table de traduction + mémo LRU) à l'ancienne version sur les colonnes "
+            "normalisées de la liste électorale, en vérifiant que les résultats sont identiques")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fichier', default=CSV_FILE_PATH, help="CSV de la liste électorale")
+        parser.add_argument('--lignes', type=int, default=200000, help="Nombre de lignes lues")
+        parser.add_argument('--repetitions', type=int, default=3, help="Passes sur les valeurs (la meilleure est retenue)")
+
+    def handle(self, *args, **options):
+        descripteur = descripteur_csv(options['fichier'])
+        if descripteur is None:
+            raise CommandError(f"Fichier CSV non trouvé : {options['fichier']}")
+
+        valeurs = []
+        for numero, row in enumerate(lire_lignes(descripteur)):
+            if numero >= options['lignes']:
+                break
+            valeurs.extend(row.get(colonne) or '' for colonne in COLONNES)
+        self.stdout.write(f"{len(valeurs)} valeurs ({len(set(valeurs))} distinctes) "
+                          f"des colonnes {', '.join(COLONNES)}")
+
+        attendus = [normalize_text_reference(valeur) for valeur in valeurs]
+        for nom, fonction in FONCTIONS.items():
+            if [fonction(valeur) for valeur in valeurs] != attendus:
+                raise CommandError(f"{nom} : résultats différents de la version de référence")
+
+        reference = None
+        for nom, fonction in FONCTIONS.items():
+            _normaliser.cache_clear()
+            durees = []
+            for _ in range(options['repetitions']):
+                debut = time.perf_counter()
+                for valeur in valeurs:
+                    fonction(valeur)
+                durees.append(time.perf_counter() - debut)
+            # Première passe : mémo vide ; la meilleure passe : mémo rempli (pour normalize_text)
+            premiere, meilleure = durees[0], min(durees)
+            reference = reference or meilleure
+            self.stdout.write(
+                f"{nom:<18} {premiere / len(valeurs) * 1e6:6.2f} µs/appel (1re passe), "
+                f"{meilleure / len(valeurs) * 1e6:6.2f} µs/appel (meilleure), x{reference / meilleure:.1f}"
+            )
+
+        infos = _normaliser.cache_info()
+        self.stdout.write(self.style.SUCCESS(
+            f"Résultats identiques ; mémo : {infos.hits} succès, {infos.misses} échecs, {infos.currsize} entrées"
+        ))
@@ -0,0 +1,114 @@
+# ficheMilitant/management/commands/bench_photos.py
+
+import glob
+import multiprocessing
+import os
+import resource
+import statistics
+import tempfile
+import time
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from ficheMilitant.image_utils import optimize_image
+
+EXTENSIONS = ('*.jpg', '*.jpeg', '*.JPG', '*.JPEG', '*.png')
+
+
+def optimize_image_reference(image_file, max_size=(800, 800), quality=85):
+    """Version précédente de optimize_image (décodage pleine résolution), pour comparaison"""
+    with Image.open(image_file) as img:
+        if img.mode in ('RGBA', 'LA', 'P'):
+            img = img.convert('RGB')
+        img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        img.save(buffer, format='JPEG', quality=quality, optimize=True)
+        buffer.seek(0)
+        return ContentFile(buffer.read())
+
+
+FONCTIONS = {
+    'référence': optimize_image_reference,
+    'optimize_image': optimize_image,
+}
+
+
+def mesurer(nom_fonction, corpus, repetitions, file_resultats):
+    """
+    Exécuté dans un processus séparé : la mémoire crête (ru_maxrss) mesurée
+    est ainsi propre à la fonction testée
+    """
+    fonction = FONCTIONS[nom_fonction]
+    contenus = []
+    for chemin in corpus:
+        with open(chemin, 'rb') as fichier:
+            contenus.append(fichier.read())
+
+    rss_initial = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    durees = []
+    for _ in range(repetitions):
+        for contenu in contenus:
+            debut = time.perf_counter()
+            fonction(BytesIO(contenu))
+            durees.append((time.perf_counter() - debut) * 1000)
+    rss_final = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # ru_maxrss est en Ko sous Linux
+    file_resultats.put((nom_fonction, durees, (rss_final - rss_initial) / 1024))
+
+
+def generer_corpus(dossier, nombre):
+    """Photos synthétiques de 12 mégapixels (4000x3000) au format JPEG"""
+    os.makedirs(dossier, exist_ok=True)
+    chemins = []
+    for numero in range(nombre):
+        chemin = os.path.join(dossier, f"photo_{numero}.jpg")
+        if not os.path.exists(chemin):
+            # Dégradé + bruit : se compresse comme une vraie photo, pas comme un aplat
+            image = Image.linear_gradient('L').resize((4000, 3000))
+            bruit = Image.effect_noise((4000, 3000), 40 + numero)
+            Image.merge('RGB', (image, bruit, image.rotate(180))).save(chemin, quality=92)
+        chemins.append(chemin)
+    return chemins
+
+
+class Command(BaseCommand):
+    help = "Compare la latence et la mémoire crête de optimize_image et de l'ancienne version"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dossier', help="Dossier de photos (par défaut : photos synthétiques 12 Mpx)")
+        parser.add_argument('--nombre', type=int, default=5, help="Nombre de photos synthétiques")
+        parser.add_argument('--repetitions', type=int, default=3)
+
+    def handle(self, *args, **options):
+        if options['dossier']:
+            corpus = sorted({
+                chemin for motif in EXTENSIONS
+                for chemin in glob.glob(os.path.join(options['dossier'], '**', motif), recursive=True)
+            })
+            if not corpus:
+                raise CommandError(f"Aucune photo trouvée dans {options['dossier']}")
+        else:
+            dossier = os.path.join(tempfile.gettempdir(), 'bench_photos')
+            corpus = generer_corpus(dossier, options['nombre'])
+
+        self.stdout.write(f"{len(corpus)} photos, {options['repetitions']} répétitions\n")
+        self.stdout.write(f"{'Fonction':<16} {'médiane':>10} {'p95':>10} {'mémoire crête':>15}")
+
+        file_resultats = multiprocessing.Queue()
+        for nom_fonction in FONCTIONS:
+            processus = multiprocessing.Process(
+                target=mesurer, args=(nom_fonction, corpus, options['repetitions'], file_resultats)
+            )
+            processus.start()
+            nom, durees, memoire = file_resultats.get()
+            processus.join()
+
+            durees.sort()
+            p95 = durees[min(len(durees) - 1, int(len(durees) * 0.95))]
+            self.stdout.write(
+                f"{nom:<16} {statistics.median(durees):>7.1f} ms {p95:>7.1f} ms {memoire:>11.1f} Mo"
+            )
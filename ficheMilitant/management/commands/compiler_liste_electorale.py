@@ -0,0 +1,28 @@
+# ficheMilitant/management/commands/compiler_liste_electorale.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ficheMilitant.csv_utils import CSV_FILE_PATH, construire_index, signature_fichier
+from ficheMilitant.snapshot_utils import SNAPSHOT_FILE_PATH, compiler_snapshot
+
+
+class Command(BaseCommand):
+    help = ("Compile le CSV de la liste électorale en snapshot binaire partagé par les workers (mmap), "
+            "écrit dans SNAPSHOT_ELECTEURS_PATH où les workers le lisent")
+
+    def handle(self, *args, **options):
+        signature = signature_fichier()
+        if signature is None:
+            raise CommandError(f"Fichier CSV non trouvé : {CSV_FILE_PATH}")
+
+        debut = time.perf_counter()
+        index = construire_index(signature, avec_blocs=False)
+        nb_entrees, nb_chaines = compiler_snapshot(index, SNAPSHOT_FILE_PATH)
+        duree = time.perf_counter() - debut
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot écrit dans {SNAPSHOT_FILE_PATH} : {nb_entrees} entrées, "
+            f"{nb_chaines} chaînes, {index.total} électeurs ({duree:.1f} s)"
+        ))
@@ -0,0 +1,69 @@
+# ficheMilitant/management/commands/dedupliquer_photos.py
+
+import os
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from ficheMilitant.image_utils import TAILLES_MINIATURES, formats_miniatures, generer_miniatures, nom_miniature
+from ficheMilitant.models import FicheMilitant
+from ficheMilitant.stockage_utils import empreinte_contenu, nom_par_empreinte, stockage_photos
+
+PREFIXE_ANCIENNES_PHOTOS = 'photos/militants/'
+
+
+class Command(BaseCommand):
+    help = ("Migre les photos de media/photos/militants vers le stockage par empreinte : "
+            "chaque contenu n'est plus stocké qu'une fois")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Calculer les doublons sans rien déplacer ni supprimer")
+
+    def handle(self, *args, **options):
+        # Liste figée avant de modifier les fiches
+        noms = list(FicheMilitant.objects.filter(photo__startswith=PREFIXE_ANCIENNES_PHOTOS)
+                    .order_by('photo').values_list('photo', flat=True).distinct())
+
+        fichiers = doublons = manquants = octets_liberes = 0
+        vus = set()  # en dry-run rien n'est écrit : on retient les empreintes déjà rencontrées
+        for ancien_nom in noms:
+            if not stockage_photos.exists(ancien_nom):
+                manquants += 1
+                self.stderr.write(f"Fichier manquant : {ancien_nom}")
+                continue
+
+            fichiers += 1
+            taille = stockage_photos.size(ancien_nom)
+            with stockage_photos.open(ancien_nom, 'rb') as fichier:
+                contenu = File(fichier, name=ancien_nom)
+                nouveau_nom = nom_par_empreinte(empreinte_contenu(contenu), os.path.splitext(ancien_nom)[1])
+                deja_stocke = nouveau_nom in vus or stockage_photos.exists(nouveau_nom)
+                vus.add(nouveau_nom)
+                if deja_stocke:
+                    doublons += 1
+                    octets_liberes += taille
+                if options['dry_run']:
+                    continue
+                if not deja_stocke:
+                    nouveau_nom = stockage_photos.save(ancien_nom, contenu)
+
+            FicheMilitant.objects.filter(photo=ancien_nom).update(photo=nouveau_nom)
+            self.migrer_miniatures(ancien_nom, nouveau_nom)
+            # Plus aucune fiche ne référence l'ancien chemin
+            stockage_photos.delete(ancien_nom)
+
+        prefixe = "[dry-run] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefixe}{fichiers} fichier(s) examiné(s), {doublons} doublon(s), "
+            f"{octets_liberes / 1024 / 1024:.1f} Mo libéré(s), {manquants} fichier(s) manquant(s)"
+        ))
+
+    def migrer_miniatures(self, ancien_nom, nouveau_nom):
+        """Les miniatures suivent le nom de la photo : on les régénère au nouveau nom si besoin"""
+        fiche = FicheMilitant.objects.filter(photo=nouveau_nom, miniatures_generees=True).first()
+        if fiche is not None:
+            generer_miniatures(fiche.photo)
+        for taille in TAILLES_MINIATURES:
+            for extension, _ in formats_miniatures():
+                stockage_photos.delete(nom_miniature(ancien_nom, taille, extension))
@@ -0,0 +1,41 @@
+# ficheMilitant/management/commands/generer_miniatures.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from ficheMilitant.image_utils import generer_miniatures
+from ficheMilitant.models import FicheMilitant
+
+
+class Command(BaseCommand):
+    help = "Génère les miniatures (64 px et 256 px, JPEG/WebP) des photos déjà optimisées qui n'en ont pas"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help="Régénérer aussi les miniatures existantes")
+        parser.add_argument('--limite', type=int, help="Nombre maximum de fiches à traiter")
+
+    def handle(self, *args, **options):
+        fiches = FicheMilitant.objects.filter(photo_statut='traitee').exclude(photo='').exclude(photo__isnull=True)
+        if not options['force']:
+            fiches = fiches.filter(miniatures_generees=False)
+        ids = list(fiches.order_by('id').values_list('id', flat=True)[:options['limite']])
+
+        self.stdout.write(f"{len(ids)} fiche(s) à traiter")
+        debut = time.perf_counter()
+        traitees = erreurs = 0
+        for fiche in FicheMilitant.objects.filter(id__in=ids).only('id', 'photo').order_by('id').iterator(chunk_size=500):
+            try:
+                generer_miniatures(fiche.photo, remplacer=options['force'])
+            except Exception as e:
+                erreurs += 1
+                self.stderr.write(f"Fiche #{fiche.pk} : miniatures impossibles : {e}")
+                continue
+            FicheMilitant.objects.filter(pk=fiche.pk, photo=fiche.photo.name).update(miniatures_generees=True)
+            traitees += 1
+
+        duree = time.perf_counter() - debut
+        self.stdout.write(self.style.SUCCESS(
+            f"{traitees} fiche(s) traitée(s), {erreurs} erreur(s) en {duree:.1f} s"
+        ))
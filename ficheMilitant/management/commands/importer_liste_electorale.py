@@ -0,0 +1,67 @@
+# ficheMilitant/management/commands/importer_liste_electorale.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from ficheMilitant.csv_utils import CSV_FILE_PATH, descripteur_csv, lire_lignes, invalider_cache_electeurs
+from ficheMilitant.electeurs_utils import electeur_depuis_ligne, invalider_cache_base
+from ficheMilitant.fuzzy_utils import blocs_en_base
+from ficheMilitant.models import BlocElectoral, Electeur
+
+
+class Command(BaseCommand):
+    help = "Importe la liste électorale (CSV) dans la table Electeur par lots, en mémoire constante"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fichier', default=CSV_FILE_PATH, help="CSV à importer")
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Nombre d'électeurs insérés par requête (bulk_create)")
+
+    def handle(self, *args, **options):
+        chemin = options['fichier']
+        descripteur = descripteur_csv(chemin)
+        if descripteur is None:
+            raise CommandError(f"Fichier CSV non trouvé : {chemin}")
+
+        debut = time.perf_counter()
+        # Remplacement atomique : les workers voient l'ancienne liste jusqu'au commit
+        with transaction.atomic():
+            Electeur.objects.all().delete()
+            BlocElectoral.objects.all().delete()
+            total = self.importer(lire_lignes(descripteur), options['batch_size'])
+
+        invalider_cache_base()
+        invalider_cache_electeurs()
+
+        duree = time.perf_counter() - debut
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} électeurs importés (encodage {descripteur.encodage}) en {duree:.1f} s"
+        ))
+
+    def importer(self, lignes, batch_size):
+        """Insère les électeurs par lots, chaque lot avec les blocs de rapprochement de ses (NOM, PRENOMS)"""
+        total = 0
+        lot = []
+        for row in lignes:
+            lot.append(electeur_depuis_ligne(row))
+            if len(lot) >= batch_size:
+                self.inserer_lot(lot, batch_size)
+                total += len(lot)
+                lot = []
+                self.stdout.write(f"  {total} électeurs importés...")
+        if lot:
+            self.inserer_lot(lot, batch_size)
+            total += len(lot)
+        return total
+
+    def inserer_lot(self, lot, batch_size):
+        """
+        Le dédoublonnage des blocs reste borné au lot : entre deux lots, c'est la
+        contrainte unique de BlocElectoral qui écarte les (NOM, PRENOMS) déjà indexés
+        """
+        Electeur.objects.bulk_create(lot)
+        cles = {(electeur.nom_normalise, electeur.prenoms_normalises) for electeur in lot}
+        blocs = [bloc for cle in cles for bloc in blocs_en_base(*cle)]
+        BlocElectoral.objects.bulk_create(blocs, batch_size=batch_size, ignore_conflicts=True)
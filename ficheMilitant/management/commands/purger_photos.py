@@ -0,0 +1,21 @@
+# ficheMilitant/management/commands/purger_photos.py
+
+from django.core.management.base import BaseCommand
+
+from ficheMilitant.stockage_utils import DELAI_GRACE_PURGE, stockage_photos
+
+
+class Command(BaseCommand):
+    help = "Supprime les photos du stockage par empreinte qu'aucune fiche ne référence plus"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=DELAI_GRACE_PURGE // 60,
+                            help="Délai de grâce depuis le dernier enregistrement du fichier")
+        parser.add_argument('--dry-run', action='store_true', help="Lister les photos orphelines sans les supprimer")
+
+    def handle(self, *args, **options):
+        noms = stockage_photos.purger_orphelins(options['minutes'] * 60, supprimer=not options['dry_run'])
+        for nom in noms:
+            self.stdout.write(nom)
+        action = "à supprimer (dry-run)" if options['dry_run'] else "supprimée(s)"
+        self.stdout.write(self.style.SUCCESS(f"{len(noms)} photo(s) orpheline(s) {action}"))
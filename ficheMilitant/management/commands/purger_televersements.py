@@ -0,0 +1,17 @@
+# ficheMilitant/management/commands/purger_televersements.py
+
+from django.core.management.base import BaseCommand
+
+from ficheMilitant.televersement_utils import purger_televersements
+
+
+class Command(BaseCommand):
+    help = "Supprime les téléversements de photos abandonnés (fichiers partiels et suivi en base)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--heures', type=int, default=48,
+                            help="Âge (sans nouveau morceau) au-delà duquel un téléversement est abandonné")
+
+    def handle(self, *args, **options):
+        nombre = purger_televersements(options['heures'])
+        self.stdout.write(self.style.SUCCESS(f"{nombre} téléversement(s) supprimé(s)"))
@@ -0,0 +1,152 @@
+# ficheMilitant/management/commands/reverifier_fiches.py
+
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from ficheMilitant.csv_utils import obtenir_index_electoral
+from ficheMilitant.electeurs_utils import compter_electeurs_base, verifier_personnes
+from ficheMilitant.models import FicheMilitant
+from ficheMilitant.stats_utils import invalider_toutes_statistiques
+from ficheMilitant.vectorise_utils import PANDAS_DISPONIBLE, charger_liste, rapprocher
+
+CHAMPS = ('id', 'nom', 'prenoms', 'date_naissance', 'lieu_naissance',
+          'est_dans_csv', 'numero_electeur_csv', 'numero_carte_electeur')
+
+
+def verifier_lot(lot, verifier=verifier_personnes):
+    """
+    Vérifie un lot de fiches (tuples CHAMPS) contre la liste électorale
+    Retourne (nombre de fiches du lot, fiches modifiées) ; une modification est
+    (id, est_dans_csv, numero_electeur_csv, numero_carte_electeur)
+    """
+    resultats = verifier([(nom, prenoms, date, lieu) for _, nom, prenoms, date, lieu, *_ in lot])
+
+    modifications = []
+    for (pk, _, _, _, _, est_dans_csv, numero_csv, numero_carte), resultat in zip(lot, resultats):
+        trouve = bool(resultat and resultat.get('trouve'))
+        nouveau_numero = (resultat.get('numero_electeur') or None) if trouve else None
+        # Comme dans enquete_view : un numéro trouvé complète la carte électeur vide
+        nouvelle_carte = numero_carte or nouveau_numero
+
+        if (trouve, nouveau_numero, nouvelle_carte) != (est_dans_csv, numero_csv, numero_carte):
+            modifications.append((pk, trouve, nouveau_numero, nouvelle_carte))
+    return len(lot), modifications
+
+
+def oublier_connexions_heritees():
+    """
+    Initialiseur des processus fils : les connexions héritées du parent partagent son socket.
+    Les fermer enverrait la déconnexion au serveur pour le parent aussi ; on les abandonne
+    et chaque fils ouvre la sienne à sa première requête
+    """
+    for connexion in connections.all():
+        connexion.connection = None
+
+
+def lots(queryset, taille):
+    """Découpe le queryset (lu en streaming) en lots de tuples"""
+    lot = []
+    for ligne in queryset.iterator(chunk_size=taille):
+        lot.append(ligne)
+        if len(lot) >= taille:
+            yield lot
+            lot = []
+    if lot:
+        yield lot
+
+
+def verifier_en_parallele(pool, lots_a_verifier, en_vol):
+    """Comme pool.map, mais avec au plus en_vol lots soumis à la fois (mémoire constante)"""
+    futures = deque()
+    for lot in lots_a_verifier:
+        futures.append(pool.submit(verifier_lot, lot))
+        if len(futures) >= en_vol:
+            yield futures.popleft().result()
+    while futures:
+        yield futures.popleft().result()
+
+
+class Command(BaseCommand):
+    help = "Revérifie toutes les fiches contre la liste électorale actuelle (après réception d'un nouveau CSV)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help="Nombre de processus de vérification (1 = dans ce processus)")
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help="Nombre de fiches lues, vérifiées et mises à jour par lot")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Compter les changements sans les enregistrer")
+        parser.add_argument('--vectorise', action='store_true',
+                            help="Charger le CSV en colonnes (pandas) et rapprocher chaque lot par jointure")
+
+    def handle(self, *args, **options):
+        taille = options['chunk_size']
+        workers = options['workers']
+        queryset = FicheMilitant.objects.order_by('id').values_list(*CHAMPS)
+
+        debut = time.perf_counter()
+        total = modifiees = 0
+
+        if options['vectorise']:
+            if not PANDAS_DISPONIBLE:
+                raise CommandError("--vectorise nécessite pandas (pip install pandas)")
+            if workers > 1:
+                raise CommandError("--vectorise s'exécute dans ce processus : ne pas l'utiliser avec --workers")
+            liste = charger_liste()
+            if liste is None:
+                raise CommandError("Fichier CSV de la liste électorale non trouvé")
+            self.stdout.write(f"  Liste chargée en colonnes : {len(liste)} lignes "
+                              f"({time.perf_counter() - debut:.1f} s)")
+            pool = None
+            resultats = map(partial(verifier_lot, verifier=partial(rapprocher, liste=liste)), lots(queryset, taille))
+        elif workers > 1:
+            if not compter_electeurs_base():
+                # Index du CSV chargé une fois ici : les fils en héritent au fork au lieu de le reconstruire
+                obtenir_index_electoral()
+            # fork : les fils héritent de la configuration Django et de l'index
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'),
+                                       initializer=oublier_connexions_heritees)
+            resultats = verifier_en_parallele(pool, lots(queryset, taille), en_vol=workers * 2)
+        else:
+            pool = None
+            resultats = map(verifier_lot, lots(queryset, taille))
+
+        try:
+            for nombre, modifications in resultats:
+                total += nombre
+                modifiees += len(modifications)
+                if modifications and not options['dry_run']:
+                    self.enregistrer(modifications, taille)
+
+                duree = time.perf_counter() - debut
+                self.stdout.write(f"  {total} fiches vérifiées, {modifiees} modifiées "
+                                  f"({total / duree:.0f} fiches/s)")
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        if modifiees and not options['dry_run']:
+            # bulk_update ne déclenche pas les signaux d'invalidation
+            invalider_toutes_statistiques()
+
+        duree = time.perf_counter() - debut
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} fiches vérifiées en {duree:.1f} s ({total / duree if duree else 0:.0f} fiches/s), "
+            f"{modifiees} {'à modifier' if options['dry_run'] else 'modifiées'}"
+        ))
+
+    def enregistrer(self, modifications, taille):
+        fiches = [
+            FicheMilitant(id=pk, est_dans_csv=trouve, numero_electeur_csv=numero,
+                          numero_carte_electeur=carte)
+            for pk, trouve, numero, carte in modifications
+        ]
+        FicheMilitant.objects.bulk_update(
+            fiches, ['est_dans_csv', 'numero_electeur_csv', 'numero_carte_electeur'], batch_size=taille
+        )
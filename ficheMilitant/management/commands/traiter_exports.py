@@ -0,0 +1,72 @@
+# ficheMilitant/management/commands/traiter_exports.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from ficheMilitant.export_utils import generer_export
+from ficheMilitant.models import ExportJob
+
+
+def prendre_job_suivant():
+    """
+    Réserve le plus ancien export en attente
+    La mise à jour conditionnelle garantit qu'un seul worker prend chaque export
+    """
+    for job in ExportJob.objects.filter(statut='en_attente').order_by('id')[:10]:
+        reserve = ExportJob.objects.filter(pk=job.pk, statut='en_attente').update(
+            statut='en_cours', date_debut=timezone.now(), progression=0
+        )
+        if reserve:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+class Command(BaseCommand):
+    help = "Worker local des exports de fiches en arrière-plan (file d'attente en base, sans broker)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--une-fois', action='store_true',
+                            help="Traiter les exports en attente puis s'arrêter")
+        parser.add_argument('--intervalle', type=float, default=5.0,
+                            help="Secondes entre deux consultations de la file d'attente")
+        parser.add_argument('--reprendre', action='store_true',
+                            help="Remettre en attente les exports restés 'en cours' (worker interrompu)")
+
+    def handle(self, *args, **options):
+        if options['reprendre']:
+            nombre = ExportJob.objects.filter(statut='en_cours').update(statut='en_attente', progression=0)
+            self.stdout.write(f"{nombre} export(s) remis en attente")
+
+        self.stdout.write("Worker d'exports démarré")
+        while True:
+            close_old_connections()
+            job = prendre_job_suivant()
+
+            if job is None:
+                if options['une_fois']:
+                    break
+                time.sleep(options['intervalle'])
+                continue
+
+            self.traiter(job)
+
+    def traiter(self, job):
+        self.stdout.write(f"Export #{job.pk} : {job.total} fiches ({job.format})")
+        debut = time.perf_counter()
+        try:
+            job.fichier.name = generer_export(job)
+        except Exception as e:
+            job.statut = 'erreur'
+            job.message = str(e)
+            self.stderr.write(f"Export #{job.pk} en erreur : {e}")
+        else:
+            job.statut = 'termine'
+            job.message = f"{job.progression} fiches exportées en {time.perf_counter() - debut:.1f} s"
+            self.stdout.write(self.style.SUCCESS(f"Export #{job.pk} terminé : {job.fichier.name}"))
+
+        job.date_fin = timezone.now()
+        job.save(update_fields=['statut', 'message', 'fichier', 'progression', 'date_fin'])
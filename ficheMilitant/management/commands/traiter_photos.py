@@ -0,0 +1,62 @@
+# ficheMilitant/management/commands/traiter_photos.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ficheMilitant.image_utils import traiter_photo_fiche
+from ficheMilitant.models import FicheMilitant
+
+
+def prendre_photo_suivante():
+    """
+    Réserve la plus ancienne photo en attente
+    La mise à jour conditionnelle garantit qu'un seul worker traite chaque photo
+    """
+    for fiche in FicheMilitant.objects.filter(photo_statut='en_attente').order_by('id')[:10]:
+        if FicheMilitant.objects.filter(pk=fiche.pk, photo_statut='en_attente').update(photo_statut='en_cours'):
+            fiche.photo_statut = 'en_cours'
+            return fiche
+    return None
+
+
+class Command(BaseCommand):
+    help = "Worker local d'optimisation des photos en attente (file d'attente en base, sans broker)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--une-fois', action='store_true',
+                            help="Traiter les photos en attente puis s'arrêter")
+        parser.add_argument('--intervalle', type=float, default=2.0,
+                            help="Secondes entre deux consultations de la file d'attente")
+        parser.add_argument('--reprendre', action='store_true',
+                            help="Remettre en attente les photos restées 'en cours' (worker interrompu)")
+
+    def handle(self, *args, **options):
+        if options['reprendre']:
+            nombre = FicheMilitant.objects.filter(photo_statut='en_cours').update(photo_statut='en_attente')
+            self.stdout.write(f"{nombre} photo(s) remise(s) en attente")
+
+        self.stdout.write("Worker photos démarré")
+        while True:
+            close_old_connections()
+            fiche = prendre_photo_suivante()
+
+            if fiche is None:
+                if options['une_fois']:
+                    break
+                time.sleep(options['intervalle'])
+                continue
+
+            self.traiter(fiche)
+
+    def traiter(self, fiche):
+        debut = time.perf_counter()
+        try:
+            traiter_photo_fiche(fiche)
+        except Exception as e:
+            FicheMilitant.objects.filter(pk=fiche.pk).update(photo_statut='erreur')
+            self.stderr.write(f"Fiche #{fiche.pk} : erreur de traitement de la photo : {e}")
+        else:
+            duree = (time.perf_counter() - debut) * 1000
+            self.stdout.write(f"Fiche #{fiche.pk} : photo optimisée ({duree:.0f} ms) -> {fiche.photo.name}")
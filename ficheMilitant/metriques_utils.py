@@ -0,0 +1,203 @@
+# ficheMilitant/metriques_utils.py
+
+"""
+Métriques de performance par vue (nom d'URL), au format texte Prometheus.
+
+Chaque processus (worker gunicorn) tient ses histogrammes en mémoire et les
+recopie au plus toutes les METRIQUES_INTERVALLE secondes dans son propre
+fichier METRIQUES_DIR/<pid>.json (écriture atomique). Le endpoint /metrics
+additionne les fichiers de tous les processus : les compteurs restent exacts
+quel que soit le worker qui reçoit la requête de collecte. Les fichiers des
+processus terminés (workers recyclés) sont repliés dans termines.json puis
+supprimés, pour que le dossier ne grossisse pas à chaque redémarrage.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+METRIQUES_INTERVALLE = getattr(settings, 'METRIQUES_INTERVALLE', 5)
+FICHIER_TERMINES = 'termines.json'
+
+# Bornes des histogrammes (le dernier intervalle est +Inf)
+BORNES = {
+    'enquete_requete_duree_secondes': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    'enquete_requete_sql_requetes': (1, 2, 5, 10, 20, 50, 100, 200),
+    'enquete_requete_sql_duree_secondes': (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+    'enquete_reponse_taille_octets': (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+}
+AIDE = {
+    'enquete_requete_duree_secondes': "Durée de traitement des requêtes",
+    'enquete_requete_sql_requetes': "Nombre de requêtes SQL par requête HTTP",
+    'enquete_requete_sql_duree_secondes': "Temps passé en base par requête HTTP",
+    'enquete_reponse_taille_octets': "Taille des réponses (hors réponses en flux)",
+    'enquete_requetes_total': "Requêtes HTTP par vue, méthode et code de statut",
+}
+
+
+def dossier_metriques():
+    """Lu à chaque appel, pour suivre override_settings"""
+    return str(getattr(settings, 'METRIQUES_DIR', os.path.join(settings.BASE_DIR, 'metriques')))
+
+
+def processus_actif(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # processus d'un autre utilisateur
+    return True
+
+
+class Registre:
+    """Histogrammes et compteurs d'un processus"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histogrammes = {}  # (métrique, vue, méthode) -> [comptes par intervalle, somme]
+        self.compteurs = {}  # (vue, méthode, statut) -> nombre
+        self.derniere_ecriture = 0.0
+
+    def observer(self, metrique, vue, methode, valeur):
+        bornes = BORNES[metrique]
+        with self.lock:
+            histogramme = self.histogrammes.get((metrique, vue, methode))
+            if histogramme is None:
+                histogramme = self.histogrammes[(metrique, vue, methode)] = [[0] * (len(bornes) + 1), 0.0]
+            histogramme[0][bisect_left(bornes, valeur)] += 1
+            histogramme[1] += valeur
+
+    def compter(self, vue, methode, statut):
+        with self.lock:
+            cle = (vue, methode, str(statut))
+            self.compteurs[cle] = self.compteurs.get(cle, 0) + 1
+
+    def exporter(self):
+        with self.lock:
+            return serialiser(self.histogrammes, self.compteurs)
+
+    def ecrire(self, forcer=False):
+        """Recopie les métriques du processus dans son fichier (au plus une fois par intervalle)"""
+        maintenant = time.monotonic()
+        if not forcer and maintenant - self.derniere_ecriture < METRIQUES_INTERVALLE:
+            return
+        self.derniere_ecriture = maintenant
+        dossier = dossier_metriques()
+        os.makedirs(dossier, exist_ok=True)
+        ecrire_json(os.path.join(dossier, f"{os.getpid()}.json"), self.exporter())
+
+
+registre = Registre()
+
+
+def ecrire_json(chemin, donnees):
+    """Écriture atomique : un lecteur ne voit jamais un fichier à moitié écrit"""
+    with open(chemin + '.tmp', 'w', encoding='utf-8') as fichier:
+        json.dump(donnees, fichier)
+    os.replace(chemin + '.tmp', chemin)
+
+
+def lire_json(chemin):
+    try:
+        with open(chemin, encoding='utf-8') as fichier:
+            return json.load(fichier)
+    except (OSError, ValueError):
+        return None
+
+
+def serialiser(histogrammes, compteurs):
+    """Totaux -> format des fichiers de métriques"""
+    return {
+        'histogrammes': [[*cle, comptes[:], somme] for cle, (comptes, somme) in histogrammes.items()],
+        'compteurs': [[*cle, nombre] for cle, nombre in compteurs.items()],
+    }
+
+
+def additionner(histogrammes, compteurs, donnees):
+    """Ajoute les métriques d'un fichier aux totaux"""
+    for metrique, vue, methode, comptes, somme in donnees['histogrammes']:
+        if metrique not in BORNES or len(comptes) != len(BORNES[metrique]) + 1:
+            continue  # fichier écrit avec d'autres bornes
+        total = histogrammes.setdefault((metrique, vue, methode), [[0] * len(comptes), 0.0])
+        total[0] = [a + b for a, b in zip(total[0], comptes)]
+        total[1] += somme
+    for vue, methode, statut, nombre in donnees['compteurs']:
+        compteurs[(vue, methode, statut)] = compteurs.get((vue, methode, statut), 0) + nombre
+
+
+def lire_metriques_processus():
+    """
+    Additionne les fichiers de métriques de tous les processus
+    Les fichiers des processus terminés sont repliés dans termines.json puis supprimés,
+    sous verrou : deux collectes simultanées ne replient pas deux fois le même fichier
+    """
+    dossier = dossier_metriques()
+    os.makedirs(dossier, exist_ok=True)
+    histogrammes, compteurs = {}, {}
+
+    with open(os.path.join(dossier, '.verrou'), 'w') as verrou:
+        fcntl.flock(verrou, fcntl.LOCK_EX)
+        termines = {}, {}
+        donnees = lire_json(os.path.join(dossier, FICHIER_TERMINES))
+        if donnees:
+            additionner(*termines, donnees)
+
+        a_supprimer = []
+        for nom in os.listdir(dossier):
+            pid = nom[:-len('.json')]
+            if not (nom.endswith('.json') and pid.isdigit()):
+                continue
+            donnees = lire_json(os.path.join(dossier, nom))
+            if donnees is None:
+                continue
+            if processus_actif(int(pid)):
+                additionner(histogrammes, compteurs, donnees)
+            else:
+                additionner(*termines, donnees)
+                a_supprimer.append(nom)
+
+        termines = serialiser(*termines)
+        if a_supprimer:
+            ecrire_json(os.path.join(dossier, FICHIER_TERMINES), termines)
+            for nom in a_supprimer:
+                os.remove(os.path.join(dossier, nom))
+
+    additionner(histogrammes, compteurs, termines)
+    return histogrammes, compteurs
+
+
+def _etiquettes(**valeurs):
+    def echapper(valeur):
+        return str(valeur).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{cle}="{echapper(valeur)}"' for cle, valeur in valeurs.items())
+
+
+def format_prometheus():
+    """Texte d'exposition Prometheus (version 0.0.4) des métriques de tous les processus"""
+    registre.ecrire(forcer=True)
+    histogrammes, compteurs = lire_metriques_processus()
+
+    lignes = [f"# HELP enquete_requetes_total {AIDE['enquete_requetes_total']}",
+              "# TYPE enquete_requetes_total counter"]
+    for (vue, methode, statut), nombre in sorted(compteurs.items()):
+        lignes.append(f"enquete_requetes_total{{{_etiquettes(vue=vue, methode=methode, statut=statut)}}} {nombre}")
+
+    for metrique, bornes in BORNES.items():
+        lignes += [f"# HELP {metrique} {AIDE[metrique]}", f"# TYPE {metrique} histogram"]
+        for (nom, vue, methode), (comptes, somme) in sorted(histogrammes.items()):
+            if nom != metrique:
+                continue
+            etiquettes = _etiquettes(vue=vue, methode=methode)
+            cumul = 0
+            for borne, compte in zip((*bornes, '+Inf'), comptes):
+                cumul += compte
+                lignes.append(f'{metrique}_bucket{{{etiquettes},le="{borne}"}} {cumul}')
+            lignes.append(f"{metrique}_sum{{{etiquettes}}} {somme:.6f}")
+            lignes.append(f"{metrique}_count{{{etiquettes}}} {cumul}")
+    return '\n'.join(lignes) + '\n'
@@ -0,0 +1,80 @@
+# ficheMilitant/middleware.py
+
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metriques_utils import registre
+
+logger_lent = logging.getLogger('ficheMilitant.lent')
+
+METRIQUES_SEUIL_LENT = getattr(settings, 'METRIQUES_SEUIL_LENT', 1.0)  # secondes
+NOMBRE_SQL_JOURNALISEES = 5
+LONGUEUR_MAX_SQL = 500
+
+
+class CompteurSQL:
+    """execute_wrapper : compte et chronomètre les requêtes SQL d'une requête HTTP"""
+
+    def __init__(self):
+        self.requetes = []  # (durée en secondes, sql)
+
+    def __call__(self, execute, sql, params, many, context):
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.requetes.append((time.perf_counter() - debut, sql))
+
+    @property
+    def duree(self):
+        return sum(duree for duree, _ in self.requetes)
+
+    def plus_lentes(self, nombre=NOMBRE_SQL_JOURNALISEES):
+        return [
+            {'duree_ms': round(duree * 1000, 2), 'sql': sql[:LONGUEUR_MAX_SQL]}
+            for duree, sql in sorted(self.requetes, key=lambda requete: requete[0], reverse=True)[:nombre]
+        ]
+
+
+class MetriquesMiddleware:
+    """
+    Durée, requêtes SQL et taille de réponse par vue (nom d'URL), cf. metriques_utils
+    Les requêtes plus longues que METRIQUES_SEUIL_LENT sont journalisées avec leurs SQL les plus lentes
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        compteur = CompteurSQL()
+        debut = time.perf_counter()
+        with ExitStack() as pile:
+            for connexion in connections.all():
+                pile.enter_context(connexion.execute_wrapper(compteur))
+            response = self.get_response(request)
+        duree = time.perf_counter() - debut
+
+        correspondance = getattr(request, 'resolver_match', None)
+        vue = correspondance.view_name if correspondance and correspondance.view_name else 'inconnu'
+        methode = request.method
+
+        registre.observer('enquete_requete_duree_secondes', vue, methode, duree)
+        registre.observer('enquete_requete_sql_requetes', vue, methode, len(compteur.requetes))
+        registre.observer('enquete_requete_sql_duree_secondes', vue, methode, compteur.duree)
+        if not response.streaming:
+            registre.observer('enquete_reponse_taille_octets', vue, methode, len(response.content))
+        registre.compter(vue, methode, response.status_code)
+        registre.ecrire()
+
+        if duree >= METRIQUES_SEUIL_LENT:
+            logger_lent.warning(
+                "Requête lente %s %s : %.0f ms", methode, request.path, duree * 1000,
+                extra={'vue': vue, 'statut': response.status_code, 'duree_ms': round(duree * 1000, 2),
+                       'requetes_sql': len(compteur.requetes), 'temps_sql_ms': round(compteur.duree * 1000, 2),
+                       'sql_plus_lentes': compteur.plus_lentes()},
+            )
+        return response
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.23 on 2026-10-17 22:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ficheMilitant', '0005_alter_fichemilitant_photo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Electeur',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero_electeur', models.CharField(blank=True, max_length=50, verbose_name='Numéro électeur')),
+                ('nom', models.CharField(max_length=150, verbose_name='Nom')),
+                ('prenoms', models.CharField(max_length=200, verbose_name='Prénom(s)')),
+                ('sexe', models.CharField(blank=True, max_length=10, verbose_name='Sexe')),
+                ('date_naissance', models.DateField(blank=True, null=True, verbose_name='Date de naissance')),
+                ('lieu_naissance', models.CharField(blank=True, max_length=150, verbose_name='Lieu de naissance')),
+                ('profession', models.CharField(blank=True, max_length=150, verbose_name='Profession')),
+                ('adresse', models.CharField(blank=True, max_length=255, verbose_name='Adresse physique')),
+                ('commune', models.CharField(blank=True, max_length=150, verbose_name='Commune')),
+                ('lieu_vote', models.CharField(blank=True, max_length=150, verbose_name='Lieu de vote')),
+                ('bureau_vote', models.CharField(blank=True, max_length=50, verbose_name='Bureau de vote')),
+                ('nom_normalise', models.CharField(max_length=150)),
+                ('prenoms_normalises', models.CharField(max_length=200)),
+                ('lieu_naissance_normalise', models.CharField(blank=True, max_length=150)),
+            ],
+            options={
+                'verbose_name': 'Électeur',
+                'verbose_name_plural': 'Électeurs',
+                'indexes': [models.Index(fields=['nom_normalise', 'prenoms_normalises', 'date_naissance'], name='electeur_nom_prenoms_date_idx'), models.Index(fields=['numero_electeur'], name='electeur_numero_idx')],
+            },
+        ),
+    ]
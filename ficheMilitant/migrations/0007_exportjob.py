@@ -0,0 +1,39 @@
+# Generated by Django 4.2.23 on 2026-10-17 22:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('ficheMilitant', '0006_electeur'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('format', models.CharField(choices=[('csv', 'CSV'), ('xlsx', 'Excel (XLSX)'), ('parquet', 'Parquet')], default='csv', max_length=10, verbose_name='Format')),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('termine', 'Terminé'), ('erreur', 'Erreur')], default='en_attente', max_length=15, verbose_name='Statut')),
+                ('fiche_ids', models.JSONField(default=list, verbose_name='Fiches à exporter')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Nombre de fiches')),
+                ('progression', models.PositiveIntegerField(default=0, verbose_name='Fiches exportées')),
+                ('fichier', models.FileField(blank=True, upload_to='exports/', verbose_name='Fichier')),
+                ('message', models.TextField(blank=True, verbose_name='Message')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+                ('demande_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='exports', to=settings.AUTH_USER_MODEL, verbose_name='Demandé par')),
+            ],
+            options={
+                'verbose_name': 'Export de fiches',
+                'verbose_name_plural': 'Exports de fiches',
+                'ordering': ['-date_creation'],
+                'indexes': [models.Index(fields=['statut', 'id'], name='exportjob_statut_idx')],
+            },
+        ),
+    ]
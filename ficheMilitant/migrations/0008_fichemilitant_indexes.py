@@ -0,0 +1,33 @@
+# Generated by Django 4.2.23 on 2026-10-17 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ficheMilitant', '0007_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fichemilitant',
+            index=models.Index(fields=['enqueteur', '-date_soumission'], name='fiche_enqueteur_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fichemilitant',
+            index=models.Index(fields=['-date_soumission'], name='fiche_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fichemilitant',
+            index=models.Index(fields=['est_dans_csv', 'date_soumission'], name='fiche_csv_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fichemilitant',
+            index=models.Index(fields=['region', 'section', 'comite_base'], name='fiche_region_section_cb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fichemilitant',
+            index=models.Index(fields=['departement', 'inscription_electorale'], name='fiche_dept_inscription_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.23 on 2026-10-17 22:57
+
+from django.db import migrations, models
+
+
+def statut_photos_existantes(apps, schema_editor):
+    """Les photos déjà enregistrées ont été optimisées de façon synchrone"""
+    FicheMilitant = apps.get_model('ficheMilitant', 'FicheMilitant')
+    FicheMilitant.objects.exclude(photo__isnull=True).exclude(photo='').update(photo_statut='traitee')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ficheMilitant', '0008_fichemilitant_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fichemilitant',
+            name='photo_statut',
+            field=models.CharField(choices=[('aucune', 'Aucune photo'), ('en_attente', 'En attente de traitement'), ('en_cours', 'En cours de traitement'), ('traitee', 'Traitée'), ('erreur', 'Erreur de traitement')], default='aucune', max_length=15, verbose_name='Traitement de la photo'),
+        ),
+        migrations.AddIndex(
+            model_name='fichemilitant',
+            index=models.Index(fields=['photo_statut', 'id'], name='fiche_photo_statut_idx'),
+        ),
+        migrations.RunPython(statut_photos_existantes, migrations.RunPython.noop),
+    ]
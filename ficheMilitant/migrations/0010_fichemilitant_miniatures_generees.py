@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-17 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ficheMilitant', '0009_fichemilitant_photo_statut'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fichemilitant',
+            name='miniatures_generees',
+            field=models.BooleanField(default=False, help_text="Dérivés 64 px et 256 px (JPEG/WebP) disponibles pour l'admin", verbose_name='Miniatures générées'),
+        ),
+    ]
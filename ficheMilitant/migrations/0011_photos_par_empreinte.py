@@ -0,0 +1,24 @@
+# Generated by Django 4.2.23 on 2026-10-17 23:04
+
+from django.db import migrations, models
+import ficheMilitant.models
+import ficheMilitant.stockage_utils
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ficheMilitant', '0010_fichemilitant_miniatures_generees'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fichemilitant',
+            name='photo',
+            field=models.ImageField(blank=True, help_text="Photo d'identité du militant (facultatif)", null=True, storage=ficheMilitant.stockage_utils.StockageParEmpreinte(), upload_to=ficheMilitant.models.upload_photo_path, verbose_name='Photo du militant'),
+        ),
+        migrations.AddIndex(
+            model_name='fichemilitant',
+            index=models.Index(fields=['photo'], name='fiche_photo_idx'),
+        ),
+    ]
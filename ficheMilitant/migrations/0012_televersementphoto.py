@@ -0,0 +1,33 @@
+# Generated by Django 4.2.23 on 2026-10-17 23:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ficheMilitant', '0011_photos_par_empreinte'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeleversementPhoto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('nom_fichier', models.CharField(max_length=255, verbose_name='Nom du fichier')),
+                ('taille', models.PositiveIntegerField(verbose_name='Taille totale (octets)')),
+                ('recu', models.PositiveIntegerField(default=0, verbose_name='Octets reçus')),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_modification', models.DateTimeField(auto_now=True)),
+                ('enqueteur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='televersements', to='ficheMilitant.enqueteur')),
+            ],
+            options={
+                'verbose_name': 'Téléversement de photo',
+                'verbose_name_plural': 'Téléversements de photos',
+                'indexes': [models.Index(fields=['date_modification'], name='televersement_date_idx')],
+            },
+        ),
+    ]
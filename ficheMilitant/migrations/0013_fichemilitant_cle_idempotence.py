@@ -0,0 +1,22 @@
+# Generated by Django 4.2.23 on 2026-10-17 23:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ficheMilitant', '0012_televersementphoto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fichemilitant',
+            name='cle_idempotence',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name="Clé d'idempotence"),
+        ),
+        migrations.AddConstraint(
+            model_name='fichemilitant',
+            constraint=models.UniqueConstraint(fields=('enqueteur', 'cle_idempotence'), name='fiche_cle_idempotence_unique'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.23 on 2026-10-17 23:37
+
+import re
+
+from django.db import migrations, models
+
+# Copie figée de fuzzy_utils.cles_de_blocage à la date de la migration :
+# les migrations ne doivent pas dépendre du code courant de l'application
+_REMPLACEMENTS = [
+    (re.compile(r'PH'), 'F'),
+    (re.compile(r'QU|Q|CK'), 'K'),
+    (re.compile(r'C(?=[EIY])'), 'S'),
+    (re.compile(r'C'), 'K'),
+    (re.compile(r'GU(?=[EI])'), 'G'),
+    (re.compile(r'Z'), 'S'),
+    (re.compile(r'W'), 'V'),
+    (re.compile(r'Y'), 'I'),
+    (re.compile(r'H'), ''),
+    (re.compile(r'[^A-Z]'), ''),
+]
+_VOYELLES = re.compile(r'[AEIOU]')
+_DOUBLES = re.compile(r'(.)\1+')
+
+
+def code_phonetique(mot):
+    for motif, remplacement in _REMPLACEMENTS:
+        mot = motif.sub(remplacement, mot)
+    if not mot:
+        return ''
+    return _DOUBLES.sub(r'\1', mot[0] + _VOYELLES.sub('', mot[1:]))
+
+
+def cles_de_blocage(nom, prenoms):
+    mots = (nom + ' ' + prenoms).split()
+    cles = ['P:' + ' '.join(sorted(code_phonetique(mot) for mot in mots))]
+    if len(mots) > 1:
+        for position, mot in enumerate(mots):
+            autres = ' '.join(sorted(mots[:position] + mots[position + 1:]))
+            cles.append(f"O:{len(mot)}:{autres}")
+    return [cle[:255] for cle in cles]
+
+
+def indexer_electeurs_importes(apps, schema_editor):
+    """Blocs des électeurs déjà importés (sinon créés par importer_liste_electorale)"""
+    Electeur = apps.get_model('ficheMilitant', 'Electeur')
+    BlocElectoral = apps.get_model('ficheMilitant', 'BlocElectoral')
+    cles = Electeur.objects.values_list('nom_normalise', 'prenoms_normalises').distinct()
+    lot = []
+    for nom, prenoms in cles.iterator():
+        lot.extend(BlocElectoral(cle=cle, nom_normalise=nom, prenoms_normalises=prenoms)
+                   for cle in cles_de_blocage(nom, prenoms))
+        if len(lot) >= 5000:
+            BlocElectoral.objects.bulk_create(lot)
+            lot = []
+    BlocElectoral.objects.bulk_create(lot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ficheMilitant', '0013_fichemilitant_cle_idempotence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlocElectoral',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cle', models.CharField(max_length=255)),
+                ('nom_normalise', models.CharField(max_length=150)),
+                ('prenoms_normalises', models.CharField(max_length=200)),
+            ],
+            options={
+                'verbose_name': 'Bloc électoral',
+                'verbose_name_plural': 'Blocs électoraux',
+                'indexes': [models.Index(fields=['cle'], name='bloc_electoral_cle_idx')],
+            },
+        ),
+        migrations.RunPython(indexer_electeurs_importes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.23 on 2026-10-18 00:00
+
+import os
+import secrets
+import shutil
+
+from django.conf import settings
+from django.db import migrations, models
+import ficheMilitant.stockage_utils
+
+
+def reprendre_exports_existants(apps, schema_editor):
+    """
+    Les identifiants deviennent des paramètres de sélection, et les fichiers déjà
+    produits quittent MEDIA_ROOT/exports (servi publiquement) pour EXPORTS_ROOT,
+    sous un nom aléatoire
+    """
+    ExportJob = apps.get_model('ficheMilitant', 'ExportJob')
+    destination = str(getattr(settings, 'EXPORTS_ROOT', os.path.join(settings.BASE_DIR, 'exports')))
+
+    for job_id, fiche_ids, fichier in ExportJob.objects.values_list('id', 'fiche_ids', 'fichier').iterator():
+        nouveau_nom = ''
+        ancien_chemin = os.path.join(settings.MEDIA_ROOT, fichier) if fichier else None
+        if ancien_chemin and os.path.exists(ancien_chemin):
+            os.makedirs(destination, exist_ok=True)
+            nouveau_nom = secrets.token_urlsafe(16) + os.path.splitext(fichier)[1]
+            shutil.move(ancien_chemin, os.path.join(destination, nouveau_nom))
+        ExportJob.objects.filter(pk=job_id).update(parametres={'ids': fiche_ids or []}, fichier=nouveau_nom)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ficheMilitant', '0014_blocelectoral'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='parametres',
+            field=models.JSONField(default=dict, verbose_name='Fiches à exporter'),
+        ),
+        migrations.RunPython(reprendre_exports_existants, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='exportjob',
+            name='fiche_ids',
+        ),
+        migrations.AlterField(
+            model_name='exportjob',
+            name='fichier',
+            field=models.FileField(blank=True, storage=ficheMilitant.stockage_utils.StockageExports(), upload_to='', verbose_name='Fichier'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.23 on 2026-10-18 12:00
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def supprimer_blocs_en_double(apps, schema_editor):
+    """Les blocs créés avant la contrainte peuvent exister en double (clé répétée d'une même personne)"""
+    BlocElectoral = apps.get_model('ficheMilitant', 'BlocElectoral')
+    doublons = (BlocElectoral.objects.values('cle', 'nom_normalise', 'prenoms_normalises')
+                .annotate(nombre=Count('id'), premier=Min('id')).filter(nombre__gt=1))
+    for doublon in doublons.iterator():
+        (BlocElectoral.objects
+         .filter(cle=doublon['cle'], nom_normalise=doublon['nom_normalise'],
+                 prenoms_normalises=doublon['prenoms_normalises'])
+         .exclude(id=doublon['premier']).delete())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ficheMilitant', '0015_exportjob_parametres'),
+    ]
+
+    operations = [
+        migrations.RunPython(supprimer_blocs_en_double, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='blocelectoral',
+            constraint=models.UniqueConstraint(fields=('cle', 'nom_normalise', 'prenoms_normalises'),
+                                               name='bloc_electoral_unique'),
+        ),
+        migrations.RemoveIndex(
+            model_name='blocelectoral',
+            name='bloc_electoral_cle_idx',
+        ),
+    ]
@@ -3,6 +3,9 @@
 from django.db import models
 from django.contrib.auth.models import User
 import os
+import uuid
+
+from .stockage_utils import stockage_exports, stockage_photos
 
 def upload_photo_path(instance, filename):
     """Fonction pour définir le chemin d'upload des photos"""
@@ -38,12 +41,33 @@ class FicheMilitant(models.Model):
     # NOUVEAU : Champ pour la photo
     photo = models.ImageField(
         upload_to=upload_photo_path,
+        storage=stockage_photos,
         blank=True,
         null=True,
         verbose_name="Photo du militant",
         help_text="Photo d'identité du militant (facultatif)"
     )
 
+    PHOTO_STATUT_CHOICES = [
+        ('aucune', 'Aucune photo'),
+        ('en_attente', 'En attente de traitement'),
+        ('en_cours', 'En cours de traitement'),
+        ('traitee', 'Traitée'),
+        ('erreur', 'Erreur de traitement'),
+    ]
+    photo_statut = models.CharField(
+        max_length=15,
+        choices=PHOTO_STATUT_CHOICES,
+        default='aucune',
+        verbose_name="Traitement de la photo"
+    )
+
+    miniatures_generees = models.BooleanField(
+        default=False,
+        verbose_name="Miniatures générées",
+        help_text="Dérivés 64 px et 256 px (JPEG/WebP) disponibles pour l'admin"
+    )
+
     # 1. LOCALISATION
     region = models.CharField(max_length=100, verbose_name="Région")
     departement_administratif = models.CharField(max_length=100, verbose_name="Département Administratif")
@@ -101,6 +125,9 @@ class FicheMilitant(models.Model):
     date_soumission = models.DateTimeField(auto_now_add=True)
     est_dans_csv = models.BooleanField(default=False, verbose_name="Présent dans le fichier électoral")
     numero_electeur_csv = models.CharField(max_length=50, blank=True, null=True, verbose_name="Numéro électeur trouvé")
+    # Clé générée avec le formulaire (ou id local d'une fiche hors ligne) : un envoi
+    # répété retrouve la fiche déjà enregistrée au lieu d'en créer une seconde
+    cle_idempotence = models.CharField(max_length=64, blank=True, null=True, verbose_name="Clé d'idempotence")
 
     def __str__(self):
         return f"{self.prenoms} {self.nom} - {self.date_soumission.strftime('%d/%m/%Y')}"
@@ -111,10 +138,147 @@ class FicheMilitant(models.Model):
             return self.photo.url
         return None
 
+    def get_miniature_url(self, taille, extension='jpg'):
+        """URL d'un dérivé de la photo (voir image_utils.TAILLES_MINIATURES), ou None"""
+        if self.photo and self.miniatures_generees:
+            from .image_utils import nom_miniature
+            return self.photo.storage.url(nom_miniature(self.photo.name, taille, extension))
+        return None
+
     class Meta:
         verbose_name = "Fiche de Militant"
         verbose_name_plural = "Fiches de Militants"
         ordering = ['-date_soumission']
+        # Index alignés sur les accès réels : vues par enquêteur, list_filter de l'admin,
+        # tri par défaut du changelist (voir manage.py bench_index_fiches)
+        indexes = [
+            models.Index(fields=['enqueteur', '-date_soumission'], name='fiche_enqueteur_date_idx'),
+            models.Index(fields=['-date_soumission'], name='fiche_date_idx'),
+            models.Index(fields=['est_dans_csv', 'date_soumission'], name='fiche_csv_date_idx'),
+            models.Index(fields=['region', 'section', 'comite_base'], name='fiche_region_section_cb_idx'),
+            models.Index(fields=['departement', 'inscription_electorale'], name='fiche_dept_inscription_idx'),
+            # File d'attente du worker photo (manage.py traiter_photos)
+            models.Index(fields=['photo_statut', 'id'], name='fiche_photo_statut_idx'),
+            # Comptage des références d'un fichier photo partagé (stockage par empreinte)
+            models.Index(fields=['photo'], name='fiche_photo_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['enqueteur', 'cle_idempotence'], name='fiche_cle_idempotence_unique'),
+        ]
+
+class Electeur(models.Model):
+    """Liste électorale importée depuis le CSV (manage.py importer_liste_electorale)"""
+    numero_electeur = models.CharField(max_length=50, blank=True, verbose_name="Numéro électeur")
+    nom = models.CharField(max_length=150, verbose_name="Nom")
+    prenoms = models.CharField(max_length=200, verbose_name="Prénom(s)")
+    sexe = models.CharField(max_length=10, blank=True, verbose_name="Sexe")
+    date_naissance = models.DateField(blank=True, null=True, verbose_name="Date de naissance")
+    lieu_naissance = models.CharField(max_length=150, blank=True, verbose_name="Lieu de naissance")
+    profession = models.CharField(max_length=150, blank=True, verbose_name="Profession")
+    adresse = models.CharField(max_length=255, blank=True, verbose_name="Adresse physique")
+    commune = models.CharField(max_length=150, blank=True, verbose_name="Commune")
+    lieu_vote = models.CharField(max_length=150, blank=True, verbose_name="Lieu de vote")
+    bureau_vote = models.CharField(max_length=50, blank=True, verbose_name="Bureau de vote")
+
+    # Clés de recherche normalisées (voir csv_utils.normalize_text)
+    nom_normalise = models.CharField(max_length=150)
+    prenoms_normalises = models.CharField(max_length=200)
+    lieu_naissance_normalise = models.CharField(max_length=150, blank=True)
+
+    def __str__(self):
+        return f"{self.prenoms} {self.nom} ({self.numero_electeur})"
+
+    class Meta:
+        verbose_name = "Électeur"
+        verbose_name_plural = "Électeurs"
+        indexes = [
+            models.Index(fields=['nom_normalise', 'prenoms_normalises', 'date_naissance'],
+                         name='electeur_nom_prenoms_date_idx'),
+            models.Index(fields=['numero_electeur'], name='electeur_numero_idx'),
+        ]
+
+
+class BlocElectoral(models.Model):
+    """Clés de blocage du rapprochement approximatif (fuzzy_utils) des (NOM, PRENOMS) de la table Electeur"""
+    cle = models.CharField(max_length=255)
+    nom_normalise = models.CharField(max_length=150)
+    prenoms_normalises = models.CharField(max_length=200)
+
+    class Meta:
+        verbose_name = "Bloc électoral"
+        verbose_name_plural = "Blocs électoraux"
+        # Un bloc par (clé, NOM, PRENOMS) ; l'index de la contrainte sert aussi la recherche par clé
+        constraints = [
+            models.UniqueConstraint(fields=['cle', 'nom_normalise', 'prenoms_normalises'],
+                                    name='bloc_electoral_unique'),
+        ]
+
+class ExportJob(models.Model):
+    """Export de fiches construit en arrière-plan (manage.py traiter_exports)"""
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel (XLSX)'),
+        ('parquet', 'Parquet'),
+    ]
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('en_cours', 'En cours'),
+        ('termine', 'Terminé'),
+        ('erreur', 'Erreur'),
+    ]
+
+    demande_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='exports', verbose_name="Demandé par")
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='csv', verbose_name="Format")
+    statut = models.CharField(max_length=15, choices=STATUT_CHOICES, default='en_attente', verbose_name="Statut")
+    # {'ids': [...]} pour une sélection de la page, {'filtres': {...}, 'recherche': '...'}
+    # pour toute la liste filtrée (voir export_utils.fiches_du_job)
+    parametres = models.JSONField(default=dict, verbose_name="Fiches à exporter")
+    total = models.PositiveIntegerField(default=0, verbose_name="Nombre de fiches")
+    progression = models.PositiveIntegerField(default=0, verbose_name="Fiches exportées")
+    fichier = models.FileField(storage=stockage_exports, blank=True, verbose_name="Fichier")
+    message = models.TextField(blank=True, verbose_name="Message")
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Export #{self.pk} ({self.get_format_display()}) - {self.get_statut_display()}"
+
+    class Meta:
+        verbose_name = "Export de fiches"
+        verbose_name_plural = "Exports de fiches"
+        ordering = ['-date_creation']
+        indexes = [
+            models.Index(fields=['statut', 'id'], name='exportjob_statut_idx'),
+        ]
+
+class TeleversementPhoto(models.Model):
+    """
+    Photo envoyée par morceaux (connexion mobile instable), reprise à l'octet près
+    Le fichier est assemblé sur disque ; la fiche y fait référence par son token
+    """
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    enqueteur = models.ForeignKey(Enqueteur, on_delete=models.CASCADE, related_name='televersements')
+    nom_fichier = models.CharField(max_length=255, verbose_name="Nom du fichier")
+    taille = models.PositiveIntegerField(verbose_name="Taille totale (octets)")
+    recu = models.PositiveIntegerField(default=0, verbose_name="Octets reçus")
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_modification = models.DateTimeField(auto_now=True)
+
+    @property
+    def termine(self):
+        return self.recu >= self.taille
+
+    def __str__(self):
+        return f"{self.nom_fichier} ({self.recu}/{self.taille})"
+
+    class Meta:
+        verbose_name = "Téléversement de photo"
+        verbose_name_plural = "Téléversements de photos"
+        indexes = [
+            models.Index(fields=['date_modification'], name='televersement_date_idx'),
+        ]
 
 # Garder l'ancien modèle pour compatibilité si nécessaire
 class EnquetePolitique(models.Model):
@@ -0,0 +1,14 @@
+# ficheMilitant/signals.py
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import FicheMilitant
+from .stats_utils import invalider_statistiques
+
+
+@receiver(post_save, sender=FicheMilitant)
+@receiver(post_delete, sender=FicheMilitant)
+def invalider_statistiques_fiche(sender, instance, **kwargs):
+    """Les statistiques en cache de l'enquêteur ne sont plus à jour"""
+    invalider_statistiques(instance.enqueteur_id)
@@ -0,0 +1,225 @@
+# ficheMilitant/snapshot_utils.py
+
+"""
+Snapshot binaire de la liste électorale.
+
+Le fichier est compilé une fois (manage.py compiler_liste_electorale) puis
+ouvert en mmap par chaque worker : les pages sont partagées par le système
+et aucun worker n'a besoin de relire ni de normaliser le CSV au démarrage.
+
+Format (petit-boutiste) :
+    en-tête     : MAGIC, mtime_ns et taille du CSV source, nombre d'entrées,
+                  nombre de chaînes, total d'électeurs, offsets des sections,
+                  nombre de blocs et offset de leur section
+    entrées     : une ligne de CHAMPS_ENTREE identifiants de chaîne (uint32),
+                  triées par clé "NOM\\x1fPRENOMS" normalisée
+    offsets     : nb_chaines + 1 offsets (uint32) dans le bloc de chaînes
+    chaînes     : table de chaînes UTF-8 dédupliquées
+    blocs       : couples (clé de bloc, clé "NOM\\x1fPRENOMS") en identifiants de
+                  chaîne, triés par clé de bloc (rapprochement approximatif,
+                  cf. fuzzy_utils.cles_de_blocage)
+"""
+
+import logging
+import mmap
+import os
+import struct
+
+from django.conf import settings
+
+from .csv_utils import CSV_FILE_PATH, COLONNES_RESULTAT, rechercher_dans_candidats
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE_PATH = getattr(settings, 'SNAPSHOT_ELECTEURS_PATH', os.path.splitext(CSV_FILE_PATH)[0] + '.snap')
+
+MAGIC = b'ELECSNP2'
+ENTETE = struct.Struct('<8sqqIIIQQQIQ')
+SEPARATEUR_CLE = '\x1f'
+
+# clé, date, lieu normalisé puis les colonnes du résultat
+CHAMPS_ENTREE = 3 + len(COLONNES_RESULTAT)
+ENTREE = struct.Struct('<%dI' % CHAMPS_ENTREE)
+OFFSET = struct.Struct('<I')
+BLOC = struct.Struct('<II')
+
+
+def compiler_snapshot(index, chemin=None):
+    """
+    Écrit le snapshot d'un IndexElectoral sur disque
+    Le fichier est écrit à côté puis renommé : les workers qui ont déjà
+    mappé l'ancien snapshot continuent de le lire sans erreur
+    """
+    chemin = chemin or SNAPSHOT_FILE_PATH
+    chaines = {}
+
+    def identifiant(chaine):
+        ident = chaines.get(chaine)
+        if ident is None:
+            ident = chaines[chaine] = len(chaines)
+        return ident
+
+    groupes = sorted(
+        (f"{nom}{SEPARATEUR_CLE}{prenoms}", lignes)
+        for (nom, prenoms), lignes in index.entrees.items()
+    )
+
+    entrees = []
+    for cle_texte, lignes in groupes:
+        cle = identifiant(cle_texte)
+        for date_csv, lieu_csv, valeurs in lignes:
+            entrees.append((cle, identifiant(date_csv), identifiant(lieu_csv))
+                           + tuple(identifiant(valeur) for valeur in valeurs))
+
+    from .fuzzy_utils import TAILLE_MAX_BLOC, cles_de_blocage
+    couples = sorted(
+        (cle_bloc, cle_texte)
+        for cle_texte, _ in groupes
+        for cle_bloc in cles_de_blocage(*cle_texte.split(SEPARATEUR_CLE))
+    )
+    blocs = []
+    precedente, taille_bloc = None, 0
+    for cle_bloc, cle_texte in couples:
+        taille_bloc = taille_bloc + 1 if cle_bloc == precedente else 1
+        precedente = cle_bloc
+        if taille_bloc <= TAILLE_MAX_BLOC:
+            blocs.append((identifiant(cle_bloc), identifiant(cle_texte)))
+
+    blob = bytearray()
+    offsets = []
+    for chaine in chaines:  # les dict conservent l'ordre d'insertion = identifiants
+        offsets.append(len(blob))
+        blob += chaine.encode('utf-8')
+    offsets.append(len(blob))
+
+    mtime_ns, taille = index.signature or (0, 0)
+    off_entrees = ENTETE.size
+    off_offsets = off_entrees + len(entrees) * ENTREE.size
+    off_chaines = off_offsets + len(offsets) * OFFSET.size
+    off_blocs = off_chaines + len(blob)
+
+    chemin_tmp = f"{chemin}.tmp"
+    with open(chemin_tmp, 'wb') as fichier:
+        fichier.write(ENTETE.pack(MAGIC, mtime_ns, taille, len(entrees), len(chaines),
+                                  index.total, off_entrees, off_offsets, off_chaines, len(blocs), off_blocs))
+        for entree in entrees:
+            fichier.write(ENTREE.pack(*entree))
+        fichier.write(struct.pack('<%dI' % len(offsets), *offsets))
+        fichier.write(blob)
+        for bloc in blocs:
+            fichier.write(BLOC.pack(*bloc))
+    os.replace(chemin_tmp, chemin)
+
+    return len(entrees), len(chaines)
+
+
+class SnapshotElectoral:
+    """Lecture du snapshot en mmap, même interface que IndexElectoral"""
+
+    def __init__(self, chemin):
+        with open(chemin, 'rb') as fichier:
+            self._mmap = mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, mtime_ns, taille, self.nb_entrees, self.nb_chaines, self.total,
+         self._off_entrees, self._off_offsets, self._off_chaines,
+         self.nb_blocs, self._off_blocs) = ENTETE.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"Fichier snapshot invalide : {chemin}")
+        self.signature = (mtime_ns, taille)
+
+    def fermer(self):
+        self._mmap.close()
+
+    def chaine(self, ident):
+        position = self._off_offsets + ident * OFFSET.size
+        debut, fin = struct.unpack_from('<II', self._mmap, position)
+        return self._mmap[self._off_chaines + debut:self._off_chaines + fin].decode('utf-8')
+
+    def _entree(self, position):
+        return ENTREE.unpack_from(self._mmap, self._off_entrees + position * ENTREE.size)
+
+    def _cle(self, position):
+        return self.chaine(self._entree(position)[0])
+
+    def cles(self):
+        """Itère sur les clés (NOM, PRENOMS) normalisées distinctes"""
+        precedente = None
+        for position in range(self.nb_entrees):
+            ident = self._entree(position)[0]
+            if ident != precedente:
+                precedente = ident
+                nom, _, prenoms = self.chaine(ident).partition(SEPARATEUR_CLE)
+                yield nom, prenoms
+
+    def candidats(self, nom_normalise, prenoms_normalises):
+        """Recherche dichotomique des entrées ayant cette clé"""
+        cle = f"{nom_normalise}{SEPARATEUR_CLE}{prenoms_normalises}"
+
+        bas, haut = 0, self.nb_entrees
+        while bas < haut:
+            milieu = (bas + haut) // 2
+            if self._cle(milieu) < cle:
+                bas = milieu + 1
+            else:
+                haut = milieu
+
+        position = bas
+        while position < self.nb_entrees:
+            entree = self._entree(position)
+            if self.chaine(entree[0]) != cle:
+                break
+            yield (self.chaine(entree[1]), self.chaine(entree[2]),
+                   tuple(self.chaine(ident) for ident in entree[3:]))
+            position += 1
+
+    def _bloc(self, position):
+        return BLOC.unpack_from(self._mmap, self._off_blocs + position * BLOC.size)
+
+    def candidats_par_blocs(self, cles_blocs):
+        """Clés (NOM, PRENOMS) rangées dans ces blocs (recherche dichotomique par clé de bloc)"""
+        for cle_bloc in cles_blocs:
+            bas, haut = 0, self.nb_blocs
+            while bas < haut:
+                milieu = (bas + haut) // 2
+                if self.chaine(self._bloc(milieu)[0]) < cle_bloc:
+                    bas = milieu + 1
+                else:
+                    haut = milieu
+
+            position = bas
+            while position < self.nb_blocs:
+                ident_bloc, ident_cle = self._bloc(position)
+                if self.chaine(ident_bloc) != cle_bloc:
+                    break
+                nom, _, prenoms = self.chaine(ident_cle).partition(SEPARATEUR_CLE)
+                yield nom, prenoms
+                position += 1
+
+    def rechercher(self, nom, prenoms, date_naissance=None, lieu_naissance=None):
+        return rechercher_dans_candidats(self.candidats, nom, prenoms, date_naissance, lieu_naissance)
+
+    def rechercher_personnes(self, personnes):
+        return [self.rechercher(*personne) for personne in personnes]
+
+
+def ouvrir_snapshot(signature, chemin=None):
+    """
+    Ouvre le snapshot s'il a été compilé à partir du CSV de cette signature
+    Retourne None sinon (snapshot absent, périmé ou illisible)
+    """
+    chemin = chemin or SNAPSHOT_FILE_PATH
+    if not os.path.exists(chemin):
+        return None
+
+    try:
+        snapshot = SnapshotElectoral(chemin)
+    except (OSError, ValueError, struct.error) as e:
+        logger.error("Snapshot électoral illisible : %s", e)
+        return None
+
+    if snapshot.signature != tuple(signature):
+        logger.info("Snapshot électoral périmé, utilisation du CSV")
+        snapshot.fermer()
+        return None
+    return snapshot
@@ -0,0 +1,42 @@
+# ficheMilitant/stats_utils.py
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Enqueteur, FicheMilitant
+
+# Les statistiques sont invalidées à chaque enregistrement/suppression de fiche (signals.py) ;
+# la durée de vie ne sert que de filet de sécurité pour les mises à jour en masse
+DUREE_CACHE_STATISTIQUES = 60 * 60
+
+FILTRE_AVEC_PHOTO = Q(photo__isnull=False) & ~Q(photo='')
+
+
+def cle_cache_statistiques(enqueteur_id):
+    return f'statistiques_enqueteur:{enqueteur_id}'
+
+
+def statistiques_enqueteur(enqueteur_id):
+    """
+    Statistiques des fiches d'un enquêteur, calculées en une seule requête
+    (total, fiches dans le fichier électoral, fiches avec photo) puis mises en cache
+    """
+    cle = cle_cache_statistiques(enqueteur_id)
+    statistiques = cache.get(cle)
+    if statistiques is None:
+        statistiques = FicheMilitant.objects.filter(enqueteur_id=enqueteur_id).aggregate(
+            total=Count('id'),
+            dans_csv=Count('id', filter=Q(est_dans_csv=True)),
+            avec_photo=Count('id', filter=FILTRE_AVEC_PHOTO),
+        )
+        cache.set(cle, statistiques, DUREE_CACHE_STATISTIQUES)
+    return statistiques
+
+
+def invalider_statistiques(enqueteur_id):
+    cache.delete(cle_cache_statistiques(enqueteur_id))
+
+
+def invalider_toutes_statistiques():
+    """À appeler après une mise à jour en masse (bulk_update ne déclenche pas les signaux)"""
+    cache.delete_many([cle_cache_statistiques(pk) for pk in Enqueteur.objects.values_list('pk', flat=True)])
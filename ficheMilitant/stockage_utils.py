@@ -0,0 +1,157 @@
+# ficheMilitant/stockage_utils.py
+
+"""
+Stockage des photos adressé par leur contenu.
+
+Chaque photo est enregistrée sous l'empreinte SHA-256 de ses octets :
+    photos/sha256/ab/cd/abcd...ef.jpg
+Une photo identique déjà stockée n'est ni réécrite ni dupliquée ; plusieurs
+fiches pointent alors vers le même fichier. Les références sont les fiches
+elles-mêmes (FicheMilitant.photo, indexé).
+
+Un fichier partagé n'est jamais supprimé pendant une requête : entre la
+vérification « plus aucune fiche » et la suppression, une autre requête peut
+y rattacher une fiche dont la transaction n'est pas encore validée. Les
+fichiers sans référence sont supprimés par manage.py purger_photos, après un
+délai de grâce compté depuis leur dernier enregistrement, et sous le même
+verrou de fichier que l'enregistrement.
+"""
+
+import fcntl
+import hashlib
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+PREFIXE_EMPREINTES = 'photos/sha256'
+PREFIXE_MINIATURES = 'photos/miniatures'
+TAILLE_BLOC_HACHAGE = 64 * 1024
+DELAI_GRACE_PURGE = 3600  # secondes depuis le dernier enregistrement du fichier
+TAILLE_LOT_PURGE = 500
+
+
+def empreinte_contenu(contenu):
+    """SHA-256 (hexadécimal) d'un fichier Django lu par blocs ; le fichier est rembobiné"""
+    sha = hashlib.sha256()
+    for bloc in contenu.chunks(TAILLE_BLOC_HACHAGE):
+        sha.update(bloc)
+    contenu.seek(0)
+    return sha.hexdigest()
+
+
+def nom_par_empreinte(empreinte, extension):
+    """Chemin réparti sur deux niveaux de sous-dossiers (256 x 256) pour limiter la taille des dossiers"""
+    extension = extension.lower() or '.jpg'
+    return f"{PREFIXE_EMPREINTES}/{empreinte[:2]}/{empreinte[2:4]}/{empreinte}{extension}"
+
+
+def est_nom_par_empreinte(nom):
+    """Le fichier appartient-il au stockage par empreinte (donc potentiellement partagé) ?"""
+    return bool(nom) and nom.startswith(PREFIXE_EMPREINTES + '/')
+
+
+def nombre_references(nom):
+    """Nombre de fiches dont la photo est ce fichier"""
+    from .models import FicheMilitant
+    return FicheMilitant.objects.filter(photo=nom).count()
+
+
+@deconstructible
+class StockageParEmpreinte(FileSystemStorage):
+    """
+    FileSystemStorage dont le nom des fichiers est l'empreinte de leur contenu
+    Le nom proposé (upload_photo_path) ne sert plus qu'à fournir l'extension ;
+    les miniatures, nommées d'après leur photo, sont enregistrées sous leur nom
+    """
+
+    @contextmanager
+    def verrou(self):
+        """Verrou exclusif (entre processus) des enregistrements et de la purge des fichiers par empreinte"""
+        dossier = self.path(PREFIXE_EMPREINTES)
+        os.makedirs(dossier, exist_ok=True)
+        with open(os.path.join(dossier, '.verrou'), 'w') as verrou:
+            fcntl.flock(verrou, fcntl.LOCK_EX)
+            yield
+
+    def _save(self, name, content):
+        if name.startswith(PREFIXE_MINIATURES + '/'):
+            return super()._save(name, content)
+        nom = nom_par_empreinte(empreinte_contenu(content), os.path.splitext(name)[1])
+        with self.verrou():
+            if self.exists(nom):
+                # Même contenu déjà stocké : aucune écriture, mais la date repousse la purge
+                os.utime(self.path(nom))
+                return nom
+            return super()._save(nom, content)
+
+    def delete(self, name):
+        """Les fichiers par empreinte, potentiellement partagés, ne sont supprimés que par purger_orphelins"""
+        if est_nom_par_empreinte(name):
+            return
+        super().delete(name)
+
+    def purger_orphelins(self, delai=DELAI_GRACE_PURGE, supprimer=True):
+        """
+        Supprime les fichiers par empreinte qu'aucune fiche ne référence et qui n'ont
+        pas été enregistrés depuis `delai` secondes, avec leurs miniatures ; retourne les noms concernés
+        """
+        from .image_utils import TAILLES_MINIATURES, formats_miniatures, nom_miniature
+        from .models import FicheMilitant
+
+        limite = time.time() - delai
+        candidats = []
+        for dossier, _, fichiers in os.walk(self.path(PREFIXE_EMPREINTES)):
+            for fichier in fichiers:
+                chemin = os.path.join(dossier, fichier)
+                if not fichier.startswith('.') and os.path.getmtime(chemin) <= limite:
+                    candidats.append(os.path.relpath(chemin, self.location).replace(os.sep, '/'))
+
+        orphelins = []
+        for debut in range(0, len(candidats), TAILLE_LOT_PURGE):
+            lot = candidats[debut:debut + TAILLE_LOT_PURGE]
+            references = set(FicheMilitant.objects.filter(photo__in=lot).values_list('photo', flat=True))
+            orphelins.extend(nom for nom in lot if nom not in references)
+
+        if not supprimer:
+            return orphelins
+        supprimes = []
+        for nom in orphelins:
+            # Revérifié sous verrou : le fichier a pu être réenregistré ou rattaché depuis
+            with self.verrou():
+                if (self.exists(nom) and os.path.getmtime(self.path(nom)) <= limite
+                        and not nombre_references(nom)):
+                    super().delete(nom)
+                    for taille in TAILLES_MINIATURES:
+                        for extension, _ in formats_miniatures():
+                            super().delete(nom_miniature(nom, taille, extension))
+                    supprimes.append(nom)
+        return supprimes
+
+
+stockage_photos = StockageParEmpreinte()
+
+
+@deconstructible
+class StockageExports(FileSystemStorage):
+    """
+    Fichiers d'export dans EXPORTS_ROOT (lu à chaque accès), hors de MEDIA_ROOT :
+    ils n'ont pas d'URL publique et ne sont servis que par la vue de téléchargement de l'admin
+    """
+
+    @property
+    def base_location(self):
+        return str(getattr(settings, 'EXPORTS_ROOT', os.path.join(settings.BASE_DIR, 'exports')))
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    def url(self, name):
+        raise ValueError("Les exports n'ont pas d'URL publique")
+
+
+stockage_exports = StockageExports()
@@ -0,0 +1,115 @@
+# ficheMilitant/televersement_utils.py
+
+"""
+Téléversement des photos par morceaux, avec reprise.
+
+Le client crée un téléversement (nom, taille), puis envoie les octets par
+morceaux en indiquant le décalage de chacun. Un morceau interrompu n'est
+compté que pour les octets effectivement reçus : le client reprend au
+décalage renvoyé par le serveur. Les morceaux sont recopiés par blocs dans
+le fichier sur disque, sans que la photo ne soit jamais entière en mémoire.
+"""
+
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import TeleversementPhoto
+
+TELEVERSEMENTS_DIR = 'televersements'
+TAILLE_MAX_MORCEAU = getattr(settings, 'TELEVERSEMENT_TAILLE_MORCEAU', 256 * 1024)
+TAILLE_BLOC_COPIE = 64 * 1024
+
+
+class DecalageInvalide(Exception):
+    """Le morceau ne commence pas là où le serveur en est"""
+
+    def __init__(self, attendu):
+        super().__init__(f"Décalage attendu : {attendu}")
+        self.attendu = attendu
+
+
+def chemin_televersement(televersement):
+    return os.path.join(settings.MEDIA_ROOT, TELEVERSEMENTS_DIR, f"{televersement.token}.part")
+
+
+def creer_televersement(enqueteur, nom_fichier, taille):
+    """Enregistre un téléversement et crée son fichier vide ; lève ValueError si refusé"""
+    if taille <= 0 or taille > getattr(settings, 'MAX_IMAGE_SIZE', 5242880):
+        raise ValueError("La photo ne doit pas dépasser 5MB.")
+    extension = os.path.splitext(nom_fichier)[1].lower()
+    if extension not in getattr(settings, 'ALLOWED_IMAGE_EXTENSIONS', ['.jpg', '.jpeg', '.png', '.gif', '.bmp']):
+        raise ValueError("Format de fichier non autorisé.")
+
+    televersement = TeleversementPhoto.objects.create(
+        enqueteur=enqueteur, nom_fichier=os.path.basename(nom_fichier)[:255], taille=taille
+    )
+    chemin = chemin_televersement(televersement)
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    open(chemin, 'wb').close()
+    return televersement
+
+
+def ecrire_morceau(televersement, decalage, flux, longueur):
+    """
+    Recopie au plus `longueur` octets de `flux` à partir de `decalage`
+    Retourne le nouveau nombre d'octets reçus
+    La ligne du téléversement est verrouillée avant de toucher au fichier : deux
+    envois concurrents du même morceau sont traités l'un après l'autre, et le
+    second, arrivé au mauvais décalage, n'écrit rien
+    """
+    with transaction.atomic():
+        recu = TeleversementPhoto.objects.select_for_update().values_list('recu', flat=True).get(
+            pk=televersement.pk
+        )
+        televersement.recu = recu
+        if decalage != recu:
+            raise DecalageInvalide(recu)
+        longueur = min(longueur, TAILLE_MAX_MORCEAU, televersement.taille - decalage)
+
+        ecrits = 0
+        with open(chemin_televersement(televersement), 'r+b') as fichier:
+            fichier.seek(decalage)
+            while ecrits < longueur:
+                try:
+                    bloc = flux.read(min(TAILLE_BLOC_COPIE, longueur - ecrits))
+                except OSError:
+                    break  # connexion coupée : on garde ce qui est arrivé
+                if not bloc:
+                    break
+                fichier.write(bloc)
+                ecrits += len(bloc)
+            fichier.truncate()
+
+        televersement.recu = decalage + ecrits
+        TeleversementPhoto.objects.filter(pk=televersement.pk).update(
+            recu=televersement.recu, date_modification=timezone.now()
+        )
+    return televersement.recu
+
+
+def ouvrir_televersement(televersement):
+    """Fichier Django (ouvert) de la photo assemblée"""
+    return File(open(chemin_televersement(televersement), 'rb'), name=televersement.nom_fichier)
+
+
+def supprimer_televersement(televersement):
+    try:
+        os.remove(chemin_televersement(televersement))
+    except FileNotFoundError:
+        pass
+    televersement.delete()
+
+
+def purger_televersements(heures=48):
+    """Supprime les téléversements abandonnés (non modifiés depuis `heures`)"""
+    anciens = TeleversementPhoto.objects.filter(date_modification__lt=timezone.now() - timedelta(hours=heures))
+    nombre = 0
+    for televersement in anciens.iterator():
+        supprimer_televersement(televersement)
+        nombre += 1
+    return nombre
@@ -0,0 +1,38 @@
+// Service worker de la fiche d'enquête : la page reste disponible hors connexion.
+// Les fiches saisies hors ligne sont gardées dans IndexedDB par la page elle-même
+// et envoyées en un seul lot au retour du réseau ({% url 'synchroniser_fiches' %}).
+
+const CACHE = 'enquete-v2';
+const PAGE_ENQUETE = '{% url "enquete" %}';
+
+self.addEventListener('install', function(event) {
+  self.skipWaiting();
+});
+
+self.addEventListener('activate', function(event) {
+  event.waitUntil(
+    caches.keys()
+      .then(noms => Promise.all(noms.filter(nom => nom !== CACHE).map(nom => caches.delete(nom))))
+      .then(() => self.clients.claim())
+  );
+});
+
+self.addEventListener('fetch', function(event) {
+  const requete = event.request;
+  if (requete.method !== 'GET' || requete.mode !== 'navigate') {
+    return;
+  }
+
+  // Réseau d'abord (page et messages à jour) ; dernière version en cache hors connexion
+  event.respondWith(
+    fetch(requete)
+      .then(function(reponse) {
+        if (reponse.ok && !reponse.redirected && new URL(requete.url).pathname === PAGE_ENQUETE) {
+          const copie = reponse.clone();
+          caches.open(CACHE).then(cache => cache.put(PAGE_ENQUETE, copie));
+        }
+        return reponse;
+      })
+      .catch(() => caches.match(PAGE_ENQUETE))
+  );
+});
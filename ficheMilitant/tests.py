@@ -1,3 +1,774 @@
-from django.test import TestCase
+import shutil
+import tempfile
+import unicodedata
+import base64
+import json
+import logging
+import os
+import random
+import subprocess
+import uuid
+from datetime import date
+from io import BytesIO, StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from PIL import Image
+
+from . import csv_utils, snapshot_utils
+from .csv_utils import (
+    IndexElectoral, cle_cache_comptage, construire_index, descripteur_csv, invalider_cache_electeurs, lire_lignes,
+    normalize_text, obtenir_index_electoral, signature_fichier, verifier_personne_dans_csv,
+)
+from .electeurs_utils import (
+    CLE_CACHE_TOTAL_BASE, invalider_cache_base, verifier_personne_en_base, verifier_personnes_en_base,
+)
+from .forms import FicheMilitantForm
+from .fuzzy_utils import (
+    TAILLE_MAX_BLOC, BlocsEnBase, MoteurRapprochement, blocs_en_base, cles_de_recherche, rechercher_candidats_proches,
+)
+from .image_utils import TAILLES_MINIATURES, generer_miniatures, nom_miniature, preparer_photo
+from .log_utils import GestionnaireFileAttente
+from .metriques_utils import lire_metriques_processus
+from .models import BlocElectoral, Electeur, Enqueteur, ExportJob, FicheMilitant
+from .snapshot_utils import SnapshotElectoral, compiler_snapshot
+from .televersement_utils import chemin_televersement
+from .vectorise_utils import PANDAS_DISPONIBLE, charger_liste, rapprocher
+
+
+def creer_enqueteur(numero, nb_fiches=3):
+    user = User.objects.create_user(f"enqueteur{numero}", f"enqueteur{numero}@example.com", 'motdepasse')
+    enqueteur = Enqueteur.objects.create(user=user, prenom=f"Prenom{numero}", nom=f"Nom{numero}", telephone='0700000000')
+    for i in range(nb_fiches):
+        FicheMilitant.objects.create(
+            enqueteur=enqueteur, region='Tonkpi', departement_administratif='Danané', zone='Zone 1',
+            section='Section 1', comite_base='CB 1', lieu_vote='EPP Danané', prenoms=f"Jean {i}",
+            nom='KOUASSI', date_naissance=date(1990, 1, 1), lieu_naissance='Danané', contacts='0700000000',
+            sexe='M', profession='Enseignant', inscription_electorale='inscrit',
+            est_dans_csv=(i % 2 == 0), photo='photos/militants/test.jpg' if i == 0 else '',
+        )
+    return enqueteur
+
+
+# Petite liste électorale : les fiches de creer_enqueteur "Jean 0" à "Jean 2" y figurent
+LISTE_ELECTORALE = (
+    "Numero Electeur;Nom/Nom de Jeune Fille;Prenoms;Sexe;Date de Naissance;Lieu de Naissance;Libelle Lieu de Vote\n"
+    "V000;KOUASSI;Jean 0;M;01/01/1990;DANANÉ;EPP Danané\n"
+    "V001;Kouassi;Jean 1;M;inconnu;INCONNU;EPP Danané\n"
+    "V002;KOUASSI;Jean 2;M;01/01/1990;;EPP Danané\n"
+    "V003;KOUASSI;Jean;M;01/01/1990;DANANE;EPP Danané\n"
+    "V004;KONÉ;Aïcha;F;03/04/1985;MAN;EPP Man\n"
+    "V005;KONÉ;Aïcha;F;01/02/1990;BOUAKÉ;EPP Bouaké\n"
+)
+
+
+def liste_electorale_temporaire(test, contenu=LISTE_ELECTORALE):
+    """
+    Le temps du test, la liste électorale (CSV et snapshot) est un petit fichier jetable
+    et la table Electeur, vide, n'est pas consultée. Retourne le chemin du CSV
+    """
+    dossier = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, dossier)
+    chemin = os.path.join(dossier, 'liste.csv')
+    with open(chemin, 'w', encoding='utf-8', newline='') as fichier:
+        fichier.write(contenu)
+
+    for module, nom, valeur in ((csv_utils, 'CSV_FILE_PATH', chemin),
+                                (snapshot_utils, 'SNAPSHOT_FILE_PATH', os.path.join(dossier, 'liste.snap'))):
+        test.addCleanup(setattr, module, nom, getattr(module, nom))
+        setattr(module, nom, valeur)
+    invalider_cache_electeurs()
+    test.addCleanup(invalider_cache_electeurs)
+    cache.set(CLE_CACHE_TOTAL_BASE, 0)
+    test.addCleanup(invalider_cache_base)
+    return chemin
+
+
+class EnqueteurAdminTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'motdepasse')
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:ficheMilitant_enqueteur_changelist')
+
+    def nombre_requetes_changelist(self):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(requetes)
+
+    def test_nombre_de_requetes_constant(self):
+        creer_enqueteur(1)
+        avec_un = self.nombre_requetes_changelist()
+
+        for numero in range(2, 12):
+            creer_enqueteur(numero)
+        self.assertEqual(self.nombre_requetes_changelist(), avec_un)
+
+    def test_compteurs_annotes(self):
+        creer_enqueteur(1, nb_fiches=3)
+        response = self.client.get(self.url)
+        self.assertContains(response, "2/3 (67%)")  # fiches dans le CSV
+        self.assertContains(response, "1/3 (33%)")  # fiches avec photo
+
+    def test_tri_sur_les_compteurs(self):
+        creer_enqueteur(1, nb_fiches=1)
+        creer_enqueteur(2, nb_fiches=4)
+        # nombre_fiches est la 7e colonne de list_display
+        response = self.client.get(self.url, {'o': '-7'})
+        resultats = list(response.context['cl'].result_list)
+        self.assertEqual([e.total_fiches for e in resultats], [4, 1])
+
+
+class FicheMilitantAdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'motdepasse'))
+        self.url = reverse('admin:ficheMilitant_fichemilitant_changelist')
+
+    def exporter(self, selection):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.post(self.url, {'action': 'export_fiches_csv', '_selected_action': selection})
+            self.assertTrue(response.streaming)
+            lignes = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        return lignes, len(requetes)
+
+    def test_export_csv_en_flux(self):
+        ids = list(creer_enqueteur(1, nb_fiches=3).fiches_militant.values_list('id', flat=True))
+        ids += list(creer_enqueteur(2, nb_fiches=5).fiches_militant.values_list('id', flat=True))
+        lignes, requetes = self.exporter(ids[:1])
+        self.assertEqual(len(lignes), 2)  # en-tête puis une ligne par fiche
+        self.assertIn("Prenom1 Nom1", lignes[1])
+
+        # Nom de l'enquêteur lu par jointure : pas de requête par fiche ni par enquêteur
+        lignes, requetes_toutes = self.exporter(ids)
+        self.assertEqual(len(lignes), 9)
+        self.assertEqual(requetes_toutes, requetes)
+
+    def test_index_des_filtres(self):
+        enqueteur = creer_enqueteur(1, nb_fiches=3)
+        plans = {
+            'fiche_region_section_cb_idx': FicheMilitant.objects.filter(
+                region='Tonkpi', section='Section 1', comite_base='CB 1'),
+            'fiche_dept_inscription_idx': FicheMilitant.objects.filter(
+                departement='Danané', inscription_electorale='inscrit'),
+            'fiche_enqueteur_date_idx': enqueteur.fiches_militant.order_by('-date_soumission')[:10],
+        }
+        for index, requete in plans.items():
+            self.assertIn(index, requete.explain(), index)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class MerciViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.enqueteur = creer_enqueteur(1, nb_fiches=3)
+        self.client.force_login(self.enqueteur.user)
+        self.url = reverse('merci')
+
+    def test_statistiques(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['total_enquetes'], 3)
+        self.assertEqual(response.context['fiches_dans_csv'], 2)
+        self.assertEqual(response.context['fiches_avec_photo'], 1)
+
+    def test_statistiques_en_cache_invalidees_a_l_enregistrement(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as requetes:
+            self.client.get(self.url)
+        self.assertFalse(any('COUNT' in requete['sql'] for requete in requetes))
+
+        fiche = self.enqueteur.fiches_militant.first()
+        fiche.pk = None
+        fiche.save()
+        self.assertEqual(self.client.get(self.url).context['total_enquetes'], 4)
+
+        fiche.delete()
+        self.assertEqual(self.client.get(self.url).context['total_enquetes'], 3)
+
+
+class JournalisationTests(TestCase):
+    def test_ecriture_apres_fork(self):
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier)
+        chemin = os.path.join(dossier, 'application.log')
+        gestionnaire = GestionnaireFileAttente(chemin)
+        journal = logging.getLogger('ficheMilitant.tests.fork')
+        journal.addHandler(gestionnaire)
+        self.addCleanup(journal.removeHandler, gestionnaire)
+
+        journal.warning("parent")
+        pid = os.fork()
+        if pid == 0:
+            # Worker gunicorn : le thread d'écriture du parent n'existe pas dans le fils
+            journal.warning("fils")
+            gestionnaire.arreter()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        gestionnaire.arreter()
+
+        with open(chemin, encoding='utf-8') as fichier:
+            messages = sorted(json.loads(ligne)['message'] for ligne in fichier)
+        self.assertEqual(messages, ['fils', 'parent'])
+
+
+class NormalisationTests(TestCase):
+    def test_identique_a_la_decomposition_unicode(self):
+        def reference(texte):
+            texte = unicodedata.normalize('NFD', texte)
+            return ''.join(c for c in texte if unicodedata.category(c) != 'Mn').upper().strip()
+
+        textes = [f"a{chr(code)}é " for code in range(0x370)]
+        textes += [" Danané ", "N'GUESSAN", "Marie-Noël", "Ἀθῆναι", "Đặng Thị Ánh", "Ǆemal", "ﬁlière", "가나"]
+        for texte in textes:
+            self.assertEqual(normalize_text(texte), reference(texte), repr(texte))
+        self.assertEqual(normalize_text(None), "")
+
+
+class RapprochementTests(TestCase):
+    def test_rappel_fautes_de_frappe(self):
+        """Une lettre supprimée dans n'importe quel mot : la personne est toujours proposée"""
+        aleatoire = random.Random(5)
+        syllabes = ['KO', 'UA', 'ME', 'DJE', 'NA', 'HI', 'YE', 'SE', 'BO', 'LI', 'GNE', 'ZA', 'TE', 'OU', 'RA', 'BE']
+
+        def mot():
+            return ''.join(aleatoire.choice(syllabes) for _ in range(aleatoire.randint(2, 4)))
+
+        index = IndexElectoral()
+        for numero in range(5000):
+            prenoms = f"{mot()} {mot()}" if numero % 2 else mot()
+            index.ajouter({'Numero Electeur': f"V{numero}", 'Nom/Nom de Jeune Fille': mot(), 'Prenoms': prenoms})
+        index.indexer_blocs()
+        moteur = MoteurRapprochement(index)
+
+        cles = list(index.cles())
+        manques = []
+        for _ in range(500):
+            nom, prenoms = aleatoire.choice(cles)
+            mots = (nom + ' ' + prenoms).split()
+            position = aleatoire.randrange(len(mots))
+            lettre = aleatoire.randrange(len(mots[position]))
+            mots[position] = mots[position][:lettre] + mots[position][lettre + 1:]
+            resultats = moteur.rechercher(mots[0], ' '.join(mots[1:]), limite=3)
+            if (nom, prenoms) not in [(r['nom'], r['prenoms']) for r in resultats]:
+                manques.append((nom, prenoms, mots))
+        self.assertEqual(manques, [])
+
+    def test_source_en_base_sans_index_csv(self):
+        invalider_cache_electeurs()
+        Electeur.objects.create(nom="Kouassi", prenoms="Jean Baptiste", numero_electeur="V1",
+                                nom_normalise="KOUASSI", prenoms_normalises="JEAN BAPTISTE")
+        BlocElectoral.objects.bulk_create(blocs_en_base("KOUASSI", "JEAN BAPTISTE"))
+        invalider_cache_base()
+        self.addCleanup(invalider_cache_base)
+
+        resultats = rechercher_candidats_proches("KOUASI", "JEAN BAPTISTE")
+        self.assertEqual([r['numero_electeur'] for r in resultats], ["V1"])
+        self.assertIsNone(csv_utils._index_electoral)
+
+    def test_source_en_base_une_requete_pour_les_candidats(self):
+        for numero, nom in enumerate(["KOUASSI", "KOUASI", "KOUASSY", "YAO"]):
+            Electeur.objects.create(nom=nom, prenoms="JEAN", numero_electeur=f"V{numero}",
+                                    nom_normalise=nom, prenoms_normalises="JEAN")
+            BlocElectoral.objects.bulk_create(blocs_en_base(nom, "JEAN"))
+
+        with self.assertNumQueries(2):  # blocs, puis électeurs de tous les candidats
+            resultats = MoteurRapprochement(BlocsEnBase()).rechercher("KOUASSI", "JEAN")
+        self.assertCountEqual([r['numero_electeur'] for r in resultats], ["V0", "V1", "V2"])
+
+    def test_bloc_en_base_tronque_aux_premieres_lignes(self):
+        BlocElectoral.objects.bulk_create(BlocElectoral(cle="P:KS", nom_normalise=f"NOM{numero:05d}",
+                                                        prenoms_normalises="JEAN")
+                                          for numero in reversed(range(TAILLE_MAX_BLOC + 100)))
+        candidats = list(BlocsEnBase().candidats_par_blocs(["P:KS"]))
+        self.assertEqual([nom for nom, _ in candidats],
+                         [f"NOM{numero:05d}" for numero in reversed(range(100, TAILLE_MAX_BLOC + 100))])
+
+
+class ElecteursEnBaseTests(TestCase):
+    def test_lot_identique_aux_recherches_unitaires(self):
+        for numero, (nom, prenoms) in enumerate([("KONE", "AICHA"), ("YAO", "JEAN"), ("KONE", "JEAN"), ("YAO", "AICHA")]):
+            Electeur.objects.create(nom=nom, prenoms=prenoms, numero_electeur=f"V{numero}", lieu_naissance="MAN",
+                                    date_naissance=date(1990, 1, numero + 1),
+                                    nom_normalise=nom, prenoms_normalises=prenoms, lieu_naissance_normalise="MAN")
+        personnes = [("Koné", "Aïcha", None, None), ("yao", "jean", "02/01/1990", "Man"),
+                     ("KONE", "AICHA", "05/01/1990", None), ("KONE", "AICHA", None, "BOUAKE"), ("X", "Y", None, None)]
+
+        with self.assertNumQueries(1):
+            resultats = verifier_personnes_en_base(personnes)
+        self.assertEqual(resultats, [verifier_personne_en_base(*personne) for personne in personnes])
+        self.assertEqual([r.get('numero_electeur') for r in resultats], ["V0", "V1", None, None, None])
+
+
+class ListeElectoraleTests(TestCase):
+    def setUp(self):
+        self.chemin = liste_electorale_temporaire(self)
+
+    def test_recherche_dans_l_index(self):
+        index = obtenir_index_electoral()
+        self.assertIsInstance(index, IndexElectoral)
+        self.assertIs(obtenir_index_electoral(), index)  # construit une fois par processus
+
+        def numero(*personne):
+            return verifier_personne_dans_csv(*personne).get('numero_electeur')
+
+        self.assertEqual(numero("Koné", "aïcha", date(1985, 4, 3)), "V004")
+        self.assertEqual(numero("KONE", "AICHA", None, "Bouaké"), "V005")
+        self.assertIsNone(numero("KONE", "AICHA", "1985-04-03", "Bouaké"))
+        # Date ou lieu inconnus dans la liste : ne disqualifient pas la personne
+        self.assertEqual(numero("KOUASSI", "JEAN 1", date(2000, 1, 1), "Man"), "V001")
+        self.assertIsNone(numero("KOUASSI", "JEAN 9"))
+
+        with open(self.chemin, 'a', encoding='utf-8') as fichier:
+            fichier.write("V006;KOUASSI;Jean 9;M;01/01/1990;MAN;EPP Man\n")
+        self.assertIsNot(obtenir_index_electoral(), index)  # fichier modifié : index reconstruit
+        self.assertEqual(numero("KOUASSI", "JEAN 9"), "V006")
+
+    def test_snapshot_identique_a_l_index(self):
+        index = construire_index(signature_fichier())
+        compiler_snapshot(construire_index(signature_fichier(), avec_blocs=False), snapshot_utils.SNAPSHOT_FILE_PATH)
+        snapshot = obtenir_index_electoral()
+        self.assertIsInstance(snapshot, SnapshotElectoral)
+        self.addCleanup(snapshot.fermer)
+
+        personnes = [("KONE", "AICHA", "03/04/1985", None), ("Koné", "Aïcha", None, "BOUAKE"),
+                     ("KOUASSI", "JEAN 1", "1990-01-01", "Danané"), ("KOUASSI", "JEAN", None, "MAN"),
+                     ("X", "Y", None, None)]
+        self.assertEqual([snapshot.rechercher(*personne) for personne in personnes],
+                         [index.rechercher(*personne) for personne in personnes])
+        cles = cles_de_recherche("KONE", "AICHA")
+        self.assertEqual(sorted(snapshot.candidats_par_blocs(cles)), sorted(index.candidats_par_blocs(cles)))
+
+        # CSV modifié après la compilation : le snapshot périmé est ignoré
+        with open(self.chemin, 'a', encoding='utf-8') as fichier:
+            fichier.write("V006;YAO;Jean;M;01/01/1990;MAN;EPP Man\n")
+        self.assertIsInstance(obtenir_index_electoral(), IndexElectoral)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_comptage_en_cache_par_version_du_fichier(self):
+        cache.set(CLE_CACHE_TOTAL_BASE, 0)
+        self.client.force_login(creer_enqueteur(1, nb_fiches=0).user)
+        self.assertEqual(self.client.get(reverse('enquete')).context['total_electeurs_csv'], 6)
+        self.assertEqual(cache.get(cle_cache_comptage(signature_fichier())), 6)
+
+        with open(self.chemin, 'a', encoding='utf-8') as fichier:
+            fichier.write("V006;YAO;Jean;M;01/01/1990;MAN;EPP Man\n")
+        self.assertEqual(self.client.get(reverse('enquete')).context['total_electeurs_csv'], 7)
+
+
+class ReverificationTests(TestCase):
+    def test_plusieurs_processus(self):
+        liste_electorale_temporaire(self)
+        enqueteur = creer_enqueteur(1, nb_fiches=5)
+        enqueteur.fiches_militant.update(est_dans_csv=True, numero_electeur_csv='PERIME')
+
+        # Liste lue dans le CSV : la commande en charge l'index avant le fork, les fils en héritent
+        sortie = StringIO()
+        call_command('reverifier_fiches', workers=2, chunk_size=2, stdout=sortie)
+        self.assertIn("5 fiches vérifiées", sortie.getvalue())
+        self.assertEqual(
+            sorted(enqueteur.fiches_militant.values_list('prenoms', 'est_dans_csv', 'numero_electeur_csv')),
+            [("Jean 0", True, "V000"), ("Jean 1", True, "V001"), ("Jean 2", True, "V002"),
+             ("Jean 3", False, None), ("Jean 4", False, None)],
+        )
+
+
+class ImportListeElectoraleTests(TestCase):
+    def test_blocs_uniques_entre_les_lots(self):
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier)
+        self.addCleanup(invalider_cache_base)
+        chemin = os.path.join(dossier, 'liste.csv')
+        with open(chemin, 'w', encoding='utf-8', newline='') as fichier:
+            fichier.write("Numero Electeur;Nom/Nom de Jeune Fille;Prenoms\n"
+                          "V1;KOUASSI;KOUASSI\nV2;YAO;JEAN\nV3;Kouassi;Kouassi\nV4;YAO;JEAN\nV5;KONE;AICHA\n")
+
+        call_command('importer_liste_electorale', fichier=chemin, batch_size=2, stdout=StringIO())
+        self.assertEqual(Electeur.objects.count(), 5)
+        attendus = {(bloc.cle, bloc.nom_normalise, bloc.prenoms_normalises)
+                    for cle in [("KOUASSI", "KOUASSI"), ("YAO", "JEAN"), ("KONE", "AICHA")]
+                    for bloc in blocs_en_base(*cle)}
+        self.assertCountEqual(
+            BlocElectoral.objects.values_list('cle', 'nom_normalise', 'prenoms_normalises'), attendus)
+
+
+class DescripteurCSVTests(TestCase):
+    def test_format_detecte_une_fois(self):
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier)
+        chemin = os.path.join(dossier, 'liste.csv')
+        with open(chemin, 'w', encoding='latin-1', newline='') as fichier:
+            fichier.write("Numero Electeur,Nom/Nom de Jeune Fille,Prenoms\r\nV001,KOFFI,AMÉLIE\r\n")
+
+        descripteur = descripteur_csv(chemin)
+        self.assertEqual((descripteur.encodage, descripteur.delimiteur), ('latin-1', ','))
+        self.assertEqual(list(lire_lignes(descripteur))[0]['Prenoms'], 'AMÉLIE')
+        self.assertIs(descripteur_csv(chemin), descripteur)
+
+
+class RapprochementVectoriseTests(TestCase):
+    @skipUnless(PANDAS_DISPONIBLE, "pandas non installé")
+    def test_rapprochement_en_colonnes_identique(self):
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier)
+        chemin = os.path.join(dossier, 'liste.csv')
+        with open(chemin, 'w', encoding='utf-8', newline='') as fichier:
+            fichier.write("Numero Electeur;Nom/Nom de Jeune Fille;Prenoms;Date de Naissance;Lieu de Naissance\n"
+                          "V001 ;KONÉ;Aïcha;01/02/1990;DANANÉ\nV002;KONÉ;Aïcha;03/04/1985;MAN\n"
+                          "V003;YAO;Jean;inconnu;INCONNU\n")
+
+        descripteur = descripteur_csv(chemin)
+        index = IndexElectoral()
+        for row in lire_lignes(descripteur):
+            index.ajouter(row)
+        personnes = [('kone', 'AICHA', '1985-04-03', 'man'), ('Koné', 'aïcha', None, 'Danane'),
+                     ('YAO', 'JEAN', '01/01/2000', 'Man'), ('KONE', 'AICHA', '01/01/2000', ''), ('X', 'Y', None, None)]
+        self.assertEqual(rapprocher(personnes, charger_liste(descripteur)),
+                         [index.rechercher(*personne) for personne in personnes])
+
+
+class MetriquesTests(TestCase):
+    def setUp(self):
+        self.dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dossier)
+        reglages = override_settings(METRIQUES_DIR=self.dossier, METRIQUES_JETON='jeton-collecteur')
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+
+    def test_metriques_par_vue(self):
+        enqueteur = creer_enqueteur(1)
+        self.client.force_login(enqueteur.user)
+        self.client.get(reverse('merci'))
+        # Requête locale (proxy) sans jeton ou avec un mauvais jeton : refusée
+        self.assertEqual(self.client.get(reverse('metriques')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metriques'), HTTP_AUTHORIZATION='Bearer faux').status_code, 403)
+
+        response = self.client.get(reverse('metriques'), HTTP_AUTHORIZATION='Bearer jeton-collecteur')
+        self.assertEqual(response.status_code, 200)
+        texte = response.content.decode()
+        self.assertIn('enquete_requetes_total{vue="merci",methode="GET",statut="200"}', texte)
+        self.assertIn('enquete_requete_sql_requetes_count{vue="merci",methode="GET"}', texte)
+
+
+    def test_fichiers_des_processus_termines_replies(self):
+        processus = subprocess.Popen(['true'])
+        processus.wait()
+        with open(os.path.join(self.dossier, f"{processus.pid}.json"), 'w', encoding='utf-8') as fichier:
+            json.dump({'histogrammes': [], 'compteurs': [['merci', 'GET', '200', 3]]}, fichier)
+
+        for _ in range(2):
+            _, compteurs = lire_metriques_processus()
+            self.assertEqual(compteurs[('merci', 'GET', '200')], 3)
+        self.assertEqual(sorted(os.listdir(self.dossier)), ['.verrou', 'termines.json'])
+
+class MediaTemporaireTestCase(TestCase):
+    """Les fichiers enregistrés pendant le test vont dans un MEDIA_ROOT jetable"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.settings_media = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_media.enable()
+        self.addCleanup(self.settings_media.disable)
+
+
+def contenu_jpeg(couleur=(200, 100, 50)):
+    buffer = BytesIO()
+    Image.new('RGB', (600, 800), couleur).save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue())
+
+
+class MiniaturesTests(MediaTemporaireTestCase):
+    def test_miniatures_generees_et_affichees(self):
+        fiche = creer_enqueteur(1, nb_fiches=1).fiches_militant.get()
+        fiche.photo.save('test.jpg', contenu_jpeg(), save=False)
+
+        generer_miniatures(fiche.photo)
+        for taille in TAILLES_MINIATURES:
+            with fiche.photo.storage.open(nom_miniature(fiche.photo.name, taille)) as miniature:
+                self.assertEqual(max(Image.open(miniature).size), taille)
+
+        fiche.photo_statut, fiche.miniatures_generees = 'traitee', True
+        fiche.save()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'motdepasse'))
+        response = self.client.get(reverse('admin:ficheMilitant_fichemilitant_changelist'))
+        self.assertContains(response, nom_miniature(fiche.photo.name, 64))
+
+
+class TraitementPhotosTests(MediaTemporaireTestCase):
+    def test_photo_optimisee_par_le_worker(self):
+        liste_electorale_temporaire(self)
+        enqueteur = creer_enqueteur(1, nb_fiches=0)
+        self.client.force_login(enqueteur.user)
+        buffer = BytesIO()
+        Image.effect_noise((2000, 1500), 64).convert('RGB').save(buffer, 'JPEG')
+        photo = SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+        with override_settings(PHOTO_TRAITEMENT_ASYNCHRONE=True):
+            self.client.post(reverse('enquete'), donnees_fiche(photo=photo))
+        fiche = enqueteur.fiches_militant.get()
+        brute = fiche.photo.name
+        self.assertEqual(fiche.photo_statut, 'en_attente')
+
+        call_command('traiter_photos', une_fois=True, stdout=StringIO())
+        fiche.refresh_from_db()
+        self.assertEqual((fiche.photo_statut, fiche.miniatures_generees), ('traitee', True))
+        with fiche.photo.open('rb') as fichier:
+            self.assertEqual(Image.open(fichier).size, (800, 600))
+        # La photo brute n'est plus référencée : purgée avec les orphelins
+        self.assertEqual(fiche.photo.storage.purger_orphelins(delai=0), [brute])
+
+    def test_jpeg_reduit_au_decodage_et_redresse(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation : photo de téléphone tenu verticalement
+        buffer = BytesIO()
+        Image.new('RGB', (3000, 2000), (200, 100, 50)).save(buffer, 'JPEG', exif=exif.tobytes())
+
+        preparee = preparer_photo(ContentFile(buffer.getvalue()), optimiser=True)
+        self.assertEqual((preparee.largeur, preparee.hauteur), (3000, 2000))
+        with Image.open(preparee.contenu) as optimisee:
+            self.assertEqual(optimisee.size, (533, 800))
+            self.assertEqual(optimisee.getexif().get(0x0112, 1), 1)
+
+
+class StockageParEmpreinteTests(MediaTemporaireTestCase):
+    def test_photo_identique_stockee_une_fois(self):
+        premiere, seconde = creer_enqueteur(1, nb_fiches=2).fiches_militant.all()
+        premiere.photo.save('a.jpg', contenu_jpeg())
+        seconde.photo.save('b.jpg', contenu_jpeg())
+        self.assertEqual(premiere.photo.name, seconde.photo.name)
+        self.assertTrue(premiere.photo.name.startswith('photos/sha256/'))
+
+        # Jamais supprimée pendant une requête ; la purge attend le délai de grâce
+        nom, stockage = seconde.photo.name, seconde.photo.storage
+        FicheMilitant.objects.filter(pk=premiere.pk).update(photo='')
+        stockage.delete(nom)
+        self.assertTrue(stockage.exists(nom))
+        self.assertEqual(stockage.purger_orphelins(delai=0), [])
+        # Miniatures enregistrées sous leur nom dans le stockage de la photo, purgées avec elle
+        generer_miniatures(seconde.photo)
+        miniature = nom_miniature(nom, 64)
+        self.assertTrue(stockage.exists(miniature))
+        FicheMilitant.objects.filter(pk=seconde.pk).update(photo='')
+        self.assertEqual(stockage.purger_orphelins(), [])
+        self.assertEqual(stockage.purger_orphelins(delai=0), [nom])
+        self.assertFalse(stockage.exists(nom))
+        self.assertFalse(stockage.exists(miniature))
+
+
+class ExportsTests(MediaTemporaireTestCase):
+    def setUp(self):
+        super().setUp()
+        self.exports_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.exports_root)
+        reglages = override_settings(EXPORTS_ROOT=self.exports_root)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'motdepasse'))
+
+    def test_export_de_la_liste_filtree(self):
+        enqueteur = creer_enqueteur(1, nb_fiches=4)
+        enqueteur.fiches_militant.filter(prenoms='Jean 3').update(sexe='F')
+        liste = reverse('admin:ficheMilitant_fichemilitant_changelist')
+        self.client.post(liste + '?sexe__exact=M&q=KOUASSI', {
+            'action': 'export_arriere_plan_csv', 'select_across': '1', 'index': 0,
+            '_selected_action': list(enqueteur.fiches_militant.values_list('id', flat=True)[:1]),
+        })
+        job = ExportJob.objects.get()
+        # Les filtres de la liste sont enregistrés, pas les identifiants
+        self.assertEqual(job.parametres, {'filtres': {'sexe__exact': 'M'}, 'recherche': 'KOUASSI'})
+        self.assertEqual(job.total, 3)
+
+        call_command('traiter_exports', une_fois=True, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual((job.statut, job.progression), ('termine', 3))
+        # Nom aléatoire, hors de MEDIA_ROOT
+        self.assertRegex(job.fichier.name, r'^[\w-]{22}\.csv$')
+        self.assertTrue(os.path.exists(os.path.join(self.exports_root, job.fichier.name)))
+        self.assertEqual(os.listdir(self.media_root), [])
+
+        reponse = self.client.get(reverse('admin:ficheMilitant_exportjob_telecharger', args=[job.pk]))
+        lignes = b''.join(reponse.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lignes), 4)
+        self.assertIn(f'fiches_militants_export_{job.pk}.csv', reponse['Content-Disposition'])
+        self.client.logout()
+        reponse = self.client.get(reverse('admin:ficheMilitant_exportjob_telecharger', args=[job.pk]))
+        self.assertEqual(reponse.status_code, 302)
+
+    def test_reprise_des_exports_interrompus(self):
+        fiche = creer_enqueteur(1, nb_fiches=1).fiches_militant.get()
+        job = ExportJob.objects.create(format='csv', statut='en_cours', parametres={'ids': [fiche.pk]}, total=1)
+        call_command('traiter_exports', une_fois=True, stdout=StringIO())
+        self.assertEqual(ExportJob.objects.get(pk=job.pk).statut, 'en_cours')
+        call_command('traiter_exports', une_fois=True, reprendre=True, stdout=StringIO())
+        self.assertEqual(ExportJob.objects.get(pk=job.pk).statut, 'termine')
+
+
+def donnees_fiche(**valeurs):
+    donnees = {
+        'region': 'Tonkpi', 'departement_administratif': 'Danané', 'departement': 'Danané',
+        'zone': 'Zone 1', 'section': 'Section 1', 'comite_base': 'CB 1', 'lieu_vote': 'EPP',
+        'prenoms': 'Jean', 'nom': 'KOUASSI', 'date_naissance': '1990-01-01', 'lieu_naissance': 'Danané',
+        'contacts': '0700000000', 'sexe': 'M', 'profession': 'Enseignant', 'inscription_electorale': 'inscrit',
+    }
+    donnees.update(valeurs)
+    return donnees
+
+
+class TeleversementPhotoTests(MediaTemporaireTestCase):
+    def setUp(self):
+        super().setUp()
+        liste_electorale_temporaire(self)
+        self.enqueteur = creer_enqueteur(1, nb_fiches=0)
+        self.client.force_login(self.enqueteur.user)
+
+    def envoyer(self, token, decalage, morceau):
+        return self.client.put(
+            reverse('televersement', args=[token]), morceau,
+            content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(decalage),
+        )
+
+    def test_envoi_par_morceaux_avec_reprise(self):
+        photo = contenu_jpeg().read()
+        reponse = self.client.post(reverse('televersement_creer'), {'nom': 'photo.jpg', 'taille': len(photo)})
+        self.assertEqual(reponse.status_code, 201)
+        token = reponse.json()['token']
+
+        moitie = len(photo) // 2
+        self.assertEqual(self.envoyer(token, 0, photo[:moitie]).json()['offset'], moitie)
+        # Morceau renvoyé au mauvais décalage (réponse perdue) : le serveur indique où reprendre
+        reponse = self.envoyer(token, 0, photo[:moitie])
+        self.assertEqual((reponse.status_code, reponse.json()['offset']), (409, moitie))
+        self.assertTrue(self.envoyer(token, moitie, photo[moitie:]).json()['termine'])
+
+        with override_settings(PHOTO_TRAITEMENT_ASYNCHRONE=True):
+            reponse = self.client.post(reverse('enquete'), donnees_fiche(photo_token=token))
+        self.assertRedirects(reponse, reverse('merci'), fetch_redirect_response=False)
+        fiche = self.enqueteur.fiches_militant.get()
+        # Photo déjà aux dimensions cibles : gardée telle quelle, sans passer par le worker
+        with fiche.photo.open('rb') as fichier:
+            self.assertEqual(fichier.read(), photo)
+        self.assertEqual(fiche.photo_statut, 'traitee')
+        self.assertFalse(self.enqueteur.televersements.exists())
+
+
+    def test_formulaire_invalide_referme_la_photo_assemblee(self):
+        photo = contenu_jpeg().read()
+        token = self.client.post(reverse('televersement_creer'), {'nom': 'photo.jpg', 'taille': len(photo)}).json()['token']
+        self.envoyer(token, 0, photo)
+        # Morceau rejoué à un décalage dépassé : refusé sans toucher au fichier
+        self.assertEqual(self.envoyer(token, 0, photo[:100]).status_code, 409)
+        televersement = self.enqueteur.televersements.get()
+        self.assertEqual(os.path.getsize(chemin_televersement(televersement)), len(photo))
+
+        form = FicheMilitantForm(donnees_fiche(nom='', photo_token=token), enqueteur=self.enqueteur)
+        self.assertFalse(form.is_valid())
+        self.assertTrue(form.cleaned_data['photo'].closed)
+        self.assertIsNone(form.televersement)
+
+    def test_photo_tronquee_refusee(self):
+        buffer = BytesIO()
+        Image.effect_noise((2000, 1500), 64).convert('RGB').save(buffer, 'JPEG')
+        tronquee = SimpleUploadedFile('photo.jpg', buffer.getvalue()[:buffer.tell() // 2], content_type='image/jpeg')
+
+        with override_settings(PHOTO_TRAITEMENT_ASYNCHRONE=True):
+            reponse = self.client.post(reverse('enquete'), donnees_fiche(photo=tronquee))
+        self.assertFormError(reponse.context['form'], 'photo', "Le fichier sélectionné n'est pas une image valide.")
+        self.assertFalse(self.enqueteur.fiches_militant.exists())
+
+    def test_photos_de_moins_de_8_pixels(self):
+        for taille, mode in (((1200, 5), 'RGB'), ((6, 6), 'CMYK')):
+            buffer = BytesIO()
+            Image.new(mode, taille).save(buffer, 'JPEG')
+            self.assertEqual(preparer_photo(ContentFile(buffer.getvalue())).largeur, taille[0])
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SynchronisationFichesTests(MediaTemporaireTestCase):
+    def setUp(self):
+        super().setUp()
+        liste_electorale_temporaire(self)
+
+    def test_lot_de_fiches_hors_ligne(self):
+        cache.clear()
+        enqueteur = creer_enqueteur(1, nb_fiches=1)
+        self.client.force_login(enqueteur.user)
+        self.assertEqual(self.client.get(reverse('merci')).context['total_enquetes'], 1)
+
+        photo = 'data:image/jpeg;base64,' + base64.b64encode(contenu_jpeg().read()).decode()
+        lot = [
+            {'id_local': 'a', 'donnees': donnees_fiche(prenoms='Awa'), 'photo': photo},
+            {'id_local': 'b', 'donnees': donnees_fiche(nom='')},
+            {'id_local': 'c', 'donnees': donnees_fiche(prenoms='Yao', a_cni=True)},
+        ]
+        with CaptureQueriesContext(connection) as requetes:
+            reponse = self.client.post(reverse('synchroniser_fiches'), json.dumps({'fiches': lot}),
+                                       content_type='application/json')
+        resultats = reponse.json()['resultats']
+
+        self.assertEqual([r['statut'] for r in resultats], ['cree', 'invalide', 'cree'])
+        self.assertIn('nom', resultats[1]['erreurs'])
+        insertion = f"INSERT INTO {connection.ops.quote_name(FicheMilitant._meta.db_table)}"
+        self.assertEqual(sum(r['sql'].startswith(insertion) for r in requetes), 1)
+        awa = enqueteur.fiches_militant.get(prenoms='Awa')
+        self.assertEqual(awa.photo_statut, 'traitee')
+        self.assertTrue(awa.photo.storage.exists(awa.photo.name))
+        self.assertEqual([r.get('id') for r in resultats],
+                         [awa.pk, None, enqueteur.fiches_militant.get(prenoms='Yao').pk])
+        self.assertTrue(enqueteur.fiches_militant.get(prenoms='Yao').a_cni)
+        # bulk_create n'envoie pas de signal : les statistiques sont invalidées par la vue
+        self.assertEqual(self.client.get(reverse('merci')).context['total_enquetes'], 3)
+
+        # Lot renvoyé (réponse perdue) : les fiches déjà créées sont retrouvées par leur id local
+        reponse = self.client.post(reverse('synchroniser_fiches'), json.dumps({'fiches': lot}),
+                                   content_type='application/json')
+        self.assertEqual(reponse.json()['crees'], 0)
+        self.assertEqual(reponse.json()['resultats'][0]['id'], awa.pk)
+        self.assertEqual(enqueteur.fiches_militant.count(), 3)
+
+    def test_seule_la_photo_optimisee_est_stockee(self):
+        enqueteur = creer_enqueteur(1, nb_fiches=0)
+        self.client.force_login(enqueteur.user)
+        buffer = BytesIO()
+        Image.effect_noise((2000, 1500), 64).convert('RGB').save(buffer, 'JPEG')
+        photo = 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+        with override_settings(PHOTO_TRAITEMENT_ASYNCHRONE=False):
+            self.client.post(reverse('synchroniser_fiches'), json.dumps({'fiches': [
+                {'id_local': 'a', 'donnees': donnees_fiche(), 'photo': photo},
+            ]}), content_type='application/json')
+        fiche = enqueteur.fiches_militant.get()
+        stockees = [os.path.relpath(os.path.join(dossier, nom), self.media_root).replace(os.sep, '/')
+                    for dossier, _, noms in os.walk(os.path.join(self.media_root, 'photos', 'sha256'))
+                    for nom in noms if not nom.startswith('.')]
+        self.assertEqual(stockees, [fiche.photo.name])
+
+    def test_envoi_repete_du_formulaire(self):
+        enqueteur = creer_enqueteur(1, nb_fiches=0)
+        self.client.force_login(enqueteur.user)
+        cle = uuid.uuid4().hex  # tirée par le navigateur à l'envoi
+
+        self.client.post(reverse('enquete'), donnees_fiche(cle_idempotence=cle))
+        with CaptureQueriesContext(connection) as requetes:
+            reponse = self.client.post(reverse('enquete'), donnees_fiche(cle_idempotence=cle))
+        self.assertRedirects(reponse, reverse('merci'), fetch_redirect_response=False)
+        self.assertFalse(any(r['sql'].startswith('INSERT') for r in requetes))
+        self.assertEqual(enqueteur.fiches_militant.count(), 1)
+
+    def test_cle_reutilisee_pour_une_autre_personne(self):
+        # Page servie par le cache hors ligne ou formulaire réinitialisé : même clé, autre personne
+        enqueteur = creer_enqueteur(1, nb_fiches=0)
+        self.client.force_login(enqueteur.user)
+        cle = uuid.uuid4().hex
+
+        self.client.post(reverse('enquete'), donnees_fiche(prenoms='Awa', cle_idempotence=cle))
+        reponse = self.client.post(reverse('enquete'), donnees_fiche(prenoms='Yao', cle_idempotence=cle))
+        self.assertRedirects(reponse, reverse('merci'), fetch_redirect_response=False)
+        self.assertEqual(sorted(enqueteur.fiches_militant.values_list('prenoms', flat=True)), ['Awa', 'Yao'])
+        self.assertEqual(enqueteur.fiches_militant.get(prenoms='Awa').cle_idempotence, cle)
@@ -6,7 +6,12 @@ urlpatterns = [
     path('ficheMilitant', views.ficheMilitant, name='ficheMilitant'),
     path('fiche', views.fiche, name='fiche'),
     path("enquete/", views.enquete_view, name="enquete"),
+    path("enquete/sw.js", views.service_worker_view, name="service_worker"),
+    path("api/fiches/synchroniser/", views.synchroniser_fiches_view, name="synchroniser_fiches"),
     path("merci/", views.merci_view, name="merci"),
+    path("api/photos/", views.televersement_creer_view, name="televersement_creer"),
+    path("api/photos/<uuid:token>/", views.televersement_view, name="televersement"),
+    path("metrics", views.metriques_view, name="metriques"),
     path("login/", views.login_view, name="login"),
     path("logout/", views.logout_view, name="logout"),
 ]
\ No newline at end of file
@@ -0,0 +1,125 @@
+# ficheMilitant/vectorise_utils.py
+
+"""
+Traitements de masse de la liste électorale en colonnes (pandas/NumPy).
+
+Pour les traitements portant sur toute la liste (revérification des fiches,
+rapports), la liste est chargée une fois en colonnes par le lecteur C de
+pandas, les noms sont normalisés colonne par colonne (factorisation puis
+méthodes .str sur les seules valeurs distinctes) et les fiches sont rapprochées des électeurs par une jointure de
+hachage (merge) sur la clé (NOM, PRENOMS) normalisée, au lieu d'appeler
+normalize_text et la recherche ligne par ligne.
+
+Les résultats sont identiques à ceux de rechercher_dans_candidats : mêmes
+critères sur la date et le lieu, premier électeur correspondant dans l'ordre
+du fichier. pandas est optionnel (pip install pandas) : sans lui,
+PANDAS_DISPONIBLE est faux et les appelants gardent le chemin ligne par ligne.
+"""
+
+import sys
+import unicodedata
+from functools import lru_cache
+
+from .csv_utils import COLONNES_RESULTAT, convert_date_format, descripteur_csv
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:
+    np = pd = None
+
+PANDAS_DISPONIBLE = pd is not None
+
+COLONNE_NOM = 'Nom/Nom de Jeune Fille'
+COLONNE_PRENOMS = 'Prenoms'
+COLONNE_DATE = 'Date de Naissance'
+COLONNE_LIEU = 'Lieu de Naissance'
+
+
+@lru_cache(maxsize=None)
+def table_marques_combinantes():
+    """Table str.translate supprimant les marques combinantes (catégorie Mn), construite une fois"""
+    return {code: None for code in range(sys.maxunicode + 1) if unicodedata.category(chr(code)) == 'Mn'}
+
+
+def normaliser_serie(serie):
+    """
+    normalize_text appliqué à toute une colonne : NFD, sans marques combinantes, majuscules, sans espaces autour
+    Les valeurs sont d'abord factorisées (hachage en C) : chaque nom, prénom ou lieu distinct n'est
+    normalisé qu'une fois, puis le résultat est redistribué par indexation NumPy
+    """
+    codes, distinctes = pd.factorize(serie.fillna('').astype(str))
+    normalisees = (pd.Series(distinctes, dtype=object).str.normalize('NFD')
+                   .str.translate(table_marques_combinantes()).str.upper().str.strip())
+    return pd.Series(normalisees.to_numpy(dtype=object)[codes], index=serie.index, dtype=object)
+
+
+def charger_liste(descripteur=None):
+    """
+    Charge la liste électorale en colonnes, avec les clés normalisées
+    (cle_nom, cle_prenoms, lieu_normalise) et le rang de chaque ligne dans le fichier
+    Retourne None si le fichier n'existe pas
+    """
+    descripteur = descripteur or descripteur_csv()
+    if descripteur is None:
+        return None
+
+    colonnes = [colonne for _, colonne in COLONNES_RESULTAT if colonne in descripteur.colonnes]
+    liste = pd.read_csv(
+        descripteur.chemin, sep=descripteur.delimiteur, encoding=descripteur.encodage,
+        header=0, names=list(descripteur.colonnes), usecols=colonnes,
+        dtype=str, keep_default_na=False, na_filter=False, engine='c',
+    )
+    for _, colonne in COLONNES_RESULTAT:
+        if colonne not in liste:
+            liste[colonne] = ''
+
+    liste['cle_nom'] = normaliser_serie(liste[COLONNE_NOM])
+    liste['cle_prenoms'] = normaliser_serie(liste[COLONNE_PRENOMS])
+    liste['date_csv'] = liste[COLONNE_DATE].str.strip()
+    liste['lieu_normalise'] = normaliser_serie(liste[COLONNE_LIEU])
+    liste['rang'] = np.arange(len(liste))
+    return liste
+
+
+def rapprocher(personnes, liste):
+    """
+    Rapproche des personnes (nom, prenoms, date_naissance, lieu_naissance) de la liste
+    chargée par charger_liste, par jointure de hachage sur la clé normalisée
+    Retourne les mêmes dictionnaires que verifier_personnes, dans l'ordre des personnes
+    """
+    personnes = list(personnes)
+    if not personnes:
+        return []
+
+    noms, prenoms, dates, lieux = zip(*personnes)
+    recherche = pd.DataFrame({
+        'position': np.arange(len(personnes)),
+        'cle_nom': normaliser_serie(pd.Series(noms, dtype=object)),
+        'cle_prenoms': normaliser_serie(pd.Series(prenoms, dtype=object)),
+        'date_recherche': [convert_date_format(date) if date else '' for date in dates],
+        'lieu_recherche': normaliser_serie(pd.Series(lieux, dtype=object)),
+    })
+
+    jointure = recherche.merge(liste, on=['cle_nom', 'cle_prenoms'], how='inner')
+
+    date_recherche, date_csv = jointure['date_recherche'], jointure['date_csv']
+    date_ok = (date_recherche == '') | (date_csv == '') | (date_csv == 'inconnu') | (date_recherche == date_csv)
+
+    lieu_recherche, lieu_csv = jointure['lieu_recherche'], jointure['lieu_normalise']
+    lieu_inclus = np.fromiter(
+        (a in b or b in a for a, b in zip(lieu_recherche, lieu_csv)), dtype=bool, count=len(jointure)
+    )
+    lieu_ok = (lieu_recherche == '') | (lieu_csv == '') | (lieu_csv == 'INCONNU') | lieu_inclus
+
+    trouves = (jointure[date_ok & lieu_ok]
+               .sort_values(['position', 'rang'])
+               .drop_duplicates('position'))
+
+    resultats = [{'trouve': False} for _ in personnes]
+    for ligne in trouves[['position', *(colonne for _, colonne in COLONNES_RESULTAT)]].itertuples(index=False):
+        resultat = {'trouve': True}
+        resultat.update(zip((cle for cle, _ in COLONNES_RESULTAT), ligne[1:]))
+        resultat['numero_electeur'] = resultat['numero_electeur'].strip()
+        resultats[ligne[0]] = resultat
+    return resultats
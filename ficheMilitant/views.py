@@ -4,16 +4,32 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.conf import settings
 from django.contrib import messages
-from django.http import HttpResponse
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_http_methods, require_POST
 from django.template import loader
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
-from PIL import Image
+import base64
+import hmac
+import logging
+import json
 import os
+import uuid
 from .forms import FicheMilitantForm, EnquetePolitiqueForm
-from .models import Enqueteur, FicheMilitant
-from .csv_utils import verifier_personne_dans_csv, compter_electeurs_csv
+from .models import Enqueteur, FicheMilitant, TeleversementPhoto
+from .electeurs_utils import verifier_personne, verifier_personnes, compter_electeurs
+from .fuzzy_utils import rechercher_candidats_proches
+from .stats_utils import invalider_statistiques, statistiques_enqueteur
+from .image_utils import generer_miniatures
+from .log_utils import mesure
+from .metriques_utils import format_prometheus
+from .televersement_utils import (
+    TAILLE_MAX_MORCEAU, DecalageInvalide, creer_televersement, ecrire_morceau,
+)
+
+logger = logging.getLogger(__name__)
 
 def ficheMilitant(request):
     template = loader.get_template('login.html')
@@ -23,29 +39,75 @@ def fiche(request):
     fiche = loader.get_template('fiche.html')
     return HttpResponse(fiche.render())
 
-def optimize_image(image_file, max_size=(800, 800), quality=85):
+def enregistrer_photo(fiche, form):
     """
-    Optimise une image en la redimensionnant et en réduisant la qualité
+    Enregistre la photo validée par le formulaire sur la fiche (sans sauvegarder la fiche)
+    La photo a déjà été ouverte (et éventuellement optimisée) par le formulaire ;
+    sinon le fichier brut est enregistré et l'optimisation est faite en
+    arrière-plan (manage.py traiter_photos)
+    Retourne (niveau, message) pour l'enquêteur, ou None sans photo
     """
+    photo_preparee = form.photo_preparee
+    photo_file = form.cleaned_data.get('photo')  # fichier du formulaire ou téléversement assemblé
+    if not photo_file or photo_preparee is None:
+        return None
+
     try:
-        with Image.open(image_file) as img:
-            # Convertir en RGB si nécessaire
-            if img.mode in ('RGBA', 'LA', 'P'):
-                img = img.convert('RGB')
+        filename = f"{fiche.prenoms}_{fiche.nom}_{fiche.enqueteur_id}".replace(' ', '_').replace('/', '_')
 
-            # Redimensionner si l'image est trop grande
-            img.thumbnail(max_size, Image.Resampling.LANCZOS)
+        if photo_preparee.optimisee:
+            # Toujours sauvegarder en JPEG après optimisation
+            fiche.photo.save(f"{filename}.jpg", photo_preparee.contenu, save=False)
+            generer_miniatures(fiche.photo)
+            fiche.photo_statut = 'traitee'
+            fiche.miniatures_generees = True
+            return messages.INFO, "📷 Photo ajoutée et optimisée avec succès."
 
-            # Sauvegarder dans un buffer
-            from io import BytesIO
-            buffer = BytesIO()
-            img.save(buffer, format='JPEG', quality=quality, optimize=True)
-            buffer.seek(0)
+        file_extension = os.path.splitext(photo_file.name)[1].lower() or '.jpg'
+        fiche.photo.save(f"{filename}{file_extension}", photo_file, save=False)
+        fiche.photo_statut = 'en_attente'
+        return messages.INFO, "📷 Photo ajoutée, elle sera optimisée dans quelques instants."
 
-            return ContentFile(buffer.read())
     except Exception as e:
-        print(f"Erreur lors de l'optimisation de l'image: {e}")
-        return image_file
+        return messages.WARNING, f"Erreur lors du traitement de la photo: {str(e)}"
+
+
+def appliquer_resultat_liste(fiche, resultat):
+    """Reporte sur la fiche le résultat de la recherche dans la liste électorale"""
+    fiche.est_dans_csv = bool(resultat and resultat.get('trouve'))
+
+    # Stocker le numéro électeur s'il existe
+    if fiche.est_dans_csv and resultat.get('numero_electeur'):
+        fiche.numero_electeur_csv = resultat['numero_electeur']
+        # Si le champ numéro carte électeur est vide, le remplir
+        if not fiche.numero_carte_electeur:
+            fiche.numero_carte_electeur = resultat['numero_electeur']
+
+
+def fiche_deja_enregistree(enqueteur, cle_idempotence):
+    """Fiche déjà créée par un envoi précédent portant la même clé (ou None)"""
+    if not cle_idempotence:
+        return None
+    return FicheMilitant.objects.filter(
+        enqueteur=enqueteur, cle_idempotence=cle_idempotence
+    ).only('id', 'prenoms', 'nom', 'date_naissance').first()
+
+
+def meme_personne(fiche, donnees):
+    """Le nouvel envoi porte-t-il sur la personne de la fiche déjà enregistrée ?"""
+    return (
+        (donnees.get('nom') or '').strip() == fiche.nom
+        and (donnees.get('prenoms') or '').strip() == fiche.prenoms
+        and (donnees.get('date_naissance') or '').strip() == str(fiche.date_naissance or '')
+    )
+
+
+def redirection_merci(request, fiche):
+    # IMPORTANT: Stocker l'ID de la fiche dans la session pour l'afficher sur la page merci
+    request.session['derniere_fiche_id'] = fiche.id
+    request.session['fiche_nom_complet'] = f"{fiche.prenoms} {fiche.nom}"
+    return redirect("merci")
+
 
 @login_required
 def enquete_view(request):
@@ -61,30 +123,30 @@ def enquete_view(request):
         return redirect('login')
 
     if request.method == "POST":
-        form = FicheMilitantForm(request.POST, request.FILES)
+        # Envoi répété (double clic, nouvel essai après une réponse lente) : la fiche déjà
+        # enregistrée est renvoyée sans refaire la recherche ni le traitement de la photo
+        donnees = request.POST
+        fiche_existante = fiche_deja_enregistree(enqueteur, donnees.get('cle_idempotence'))
+        if fiche_existante is not None:
+            if meme_personne(fiche_existante, donnees):
+                messages.info(request, "ℹ️ Cette fiche avait déjà été enregistrée.")
+                return redirection_merci(request, fiche_existante)
+            # Clé déjà consommée par une autre personne : la fiche est enregistrée sous une nouvelle clé
+            donnees = donnees.copy()
+            donnees['cle_idempotence'] = uuid.uuid4().hex
+
+        form = FicheMilitantForm(donnees, request.FILES, enqueteur=enqueteur)
         if form.is_valid():
             fiche = form.save(commit=False)
             fiche.enqueteur = enqueteur  # Associer la fiche à l'enquêteur connecté
+            # La photo n'est écrite que par enregistrer_photo (depuis form.cleaned_data) :
+            # sinon fiche.save() enregistrerait aussi le fichier brut
+            fiche.photo = None
 
-            # Traitement de la photo
-            if 'photo' in request.FILES:
-                photo_file = request.FILES['photo']
-                try:
-                    # Optimiser l'image
-                    optimized_photo = optimize_image(photo_file)
-
-                    # Générer un nom de fichier unique
-                    file_extension = '.jpg'  # Toujours sauvegarder en JPEG après optimisation
-                    filename = f"{fiche.prenoms}_{fiche.nom}_{enqueteur.id}".replace(' ', '_').replace('/', '_')
-                    filename = f"{filename}{file_extension}"
-
-                    # Sauvegarder la photo optimisée
-                    fiche.photo.save(filename, optimized_photo, save=False)
-
-                    messages.info(request, "📷 Photo ajoutée et optimisée avec succès.")
-
-                except Exception as e:
-                    messages.warning(request, f"Erreur lors du traitement de la photo: {str(e)}")
+            with mesure('photo', photo=bool(form.cleaned_data.get('photo'))):
+                message_photo = enregistrer_photo(fiche, form)
+            if message_photo:
+                messages.add_message(request, *message_photo)
 
             # Vérifier si la personne existe dans le CSV
             nom = fiche.nom
@@ -92,24 +154,18 @@ def enquete_view(request):
             date_naissance = fiche.date_naissance
             lieu_naissance = fiche.lieu_naissance
 
-            # Recherche dans le CSV
-            resultat = verifier_personne_dans_csv(
-                nom=nom,
-                prenoms=prenoms,
-                date_naissance=date_naissance,
-                lieu_naissance=lieu_naissance
-            )
-
-            if resultat and resultat.get('trouve'):
-                fiche.est_dans_csv = True
-
-                # Stocker le numéro électeur s'il existe
-                if resultat.get('numero_electeur'):
-                    fiche.numero_electeur_csv = resultat['numero_electeur']
-                    # Si le champ numéro carte électeur est vide, le remplir
-                    if not fiche.numero_carte_electeur:
-                        fiche.numero_carte_electeur = resultat['numero_electeur']
+            # Recherche dans la liste électorale (table Electeur ou CSV)
+            with mesure('recherche_liste') as span:
+                resultat = verifier_personne(
+                    nom=nom,
+                    prenoms=prenoms,
+                    date_naissance=date_naissance,
+                    lieu_naissance=lieu_naissance
+                )
+                span['trouve'] = bool(resultat and resultat.get('trouve'))
 
+            appliquer_resultat_liste(fiche, resultat)
+            if fiche.est_dans_csv:
                 messages.warning(
                     request,
                     f"⚠️ Cette personne ({prenoms} {nom}) est déjà enregistrée dans le fichier électoral. "
@@ -117,38 +173,260 @@ def enquete_view(request):
                     f"Lieu de vote : {resultat.get('lieu_vote', 'Non renseigné')}"
                 )
             else:
-                fiche.est_dans_csv = False
                 messages.info(
                     request,
                     f"ℹ️ Cette personne ({prenoms} {nom}) n'a pas été trouvée dans le fichier électoral. "
                     "Elle sera enregistrée comme nouvelle inscription potentielle."
                 )
 
-            # Sauvegarder la fiche
-            fiche.save()
+                # Proposer les électeurs aux noms proches (orthographe, prénoms inversés)
+                with mesure('rapprochement') as span:
+                    candidats = rechercher_candidats_proches(nom, prenoms, date_naissance, lieu_naissance, limite=3)
+                    span['candidats'] = len(candidats)
+                if candidats:
+                    messages.info(
+                        request,
+                        "🔎 Électeurs proches dans le fichier électoral : " + " ; ".join(
+                            f"{c['prenoms']} {c['nom']} (n° {c['numero_electeur'] or 'Non renseigné'}, "
+                            f"{c['score']:.0%})"
+                            for c in candidats
+                        )
+                    )
 
-            # IMPORTANT: Stocker l'ID de la fiche dans la session pour l'afficher sur la page merci
-            request.session['derniere_fiche_id'] = fiche.id
-            request.session['fiche_nom_complet'] = f"{fiche.prenoms} {fiche.nom}"
+            # Sauvegarder la fiche
+            try:
+                with mesure('enregistrement'), transaction.atomic():
+                    fiche.save()
+            except IntegrityError:
+                # Envoi concurrent de la même clé, enregistré entre-temps
+                fiche_existante = fiche_deja_enregistree(enqueteur, fiche.cle_idempotence)
+                if fiche_existante is None:
+                    raise
+                return redirection_merci(request, fiche_existante)
+            form.liberer_televersement()
 
             messages.success(request, "✅ Fiche de militant enregistrée avec succès !")
-            return redirect("merci")
+            return redirection_merci(request, fiche)
         else:
             messages.error(request, "Veuillez corriger les erreurs dans le formulaire.")
     else:
-        form = FicheMilitantForm()
+        form = FicheMilitantForm(enqueteur=enqueteur)
 
-    # Compter le nombre total d'électeurs dans le CSV
-    total_electeurs_csv = compter_electeurs_csv()
+    # Compter le nombre total d'électeurs de la liste électorale
+    total_electeurs_csv = compter_electeurs()
 
     context = {
         'form': form,
         'enqueteur': enqueteur,
-        'total_fiches': enqueteur.fiches_militant.count(),
+        'total_fiches': statistiques_enqueteur(enqueteur.id)['total'],
         'total_electeurs_csv': total_electeurs_csv,
     }
     return render(request, "enquete_form.html", context)
 
+def etat_televersement(televersement):
+    return {
+        'token': str(televersement.token),
+        'offset': televersement.recu,
+        'taille': televersement.taille,
+        'termine': televersement.termine,
+        'taille_morceau': TAILLE_MAX_MORCEAU,
+    }
+
+
+@login_required
+@require_POST
+def televersement_creer_view(request):
+    """API : ouvre un téléversement de photo par morceaux (nom, taille) et renvoie son token"""
+    try:
+        enqueteur = request.user.enqueteur
+    except Enqueteur.DoesNotExist:
+        return JsonResponse({'erreur': "Vous n'êtes pas autorisé à envoyer de photo."}, status=403)
+    if not enqueteur.actif:
+        return JsonResponse({'erreur': "Votre compte enquêteur n'est pas actif."}, status=403)
+
+    try:
+        televersement = creer_televersement(
+            enqueteur, request.POST.get('nom', ''), int(request.POST.get('taille', 0))
+        )
+    except ValueError as e:
+        return JsonResponse({'erreur': str(e)}, status=400)
+    return JsonResponse(etat_televersement(televersement), status=201)
+
+
+@login_required
+@require_http_methods(["GET", "PUT"])
+def televersement_view(request, token):
+    """
+    API : GET renvoie le décalage atteint (reprise après coupure),
+    PUT ajoute un morceau (corps brut) au décalage donné par l'en-tête Upload-Offset
+    """
+    televersement = TeleversementPhoto.objects.filter(token=token, enqueteur__user=request.user).first()
+    if televersement is None:
+        return JsonResponse({'erreur': "Téléversement inconnu ou expiré."}, status=404)
+
+    if request.method == 'PUT':
+        try:
+            decalage = int(request.headers.get('Upload-Offset', ''))
+            longueur = int(request.headers.get('Content-Length') or 0)
+        except ValueError:
+            return JsonResponse({'erreur': "En-tête Upload-Offset invalide."}, status=400)
+        if longueur > TAILLE_MAX_MORCEAU:
+            return JsonResponse({'erreur': "Morceau trop volumineux.", **etat_televersement(televersement)}, status=413)
+        try:
+            ecrire_morceau(televersement, decalage, request, longueur)
+        except DecalageInvalide:
+            return JsonResponse(etat_televersement(televersement), status=409)
+
+    return JsonResponse(etat_televersement(televersement))
+
+
+def service_worker_view(request):
+    """
+    Service worker du mode hors ligne, servi sous /enquete/ pour en couvrir la page
+    Pas de login_required : un script de service worker ne peut pas être redirigé
+    """
+    return render(request, "sw.js", content_type="application/javascript")
+
+
+def metriques_view(request):
+    """
+    Métriques Prometheus de tous les workers
+    Réservé au staff connecté et au collecteur : jeton METRIQUES_JETON
+    (Authorization: Bearer <jeton>) ou adresse de METRIQUES_IPS_AUTORISEES
+    """
+    jeton = getattr(settings, 'METRIQUES_JETON', '')
+    jeton_valide = bool(jeton) and hmac.compare_digest(
+        request.META.get('HTTP_AUTHORIZATION', '').encode(), f"Bearer {jeton}".encode()
+    )
+    ips_autorisees = getattr(settings, 'METRIQUES_IPS_AUTORISEES', [])
+    if not (request.user.is_staff or jeton_valide or request.META.get('REMOTE_ADDR') in ips_autorisees):
+        return HttpResponse("Accès refusé.", status=403, content_type="text/plain")
+    return HttpResponse(format_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Un lot reste sous DATA_UPLOAD_MAX_MEMORY_SIZE avec des photos réduites par le navigateur
+MAX_FICHES_PAR_LOT = 50
+
+
+def photo_depuis_base64(donnee):
+    """Photo transmise dans le JSON (data URL ou base64 brut) -> fichier téléversé"""
+    entete, _, contenu = donnee.rpartition(',')
+    extension = '.png' if 'image/png' in entete else '.jpg'
+    return SimpleUploadedFile(f"photo{extension}", base64.b64decode(contenu, validate=True))
+
+
+@login_required
+@require_POST
+def synchroniser_fiches_view(request):
+    """
+    API : enregistre en une requête les fiches saisies hors ligne
+    Corps JSON : {"fiches": [{"id_local": ..., "donnees": {champ: valeur}, "photo": "data:image/jpeg;base64,..."}]}
+    Chaque fiche est validée par FicheMilitantForm, les recherches dans la liste
+    électorale sont faites en lot et les fiches valides insérées par un seul
+    bulk_create ; la réponse donne un résultat par fiche, dans l'ordre du lot
+    """
+    try:
+        enqueteur = request.user.enqueteur
+    except Enqueteur.DoesNotExist:
+        return JsonResponse({'erreur': "Vous n'êtes pas autorisé à enregistrer des fiches."}, status=403)
+    if not enqueteur.actif:
+        return JsonResponse({'erreur': "Votre compte enquêteur n'est pas actif."}, status=403)
+
+    try:
+        lot = json.loads(request.body)['fiches']
+        if not isinstance(lot, list) or not all(isinstance(element, dict) for element in lot):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'erreur': "Corps JSON invalide."}, status=400)
+    if len(lot) > MAX_FICHES_PAR_LOT:
+        return JsonResponse({'erreur': f"{MAX_FICHES_PAR_LOT} fiches au plus par lot."}, status=413)
+
+    # L'id local d'une fiche sert de clé d'idempotence : un lot renvoyé après une
+    # réponse perdue ne recrée pas les fiches déjà enregistrées. Sans id local, une clé
+    # est tirée ici : elle sert à relire l'id des fiches insérées (bulk_create ne
+    # renseigne pas les clés primaires sous MySQL)
+    cles = [str(element['id_local'])[:64] if element.get('id_local') else uuid.uuid4().hex for element in lot]
+    deja_enregistrees = dict(FicheMilitant.objects.filter(
+        enqueteur=enqueteur, cle_idempotence__in=cles
+    ).values_list('cle_idempotence', 'id'))
+
+    resultats = []
+    valides = []  # (position du résultat, formulaire, fiche)
+    cles_du_lot = {}
+    for element, cle in zip(lot, cles):
+        resultat = {'id_local': element.get('id_local')}
+        resultats.append(resultat)
+
+        if cle in deja_enregistrees or cle in cles_du_lot:
+            resultat.update(statut='cree', id=deja_enregistrees.get(cle), deja_enregistree=True)
+            continue
+
+        try:
+            fichiers = {'photo': photo_depuis_base64(element['photo'])} if element.get('photo') else {}
+        except (ValueError, TypeError, AttributeError):
+            resultat.update(statut='invalide', erreurs={'photo': [{'message': "Photo illisible.", 'code': 'invalid'}]})
+            continue
+
+        form = FicheMilitantForm(element.get('donnees') or {}, fichiers, enqueteur=enqueteur)
+        if not form.is_valid():
+            resultat.update(statut='invalide', erreurs=form.errors.get_json_data())
+            continue
+
+        fiche = form.save(commit=False)
+        fiche.enqueteur = enqueteur
+        fiche.cle_idempotence = cle
+        # Sinon bulk_create (FileField.pre_save) écrirait la photo brute avant enregistrer_photo
+        fiche.photo = None
+        cles_du_lot[cle] = fiche
+        valides.append((len(resultats) - 1, form, fiche))
+
+    # Recherches dans la liste électorale en une fois pour tout le lot
+    with mesure('recherche_liste', fiches=len(valides)):
+        trouves = verifier_personnes([
+            (fiche.nom, fiche.prenoms, fiche.date_naissance, fiche.lieu_naissance) for _, _, fiche in valides
+        ])
+    for (_, _, fiche), trouve in zip(valides, trouves):
+        appliquer_resultat_liste(fiche, trouve)
+
+    try:
+        with mesure('enregistrement', fiches=len(valides)), transaction.atomic():
+            FicheMilitant.objects.bulk_create([fiche for _, _, fiche in valides])
+    except IntegrityError:
+        # Même lot envoyé en parallèle : le client le renverra, les fiches seront alors retrouvées
+        return JsonResponse({'erreur': "Lot déjà en cours d'enregistrement, réessayez."}, status=409)
+
+    ids = dict(FicheMilitant.objects.filter(
+        enqueteur=enqueteur, cle_idempotence__in=list(cles_du_lot)
+    ).values_list('cle_idempotence', 'id'))
+
+    # Photos écrites seulement une fois les fiches insérées : un lot refusé (409) n'en laisse aucune
+    avec_photo = []
+    for position, form, fiche in valides:
+        fiche.pk = ids[fiche.cle_idempotence]
+        with mesure('photo', photo=bool(form.cleaned_data.get('photo'))):
+            message_photo = enregistrer_photo(fiche, form)
+        if message_photo:
+            avec_photo.append(fiche)
+            if message_photo[0] == messages.WARNING:
+                resultats[position]['avertissement'] = message_photo[1]
+        form.liberer_televersement()
+        resultats[position].update(
+            statut='cree', id=fiche.pk, est_dans_csv=fiche.est_dans_csv,
+            numero_electeur=fiche.numero_electeur_csv or '',
+        )
+    if avec_photo:
+        FicheMilitant.objects.bulk_update(avec_photo, ['photo', 'photo_statut', 'miniatures_generees'])
+
+    for resultat, cle in zip(resultats, cles):
+        if resultat.get('deja_enregistree') and resultat['id'] is None:
+            resultat['id'] = ids.get(cle)  # doublon à l'intérieur du lot
+    if valides:
+        # bulk_create n'envoie pas post_save : les statistiques sont invalidées ici
+        invalider_statistiques(enqueteur.id)
+
+    return JsonResponse({'resultats': resultats, 'crees': len(valides)})
+
+
 @login_required
 def merci_view(request):
     """Vue pour la page de remerciement avec affichage de la dernière fiche"""
@@ -159,17 +437,16 @@ def merci_view(request):
     derniere_fiche_id = request.session.get('derniere_fiche_id')
     nom_complet = request.session.get('fiche_nom_complet', 'Militant')
 
-    print(f"DEBUG: derniere_fiche_id = {derniere_fiche_id}")  # Debug
+    logger.debug("Page merci : derniere_fiche_id=%s", derniere_fiche_id)
 
     if derniere_fiche_id:
         try:
             # Récupérer la fiche depuis la base de données
             derniere_fiche = FicheMilitant.objects.get(
                 id=derniere_fiche_id,
-                enqueteur=request.user.enqueteur
+                enqueteur__user=request.user
             )
-            print(f"DEBUG: Fiche trouvée - {derniere_fiche.prenoms} {derniere_fiche.nom}")  # Debug
-            print(f"DEBUG: Photo URL - {derniere_fiche.photo.url if derniere_fiche.photo else 'Pas de photo'}")  # Debug
+            logger.debug("Page merci : fiche #%s trouvée (photo : %s)", derniere_fiche.pk, derniere_fiche.photo.name or '-')
 
             # Nettoyer la session après utilisation
             if 'derniere_fiche_id' in request.session:
@@ -178,18 +455,19 @@ def merci_view(request):
                 del request.session['fiche_nom_complet']
 
         except FicheMilitant.DoesNotExist:
-            print("DEBUG: Fiche non trouvée")  # Debug
+            logger.debug("Page merci : fiche #%s non trouvée", derniere_fiche_id)
             derniere_fiche = None
         except Exception as e:
-            print(f"DEBUG: Erreur - {e}")  # Debug
+            logger.exception("Page merci : erreur de lecture de la fiche #%s : %s", derniere_fiche_id, e)
             derniere_fiche = None
 
-    # Calculer les statistiques générales
+    # Calculer les statistiques générales (une seule requête agrégée, mise en cache)
     try:
-        enqueteur = request.user.enqueteur
-        total_fiches = enqueteur.fiches_militant.count()
-        fiches_dans_csv = enqueteur.fiches_militant.filter(est_dans_csv=True).count()
-        fiches_avec_photo = enqueteur.fiches_militant.exclude(photo='').count()
+        enqueteur_id = derniere_fiche.enqueteur_id if derniere_fiche else request.user.enqueteur.id
+        statistiques = statistiques_enqueteur(enqueteur_id)
+        total_fiches = statistiques['total']
+        fiches_dans_csv = statistiques['dans_csv']
+        fiches_avec_photo = statistiques['avec_photo']
 
         # Calculer le pourcentage
         pourcentage = 0
@@ -220,8 +498,6 @@ def merci_view(request):
         'nom_complet': nom_complet,
     }
 
-    print(f"DEBUG: Context - derniere_fiche = {derniere_fiche}")  # Debug
-
     return render(request, "merci.html", context)
 
 def login_view(request):